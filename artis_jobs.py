@@ -0,0 +1,540 @@
+"""
+artis_jobs.py
+
+Helpers shared by the AWS Batch submit scripts: job queue/definition names,
+the HS version → analysis year table, per-job resource profiles, retry
+policies, job submission and the local run files that record what was
+submitted.
+
+Every submit_job call is logged as an artis_events "submit" event with its
+latency and the retries boto3 made.
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+from datetime import datetime
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "aws_scripts"))
+import artis_events  # noqa: E402
+
+JOB_QUEUE      = "artis-job-queue"
+JOB_DEFINITION = "artis_job_definition"
+
+# Parameterized restart script (ARTIS_HS_VERSION / ARTIS_YEARS) in ARTIS_model_code/
+RESTART_SCRIPT = "02-artis-pipeline-restart-snet.R"
+
+# HS version -> first analysis year. Mirrors the df_years table rebuilt in
+# 02-artis-pipeline-restart-snet.R; keep the two in sync.
+HS_FIRST_YEAR = {
+    "96": 1996,
+    "02": 2002,
+    "07": 2007,
+    "12": 2012,
+    "17": 2017,
+}
+LAST_ANALYSIS_YEAR = 2023
+
+# Local directory holding one JSON run file per orchestrated submission
+RUNS_DIR = "runs"
+
+# AWS Batch limits
+DESCRIBE_JOBS_BATCH = 100
+
+# Fargate vCPU sizes and the memory values (MiB) each one accepts
+FARGATE_MEMORY_MIB = {
+    0.25: (512, 1024, 2048),
+    0.5:  range(1024, 4096 + 1, 1024),
+    1:    range(2048, 8192 + 1, 1024),
+    2:    range(4096, 16384 + 1, 1024),
+    4:    range(8192, 30720 + 1, 1024),
+    8:    range(16384, 61440 + 1, 4096),
+    16:   range(32768, 122880 + 1, 8192),
+}
+# profile match keys, highest precedence first (see resolve_resources)
+RESOURCE_MATCH_KEYS = ("hs_version", "year", "stage")
+RESOURCE_KEYS       = ("vcpu", "memory", "cores")
+
+# Retry policy file keys -> SubmitJob evaluateOnExit keys, and the Batch limits
+RETRY_RULE_KEYS     = {"on_status_reason": "onStatusReason", "on_reason": "onReason", "on_exit_code": "onExitCode"}
+RETRY_ACTIONS       = ("RETRY", "EXIT")
+MAX_RETRY_RULES     = 5
+MAX_ATTEMPTS        = 10
+MIN_TIMEOUT_SECONDS = 60
+
+
+def analysis_years(hs_version):
+    """Return the analysis years of one HS version, e.g. "17" -> [2017, ..., 2023]."""
+    if hs_version not in HS_FIRST_YEAR:
+        raise ValueError(f"Unknown HS version '{hs_version}'. Expected one of {', '.join(HS_FIRST_YEAR)}")
+    return list(range(HS_FIRST_YEAR[hs_version], LAST_ANALYSIS_YEAR + 1))
+
+
+def parse_years(value, hs_versions):
+    """Set of analysis years from a comma-separated --years value, e.g. "2019,2020".
+
+    Raises ValueError naming the first value that is not a year or is not an
+    analysis year of any of hs_versions.
+    """
+    ranges = {hs_version: analysis_years(hs_version) for hs_version in hs_versions}
+    years = set()
+    for item in value.split(","):
+        item = item.strip()
+        try:
+            year = int(item)
+        except ValueError:
+            raise ValueError(f"'{item}' is not a year") from None
+        if not any(year in hs_years for hs_years in ranges.values()):
+            firsts = ", ".join(f"HS{hs_version} from {hs_years[0]}" for hs_version, hs_years in ranges.items())
+            raise ValueError(f"{year} is not an analysis year of the selected HS versions "
+                             f"({firsts}, through {LAST_ANALYSIS_YEAR})")
+        years.add(year)
+    return years
+
+
+def read_hs_versions():
+    """HS versions from the HS_VERSIONS environment variable, e.g. "02,07,12,17,96"."""
+    hs_env = os.environ.get("HS_VERSIONS")
+    if not hs_env:
+        print("HS_VERSIONS environment variable not set. Please export it before running this script.")
+        sys.exit(1)
+    return [hs.strip() for hs in hs_env.split(",") if hs.strip()]
+
+
+def create_batch_client():
+    return boto3.client("batch", region_name=os.environ.get("AWS_REGION", "us-east-1"))
+
+
+def environment(**variables):
+    """containerOverrides environment list from keyword arguments."""
+    return [{"name": name, "value": str(value)} for name, value in variables.items()]
+
+
+def depends_on(job_ids):
+    """dependsOn list for submit_job from a list of job IDs."""
+    return [{"jobId": job_id} for job_id in job_ids]
+
+
+# Resource profiles------------------------------------------------------------------
+
+def check_resources(resources, where="resource profile"):
+    """Raise ValueError unless resources is a vCPU/memory pair Fargate accepts, memory step included."""
+    vcpu, memory = resources.get("vcpu"), resources.get("memory")
+    if vcpu not in FARGATE_MEMORY_MIB:
+        raise ValueError(f"{where}: vcpu must be one of {', '.join(str(v) for v in FARGATE_MEMORY_MIB)}, got {vcpu}")
+    accepted = FARGATE_MEMORY_MIB[vcpu]
+    if not isinstance(memory, int) or memory not in accepted:
+        if isinstance(accepted, range):
+            allowed = f"{accepted.start}-{accepted[-1]} MiB in steps of {accepted.step}"
+        else:
+            allowed = f"one of {', '.join(str(m) for m in accepted)} MiB"
+        raise ValueError(f"{where}: memory for {vcpu} vCPU must be {allowed}, got {memory}")
+
+
+def load_resource_profiles(path=None):
+    """Resource profile file at path (or ARTIS_RESOURCE_PROFILES); None when neither is set.
+
+    {"default": {"vcpu": 16, "memory": 122880},
+     "profiles": [{"hs_version": "17", "vcpu": 4, "memory": 30720},
+                  {"hs_version": "96", "stage": "snet", "vcpu": 8, "memory": 61440, "cores": 6}]}
+
+    A profile applies to every job matching all of its hs_version / year /
+    stage keys; see resolve_resources().
+    """
+    path = path or os.environ.get("ARTIS_RESOURCE_PROFILES")
+    if not path:
+        return None
+    with open(path, "r") as f:
+        profiles = json.load(f)
+    if "default" in profiles:
+        check_resources(profiles["default"], f"{path}: default")
+    for rule in profiles.get("profiles", []):
+        unknown = set(rule) - set(RESOURCE_MATCH_KEYS) - set(RESOURCE_KEYS)
+        if unknown:
+            raise ValueError(f"{path}: unknown profile key(s) {', '.join(sorted(unknown))}")
+    return profiles
+
+
+def _profile_matches(rule, hs_version, year, stage):
+    return (("hs_version" not in rule or str(rule["hs_version"]) == hs_version)
+            and ("year" not in rule or (year is not None and int(rule["year"]) == year))
+            and ("stage" not in rule or rule["stage"] == stage))
+
+
+def _profile_rank(rule):
+    """Sort key of a profile: its number of match keys, then which keys by RESOURCE_MATCH_KEYS precedence."""
+    present = tuple(key in rule for key in RESOURCE_MATCH_KEYS)
+    return sum(present), present
+
+
+def resolve_resources(profiles, hs_version=None, years=None, stage=None):
+    """{vcpu, memory, cores} for a job, or None without profiles.
+
+    The default is overlaid by every matching profile, least specific first
+    (fewest match keys), so a year or stage profile can override just the
+    memory of its HS version's profile. Between profiles with as many keys,
+    hs_version outranks year and year outranks stage, so {"hs_version": "02"}
+    wins over {"stage": "snet"}; file order only breaks exact ties. An array job
+    covering several years shares one size, so it gets the largest of its
+    years. cores defaults to the vCPU count.
+    """
+    if profiles is None:
+        return None
+    candidates = []
+    for year in (years or [None]):
+        matches = [
+            (_profile_rank(rule), i, rule)
+            for i, rule in enumerate(profiles.get("profiles", []))
+            if _profile_matches(rule, hs_version, year, stage)
+        ]
+        resources = dict(profiles.get("default", {}))
+        for _, _, rule in sorted(matches, key=lambda m: m[:2]):
+            if "vcpu" in rule and "cores" not in rule:
+                # a core count only carries over with the vCPU size it was set for
+                resources.pop("cores", None)
+            resources.update({key: rule[key] for key in RESOURCE_KEYS if key in rule})
+        if not resources:
+            return None
+        resources.setdefault("cores", max(1, int(resources["vcpu"])))
+        label = " ".join(str(part) for part in (hs_version and f"HS{hs_version}", stage, year) if part)
+        check_resources(resources, label or "default")
+        candidates.append(resources)
+    return max(candidates, key=lambda r: (r["vcpu"], r["memory"]))
+
+
+def apply_resources(container_overrides, resources):
+    """Add resourceRequirements and ARTIS_NUM_CORES for resources to containerOverrides."""
+    if not resources:
+        return container_overrides
+    container_overrides["resourceRequirements"] = [
+        {"type": "VCPU", "value": str(resources["vcpu"])},
+        {"type": "MEMORY", "value": str(resources["memory"])}
+    ]
+    container_overrides.setdefault("environment", []).extend(
+        environment(ARTIS_NUM_CORES=resources["cores"])
+    )
+    return container_overrides
+
+
+def describe_resources(resources):
+    """Short "16 vCPU / 120 GB / 16 cores" label for printing."""
+    if not resources:
+        return "job definition default"
+    return f"{resources['vcpu']} vCPU / {resources['memory'] / 1024:g} GB / {resources['cores']} cores"
+
+
+# Retry policies---------------------------------------------------------------------
+
+def load_retry_policy(path=None):
+    """Retry policy file at path (or ARTIS_RETRY_POLICY); None when neither is set.
+
+    {"retry_strategy": {"attempts": 3,
+                        "evaluate_on_exit": [{"on_status_reason": "Host EC2*", "action": "retry"},
+                                             {"on_reason": "*", "action": "exit"}]},
+     "timeouts": {"solve": 259200, "combine": 21600},
+     "queues": {"default": ["artis-spot-job-queue", "artis-job-queue"], "combine": ["artis-job-queue"]}}
+
+    evaluate_on_exit rules are checked in order and the first match decides;
+    Batch retries a failed attempt that matches no rule, so end with a
+    catch-all. timeouts (attempt seconds) and queues are per stage ("solve",
+    "snet", "combine") with an optional "default".
+    """
+    path = path or os.environ.get("ARTIS_RETRY_POLICY")
+    if not path:
+        return None
+    with open(path, "r") as f:
+        policy = json.load(f)
+
+    unknown = set(policy) - {"retry_strategy", "timeouts", "queues"}
+    if unknown:
+        raise ValueError(f"{path}: unknown retry policy key(s) {', '.join(sorted(unknown))}")
+    strategy = policy.get("retry_strategy", {})
+    attempts = strategy.get("attempts", 1)
+    if not isinstance(attempts, int) or not 1 <= attempts <= MAX_ATTEMPTS:
+        raise ValueError(f"{path}: attempts must be 1-{MAX_ATTEMPTS}, got {attempts}")
+    rules = strategy.get("evaluate_on_exit", [])
+    if len(rules) > MAX_RETRY_RULES:
+        raise ValueError(f"{path}: Batch accepts at most {MAX_RETRY_RULES} evaluate_on_exit rules, got {len(rules)}")
+    for rule in rules:
+        if str(rule.get("action", "")).upper() not in RETRY_ACTIONS:
+            raise ValueError(f"{path}: evaluate_on_exit action must be retry or exit, got {rule.get('action')}")
+        if not set(rule) - {"action"} or set(rule) - {"action"} - set(RETRY_RULE_KEYS):
+            raise ValueError(f"{path}: evaluate_on_exit rule needs only {', '.join(RETRY_RULE_KEYS)} and action: {rule}")
+    for stage, seconds in policy.get("timeouts", {}).items():
+        if not isinstance(seconds, int) or seconds < MIN_TIMEOUT_SECONDS:
+            raise ValueError(f"{path}: {stage} timeout must be at least {MIN_TIMEOUT_SECONDS} seconds, got {seconds}")
+    for stage, queues in policy.get("queues", {}).items():
+        if not queues or not isinstance(queues, list):
+            raise ValueError(f"{path}: {stage} queues must be a non-empty list of job queue names")
+    return policy
+
+
+def _for_stage(table, stage):
+    return table.get(stage, table.get("default"))
+
+
+def apply_retry_policy(request, policy, stage):
+    """Add retryStrategy and timeout for stage to a submit_job request; returns its queues in order.
+
+    Without a policy the request keeps the job definition's retry strategy and
+    its jobQueue, which is the only queue.
+    """
+    if not policy:
+        return [request["jobQueue"]]
+    strategy = policy.get("retry_strategy")
+    if strategy:
+        request["retryStrategy"] = {"attempts": strategy.get("attempts", 1)}
+        rules = [
+            dict({RETRY_RULE_KEYS[key]: str(value) for key, value in rule.items() if key != "action"},
+                 action=rule["action"].upper())
+            for rule in strategy.get("evaluate_on_exit", [])
+        ]
+        if rules:
+            request["retryStrategy"]["evaluateOnExit"] = rules
+    seconds = _for_stage(policy.get("timeouts", {}), stage)
+    if seconds:
+        request["timeout"] = {"attemptDurationSeconds": seconds}
+    return _for_stage(policy.get("queues", {}), stage) or [request["jobQueue"]]
+
+
+_usable_queues = {}
+
+
+def usable_queues(batch, queues):
+    """The queues that are ENABLED and VALID, in the given order (one describe call per set)."""
+    cache_key = (id(batch), tuple(queues))
+    if cache_key not in _usable_queues:
+        response = batch.describe_job_queues(jobQueues=list(queues))
+        ready = {
+            q["jobQueueName"] for q in response.get("jobQueues", [])
+            if q.get("state") == "ENABLED" and q.get("status") == "VALID"
+        }
+        _usable_queues[cache_key] = [q for q in queues if q in ready]
+    return _usable_queues[cache_key]
+
+
+def describe_retry_policy(policy, stage):
+    """Short "3 attempts, 72h timeout" label for printing."""
+    if not policy:
+        return "job definition retries"
+    parts = [f"{policy.get('retry_strategy', {}).get('attempts', 1)} attempt(s)"]
+    seconds = _for_stage(policy.get("timeouts", {}), stage)
+    if seconds:
+        parts.append(f"{seconds / 3600:g}h timeout")
+    return ", ".join(parts)
+
+
+# Job submission---------------------------------------------------------------------
+
+def submit_job(batch, policy=None, stage=None, skip_queue=None, **request):
+    """batch.submit_job(**request) under the retry policy for stage.
+
+    The job goes to the first of the stage's queues that is ENABLED and VALID
+    (after skip_queue, when a resubmission should fall back to the next
+    queue); the queue used is returned as response["jobQueue"]. Each call is
+    logged as a "submit" timing event keyed by job name.
+    """
+    queues = apply_retry_policy(request, policy, stage)
+    if len(queues) > 1:
+        if skip_queue in queues and queues.index(skip_queue) < len(queues) - 1:
+            queues = queues[queues.index(skip_queue) + 1:]
+        ready = usable_queues(batch, queues)
+        if not ready:
+            raise RuntimeError(f"None of the job queues {', '.join(queues)} is ENABLED and VALID")
+        queues = ready
+    request["jobQueue"] = queues[0]
+
+    start = time.time()
+    try:
+        response = batch.submit_job(**request)
+    except Exception as e:
+        artis_events.emit("submit", key=request.get("jobName"), seconds=time.time() - start,
+                          status=artis_events.STATUS_FAILED, error=str(e), queue=request["jobQueue"])
+        raise
+    artis_events.emit("submit", key=request.get("jobName"), seconds=time.time() - start,
+                      retries=response.get("ResponseMetadata", {}).get("RetryAttempts", 0),
+                      job_id=response.get("jobId"), queue=request["jobQueue"])
+    response["jobQueue"] = request["jobQueue"]
+    return response
+
+
+def submit_hs_job(batch, hs_version, after=(), resources=None, policy=None, skip_queue=None):
+    """Submit one job that runs every year of an HS version (job_hs<yy>.sh)."""
+    return submit_job(
+        batch, policy, "solve", skip_queue,
+        jobName=f"artis-HS{hs_version}",
+        jobQueue=JOB_QUEUE,
+        jobDefinition=JOB_DEFINITION,
+        dependsOn=depends_on(after),
+        containerOverrides=apply_resources({
+            "command": ["bash", f"job_shell_scripts/job_hs{hs_version}.sh"]
+        }, resources)
+    )
+
+
+def submit_combine_job(batch, after=(), resources=None, policy=None, skip_queue=None):
+    """Submit the table combination job, optionally waiting on other job IDs.
+
+    Batch starts it as soon as every job in after has SUCCEEDED and fails it
+    without running if any of them fails.
+    """
+    return submit_job(
+        batch, policy, "combine", skip_queue,
+        jobName="artis-combine-tables",
+        jobQueue=JOB_QUEUE,
+        jobDefinition=JOB_DEFINITION,
+        dependsOn=depends_on(after),
+        containerOverrides=apply_resources({
+            "command": ["bash", "job_shell_scripts/job_combine_tables.sh"]
+        }, resources)
+    )
+
+
+def submit_hs_year_jobs(batch, hs_version, years, after=(), resources=None, policy=None, skip_queue=None):
+    """Submit one array job for an HS version with one child per analysis year.
+
+    Each child runs job_hs_year.sh, which picks its year out of ARTIS_HS_YEARS
+    using AWS_BATCH_JOB_ARRAY_INDEX. Batch arrays need at least two children,
+    so a single year is submitted as a plain job with ARTIS_ANALYSIS_YEAR set.
+    """
+    request = {
+        "jobName": f"artis-HS{hs_version}-years",
+        "jobQueue": JOB_QUEUE,
+        "jobDefinition": JOB_DEFINITION,
+        "dependsOn": depends_on(after),
+        "containerOverrides": {
+            "command": ["bash", "job_shell_scripts/job_hs_year.sh"],
+            "environment": environment(
+                HS_VERSION=hs_version,
+                ARTIS_HS_YEARS=",".join(str(y) for y in years)
+            )
+        }
+    }
+    if len(years) == 1:
+        request["jobName"] = f"artis-HS{hs_version}-{years[0]}"
+        request["containerOverrides"]["environment"] += environment(ARTIS_ANALYSIS_YEAR=years[0])
+    else:
+        request["arrayProperties"] = {"size": len(years)}
+    apply_resources(request["containerOverrides"], resources)
+    return submit_job(batch, policy, "solve", skip_queue, **request)
+
+
+def submit_restart_job(batch, hs_version, years=None, resources=None, policy=None):
+    """Submit a get_snet() restart of one HS version, optionally for some years only.
+
+    The HS version and years are passed as environment variables to
+    RESTART_SCRIPT instead of being baked into a per-HS copy of the script.
+    Missing country solutions are re-solved with submit_hs_year_jobs().
+    """
+    cmd = (
+        "source job_shell_scripts/prefetch.sh && "
+        "R -e \"source('docker_image_artis_pkg_download.R')\" && "
+        f"R -e \"source('{RESTART_SCRIPT}')\""
+    )
+    job_name = f"artis-restart-snet-HS{hs_version}"
+    if years and len(years) == 1:
+        job_name += f"-{years[0]}"
+    return submit_job(
+        batch, policy, "snet",
+        jobName=job_name,
+        jobQueue=JOB_QUEUE,
+        jobDefinition=JOB_DEFINITION,
+        containerOverrides=apply_resources({
+            "environment": environment(
+                AWS_REGION=os.environ.get("AWS_REGION", "us-east-1"),
+                ARTIS_HS_VERSION=hs_version,
+                ARTIS_YEARS=",".join(str(y) for y in years or [])
+            ),
+            "command": ["bash", "-lc", cmd]
+        }, resources)
+    )
+
+
+def describe_jobs(batch, job_ids):
+    """Return describe_jobs entries for job_ids, 100 IDs per API call."""
+    jobs = []
+    job_ids = list(job_ids)
+    for i in range(0, len(job_ids), DESCRIBE_JOBS_BATCH):
+        response = batch.describe_jobs(jobs=job_ids[i:i + DESCRIBE_JOBS_BATCH])
+        jobs.extend(response["jobs"])
+    return jobs
+
+
+def failed_array_indexes(batch, array_job_id):
+    """Array indexes of the FAILED children of an array job."""
+    indexes = []
+    paginator = batch.get_paginator("list_jobs")
+    for page in paginator.paginate(arrayJobId=array_job_id, jobStatus="FAILED"):
+        for job in page["jobSummaryList"]:
+            indexes.append(job["arrayProperties"]["index"])
+    return sorted(indexes)
+
+
+# Run files--------------------------------------------------------------------------
+
+def new_run_file(label):
+    """Path for a new run file, e.g. runs/20250602-141500_pipeline.json."""
+    os.makedirs(RUNS_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(RUNS_DIR, f"{stamp}_{label}.json")
+
+
+def latest_run_file():
+    """Most recent run file in RUNS_DIR, or None."""
+    run_files = sorted(
+        f for f in glob.glob(os.path.join(RUNS_DIR, "*.json"))
+        if not f.endswith("_stats.json")
+    )
+    return run_files[-1] if run_files else None
+
+
+def load_run(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_run(path, run):
+    """Write a run file atomically so a crash never leaves it half written."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(run, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def run_node(kind, response, **fields):
+    """Run file entry for a submitted job (kind is "hs", "restart", "combine", ...)."""
+    node = {"kind": kind, "job_id": response["jobId"], "job_name": response["jobName"],
+            "queue": response.get("jobQueue"), "history": []}
+    node.update(fields)
+    return node
+
+
+def record_run(label, nodes, **fields):
+    """Write a new run file for nodes ({name: run_node(...)}) and return its path."""
+    run = {"created": datetime.now().isoformat(timespec="seconds"), "nodes": nodes}
+    run.update(fields)
+    run_file = new_run_file(label)
+    save_run(run_file, run)
+    print(f"Submitted job IDs recorded in {run_file}")
+    return run_file
+
+
+def run_jobs(run):
+    """(label, job_id) for every job of a run, expanding array jobs into children.
+
+    Array children are addressed as "<array job id>:<index>" and labelled with
+    their analysis year, e.g. ("HS96/2005", "abc-123:9").
+    """
+    jobs = []
+    for name, node in run["nodes"].items():
+        years = node.get("years")
+        if node["kind"] == "hs" and years is not None and len(years) > 1:
+            for index, year in enumerate(years):
+                jobs.append((f"{name}/{year}", f"{node['job_id']}:{index}"))
+        else:
+            label = f"{name}/{years[0]}" if years and len(years) == 1 else name
+            jobs.append((label, node["job_id"]))
+    return jobs
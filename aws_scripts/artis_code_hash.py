@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+artis_code_hash.py
+
+Hash of the ARTIS R package sources in data_s3_upload/ARTIS_model_code/
+(DESCRIPTION, NAMESPACE and R/), shared by:
+
+ - s3_upload.py, which records it in S3 as ARTIS_model_code.sha256 after
+   uploading the code;
+ - docker_image_create_and_upload.py --with-package, which stages the package
+   into the build context so the image installs it at build time, stamped
+   with the same hash.
+
+docker_image_artis_pkg_download.R compares the image stamp with the hash in
+S3 at job start and only runs devtools::install() when they differ.
+
+    python3 artis_code_hash.py          # print the hash of the local code
+"""
+
+import os
+import sys
+import shutil
+import hashlib
+
+CODE_DIR      = os.path.join("data_s3_upload", "ARTIS_model_code")
+PACKAGE_PATHS = ("DESCRIPTION", "NAMESPACE", "R")
+CODE_HASH_KEY = "ARTIS_model_code.sha256"
+STAMP_FILE    = ".code_hash"
+HASH_CHUNK    = 1024 * 1024
+
+
+def package_files(code_dir=CODE_DIR):
+    """Sorted package file paths relative to code_dir."""
+    files = []
+    for name in PACKAGE_PATHS:
+        path = os.path.join(code_dir, name)
+        if os.path.isfile(path):
+            files.append(name)
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend(os.path.relpath(os.path.join(root, n), code_dir) for n in sorted(names))
+    return sorted(files)
+
+
+def code_hash(code_dir=CODE_DIR):
+    """SHA-256 over the relative path and contents of every package file, or None without a DESCRIPTION."""
+    if not os.path.isfile(os.path.join(code_dir, "DESCRIPTION")):
+        return None
+    digest = hashlib.sha256()
+    for rel_path in package_files(code_dir):
+        digest.update(rel_path.replace(os.sep, "/").encode() + b"\0")
+        with open(os.path.join(code_dir, rel_path), "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def stage_package(dest, code_dir=CODE_DIR):
+    """Copy the package files into dest (replacing it) and stamp it with their hash; returns the hash."""
+    digest = code_hash(code_dir)
+    if digest is None:
+        raise FileNotFoundError(f"No ARTIS package in {code_dir} (DESCRIPTION is missing)")
+    if os.path.exists(dest):
+        shutil.rmtree(dest)
+    for rel_path in package_files(code_dir):
+        os.makedirs(os.path.dirname(os.path.join(dest, rel_path)), exist_ok=True)
+        shutil.copyfile(os.path.join(code_dir, rel_path), os.path.join(dest, rel_path))
+    with open(os.path.join(dest, STAMP_FILE), "w") as f:
+        f.write(digest + "\n")
+    return digest
+
+
+if __name__ == "__main__":
+    digest = code_hash(sys.argv[1] if len(sys.argv) > 1 else CODE_DIR)
+    if digest is None:
+        sys.exit("No ARTIS package found (DESCRIPTION is missing)")
+    print(digest)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+artis_events.py
+
+Structured timing events shared by the setup runner, s3_upload.py, the
+download scripts, the job-start prefetcher, docker_image_create_and_upload.py
+and the Batch submit helpers, so an end-to-end run can be broken down by
+stage afterwards instead of read off the ✔/✘ lines.
+
+Each event is one JSON line appended to ARTIS_EVENTS_LOG (default
+artis_events.jsonl in the working directory; "off" disables it):
+
+    {"time": 1717337700.2, "run": "20250602-141500-4242", "pid": 4242,
+     "stage": "upload", "kind": "object", "key": "model_inputs/x.csv",
+     "bytes": 1048576, "seconds": 0.41, "retries": 0, "mb_per_s": 2.44,
+     "status": "ok"}
+
+kind is "stage" for a whole step (a setup stage, an upload or download run,
+an image build or push) and "object" for one S3 object, image layer or
+submitted job. Every process started under the same ARTIS_RUN_ID (the setup
+scripts' stages inherit it) logs the same run id.
+
+Summarize the latest run, or another one:
+
+    python3 artis_events.py
+    python3 artis_events.py --run 20250602-141500-4242 --slowest 20
+    python3 artis_events.py runs/artis_events.jsonl --runs
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import contextlib
+from datetime import datetime
+
+LOG_ENV     = "ARTIS_EVENTS_LOG"
+RUN_ENV     = "ARTIS_RUN_ID"
+DEFAULT_LOG = "artis_events.jsonl"
+DISABLED    = ("", "0", "off", "none")
+
+KIND_STAGE  = "stage"
+KIND_OBJECT = "object"
+
+STATUS_OK      = "ok"
+STATUS_FAILED  = "failed"
+STATUS_SKIPPED = "skipped"
+
+MB = 1024 * 1024
+
+_lock   = threading.Lock()
+_fds    = {}
+_broken = set()
+
+
+# ─── EMITTING ────────────────────────────────────────────────────────────────────
+
+def log_path():
+    """Path events are appended to, or None when ARTIS_EVENTS_LOG disables them."""
+    path = os.environ.get(LOG_ENV, DEFAULT_LOG)
+    return None if path.strip().lower() in DISABLED else path
+
+
+def run_id():
+    """This run's id, created on first use and exported so child processes share it."""
+    return os.environ.setdefault(RUN_ENV, f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}")
+
+
+def _write(path, line):
+    # one O_APPEND write per event, so concurrent processes never interleave lines
+    with _lock:
+        if path in _broken:
+            return
+        try:
+            fd = _fds.get(path)
+            if fd is None:
+                fd = _fds[path] = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            os.write(fd, line)
+        except OSError as e:
+            _broken.add(path)
+            print(f"✘ timing events disabled, cannot write {path}: {e}", file=sys.stderr)
+
+
+def emit(stage, key=None, size=None, seconds=None, retries=None, status=STATUS_OK, kind=KIND_OBJECT, **fields):
+    """Append one event; fields are added as-is. Never raises on I/O errors."""
+    path = log_path()
+    if path is None:
+        return
+    event = {"time": round(time.time(), 3), "run": run_id(), "pid": os.getpid(), "stage": stage, "kind": kind}
+    if key is not None:
+        event["key"] = key
+    if size is not None:
+        event["bytes"] = size
+    if seconds is not None:
+        event["seconds"] = round(seconds, 4)
+    if retries is not None:
+        event["retries"] = retries
+    if size and seconds:
+        event["mb_per_s"] = round(size / MB / seconds, 3)
+    event["status"] = status
+    event.update(fields)
+    _write(path, (json.dumps(event) + "\n").encode())
+
+
+@contextlib.contextmanager
+def timed(stage, key=None, **fields):
+    """Emit a stage event for the with-block.
+
+    The yielded dict is merged into the event, so the block can add "size",
+    "retries" or a "status" of its own. An exception or a non-zero
+    sys.exit() inside the block marks the event failed.
+    """
+    event = dict(fields)
+    start = time.time()
+    try:
+        yield event
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            event["status"] = STATUS_FAILED
+        raise
+    except BaseException as e:
+        event["status"] = STATUS_FAILED
+        event.setdefault("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        emit(stage, key=key, seconds=time.time() - start, kind=KIND_STAGE, **event)
+
+
+# ─── SUMMARY ─────────────────────────────────────────────────────────────────────
+
+def read_events(path):
+    """Every event in path; malformed lines (e.g. a write cut short) are skipped."""
+    events = []
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+
+def runs(events):
+    """[(run id, first start, last end, events)] in the order the runs started."""
+    by_run = {}
+    for event in events:
+        by_run.setdefault(event.get("run"), []).append(event)
+    summary = []
+    for run, run_events in by_run.items():
+        start = min(e["time"] - e.get("seconds", 0) for e in run_events)
+        end   = max(e["time"] for e in run_events)
+        summary.append((run, start, end, run_events))
+    return sorted(summary, key=lambda r: r[1])
+
+
+def stage_summary(events):
+    """{stage: totals} for the per-stage report; "failed" counts failed objects.
+
+    A stage's wall time is the sum of its stage events, or the span of its
+    object events when it logged none (e.g. the submit helpers).
+    """
+    stages = {}
+    for event in events:
+        s = stages.setdefault(event["stage"], {
+            "wall": 0.0, "steps": 0, "objects": 0, "bytes": 0,
+            "retries": 0, "failed": 0, "skipped": 0, "ok": True, "first": None, "last": None
+        })
+        start = event["time"] - event.get("seconds", 0)
+        s["first"] = start if s["first"] is None else min(s["first"], start)
+        s["last"]  = event["time"] if s["last"] is None else max(s["last"], event["time"])
+        if event["kind"] == KIND_STAGE:
+            s["steps"] += 1
+            s["wall"]  += event.get("seconds", 0)
+            s["ok"]    &= event.get("status") != STATUS_FAILED
+            continue
+        s["retries"] += event.get("retries", 0)
+        if event.get("status") == STATUS_SKIPPED:
+            s["skipped"] += 1
+            continue
+        s["objects"] += 1
+        if event.get("status") == STATUS_FAILED:
+            s["failed"] += 1
+            s["ok"] = False
+        if event.get("status") == STATUS_OK:
+            s["bytes"] += event.get("bytes", 0)
+    for s in stages.values():
+        if not s["steps"]:
+            s["wall"] = s["last"] - s["first"]
+    return stages
+
+
+def print_summary(run, start, end, events, slowest=10):
+    """Per-stage breakdown (slowest stage first) and the slowest objects of one run."""
+    elapsed = end - start
+    stages  = stage_summary(events)
+
+    print(f"─── RUN {run} ───")
+    print(f"Started {datetime.fromtimestamp(start):%Y-%m-%d %H:%M:%S}, "
+          f"{elapsed:.1f}s from first to last event, {len(events)} event(s)")
+
+    print("\n─── STAGES ───")
+    width = max([len(name) for name in stages] + [5])
+    print(f"  {'stage':<{width}} {'wall s':>9} {'% run':>6} {'objects':>8} {'MB':>10} {'MB/s':>8} "
+          f"{'retries':>8} {'failed':>7} {'skipped':>8}")
+    for name, s in sorted(stages.items(), key=lambda item: item[1]["wall"], reverse=True):
+        share = 100 * s["wall"] / elapsed if elapsed > 0 else 0.0
+        rate  = s["bytes"] / MB / s["wall"] if s["wall"] > 0 else 0.0
+        mark  = "✔" if s["ok"] else "✘"
+        print(f"{mark} {name:<{width}} {s['wall']:9.1f} {share:5.0f}% {s['objects']:8d} {s['bytes'] / MB:10.1f} "
+              f"{rate:8.2f} {s['retries']:8d} {s['failed']:7d} {s['skipped']:8d}")
+    if stages:
+        name, s = max(stages.items(), key=lambda item: item[1]["wall"])
+        print(f"Slowest stage: {name} ({s['wall']:.1f}s)")
+
+    objects = [e for e in events if e["kind"] == KIND_OBJECT and e.get("status") != STATUS_SKIPPED]
+    if objects:
+        print(f"\n─── SLOWEST {min(slowest, len(objects))} OBJECT(S) ───")
+        for e in sorted(objects, key=lambda e: e.get("seconds", 0), reverse=True)[:slowest]:
+            mark = "✘" if e.get("status") == STATUS_FAILED else "✔"
+            print(f"{mark} {e.get('seconds', 0):8.2f}s {e.get('bytes', 0) / MB:10.1f} MB "
+                  f"{e.get('mb_per_s', 0):8.2f} MB/s {e.get('retries', 0):3d} retries  "
+                  f"[{e['stage']}] {e.get('key', '')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize ARTIS timing events per stage and slowest object.")
+    parser.add_argument("log", nargs="?", default=None,
+                        help=f"Event log (default: {LOG_ENV}, else {DEFAULT_LOG})")
+    parser.add_argument("--run", help="Run id to summarize, or 'all' (default: the latest run)")
+    parser.add_argument("--runs", action="store_true", help="List the runs in the log and exit")
+    parser.add_argument("--slowest", type=int, default=10, help="Slowest objects to list (default 10)")
+    args = parser.parse_args()
+
+    path = args.log or log_path() or DEFAULT_LOG
+    if not os.path.isfile(path):
+        print(f"✘ No event log at {path}")
+        return 1
+    all_runs = runs(read_events(path))
+    if not all_runs:
+        print(f"✘ No events in {path}")
+        return 1
+
+    if args.runs:
+        for run, start, end, events in all_runs:
+            print(f"{run}  {datetime.fromtimestamp(start):%Y-%m-%d %H:%M:%S}  {end - start:9.1f}s  "
+                  f"{len(events)} event(s)  {', '.join(sorted({e['stage'] for e in events}))}")
+        return 0
+
+    if args.run == "all":
+        selected = all_runs
+    elif args.run:
+        selected = [r for r in all_runs if r[0] == args.run]
+        if not selected:
+            print(f"✘ No run {args.run} in {path}; list them with --runs")
+            return 1
+    else:
+        selected = all_runs[-1:]
+
+    for i, (run, start, end, events) in enumerate(selected):
+        if i:
+            print()
+        print_summary(run, start, end, events, args.slowest)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
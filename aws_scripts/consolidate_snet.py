@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+consolidate_snet.py
+
+Optional post-download stage that turns the per-year snet CSVs
+(outputs/snet/HS<VER>/<YEAR>/*.csv and the HS-level CSVs above them) into one
+Parquet dataset partitioned by HS version and year (needs pyarrow):
+
+    snet_parquet/W_long/hs_version=96/year=2004/W_long_2004_HS96.parquet
+    snet_parquet/V1_long/hs_version=96/V1_long_HS96.parquet
+
+Tables are named after the file with its run date, year and HS suffixes
+removed, so every year of W_long_<YEAR>_HS<VER>.csv lands in W_long/ and can
+be read with pyarrow.dataset / arrow::open_dataset() as one table.
+
+s3_download.py and s3_download_single_HS_dir.py run it with
+--consolidate DIR: each CSV is queued the moment its download completes and
+converted by a small worker pool while the transfer continues. Every CSV is
+streamed in blocks of --block-size-mb into its Parquet file, so memory stays
+at about workers x block size however large the download is.
+
+_summary.json in DIR records the rows, partition and schema of every source
+file, the total rows and schema of every table (flagging files whose schema
+differs), and lets re-runs skip unchanged sources. An existing download can
+be consolidated on its own:
+
+    python3 consolidate_snet.py outputs_2025-06-02 --output snet_parquet
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import artis_events
+from convert_model_inputs import convert_parquet, pq
+
+SUMMARY          = "_summary.json"
+DEFAULT_WORKERS  = 2
+DEFAULT_BLOCK_MB = 16
+MB = 1024 * 1024
+
+# .../snet/HS96/2004/W_long_2004_HS96.csv or .../snet/HS96/V1_long_HS96.csv
+# (a renamed single-HS download such as snet/HS96_2025-06-02/ matches too)
+SNET_CSV_RE = re.compile(r"(?:^|/)snet/HS(?P<hs_version>\d{2})[^/]*/(?:(?P<year>\d{4})/)?(?P<name>[^/]+)\.csv$")
+# run date prefix and _<YEAR>_HS<VER> / _HS<VER> suffix removed from table names
+TABLE_DATE_RE   = re.compile(r"^\d{4}-\d{2}-\d{2}_")
+TABLE_SUFFIX_RE = re.compile(r"(?:_\d{4})?_HS\d{2}$")
+
+
+def check_pyarrow():
+    """Exit with an install hint if pyarrow is missing."""
+    if pq is None:
+        sys.exit("--consolidate needs pyarrow: pip install pyarrow")
+
+
+def snet_partition(key):
+    """(table, partition dict, source name) for an snet CSV key, or None for anything else."""
+    match = SNET_CSV_RE.search(key)
+    if match is None:
+        return None
+    name = match.group("name")
+    table = TABLE_SUFFIX_RE.sub("", TABLE_DATE_RE.sub("", name))
+    partition = {"hs_version": match.group("hs_version")}
+    if match.group("year"):
+        partition["year"] = int(match.group("year"))
+    return table, partition, name
+
+
+class SnetConsolidator:
+    """Converts snet CSVs to the partitioned dataset on a worker pool as they are submitted.
+
+    submit(key, local_path) matches download_objects()' on_complete callback;
+    close() waits for the queued files and writes the summary.
+    """
+
+    def __init__(self, output_dir, workers=DEFAULT_WORKERS, block_size=DEFAULT_BLOCK_MB * MB):
+        check_pyarrow()
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir   = output_dir
+        self.block_size   = block_size
+        self.summary_path = os.path.join(output_dir, SUMMARY)
+        self.summary      = {"files": {}}
+        if os.path.isfile(self.summary_path):
+            with open(self.summary_path, "r") as f:
+                self.summary = json.load(f)
+            # entries are keyed by output path, whether the source came from S3 or a local directory
+            self.summary["files"] = {entry["path"]: entry for entry in self.summary["files"].values()}
+        self.converted = []  # (key, rows, seconds)
+        self.skipped   = 0
+        self.failures  = []  # (key, error)
+        self._lock     = threading.Lock()
+        self._pool     = ThreadPoolExecutor(max_workers=max(1, workers))
+
+    def submit(self, key, local_path):
+        """Queue one downloaded file; keys that are not snet CSVs are ignored."""
+        parsed = snet_partition(key)
+        if parsed is not None:
+            self._pool.submit(self._convert, key, local_path, *parsed)
+
+    def _convert(self, key, local_path, table, partition, name):
+        start = time.time()
+        part_dir = os.path.join(self.output_dir, table, *(f"{k}={v}" for k, v in partition.items()))
+        out_rel  = os.path.relpath(os.path.join(part_dir, f"{name}.parquet"), self.output_dir)
+        dst      = os.path.join(self.output_dir, out_rel)
+        path     = out_rel.replace(os.sep, "/")
+        try:
+            stat = os.stat(local_path)
+            with self._lock:
+                entry = self.summary["files"].get(path)
+            if (entry and entry["source_bytes"] == stat.st_size and entry["source_mtime"] == stat.st_mtime
+                    and os.path.isfile(dst)):
+                with self._lock:
+                    self.skipped += 1
+                return
+            os.makedirs(part_dir, exist_ok=True)
+            rows, schema = convert_parquet(local_path, dst + ".tmp", self.block_size)
+            os.replace(dst + ".tmp", dst)
+        except Exception as e:
+            if os.path.exists(dst + ".tmp"):
+                os.remove(dst + ".tmp")
+            with self._lock:
+                self.failures.append((key, str(e)))
+            artis_events.emit("consolidate", key=key, seconds=time.time() - start,
+                              status=artis_events.STATUS_FAILED, error=str(e))
+            print(f"✘ consolidate {key}: {e}")
+            return
+
+        seconds = time.time() - start
+        with self._lock:
+            self.summary["files"][path] = {
+                "source": key,
+                "table": table,
+                "partition": partition,
+                "path": path,
+                "rows": rows,
+                "source_bytes": stat.st_size,
+                "source_mtime": stat.st_mtime,
+                "bytes": os.path.getsize(dst),
+                "schema": schema
+            }
+            self.converted.append((key, rows, seconds))
+        artis_events.emit("consolidate", key=key, size=stat.st_size, seconds=seconds, rows=rows)
+        print(f"✔ {key} → {out_rel} ({rows} rows)")
+
+    def tables(self):
+        """{table: rows, files, partitions, schema, schema_mismatches} from the per-file summary."""
+        tables = {}
+        for path, entry in sorted(self.summary["files"].items()):
+            t = tables.setdefault(entry["table"], {
+                "rows": 0, "files": 0, "hs_versions": set(), "years": set(),
+                "schema": entry["schema"], "schema_mismatches": []
+            })
+            t["rows"]  += entry["rows"]
+            t["files"] += 1
+            t["hs_versions"].add(entry["partition"]["hs_version"])
+            if "year" in entry["partition"]:
+                t["years"].add(entry["partition"]["year"])
+            if entry["schema"] != t["schema"]:
+                t["schema_mismatches"].append(path)
+        for t in tables.values():
+            t["hs_versions"] = sorted(t["hs_versions"])
+            t["years"] = sorted(t["years"])
+        return tables
+
+    def close(self):
+        """Wait for every queued file, write _summary.json and print the summary; returns the tables."""
+        self._pool.shutdown(wait=True)
+        tables = self.tables()
+        self.summary["tables"] = tables
+        tmp_path = self.summary_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.summary, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.summary_path)
+
+        print("\n─── SNET PARQUET DATASET ───")
+        print(f"Converted {len(self.converted)} CSV(s), {self.skipped} unchanged, {len(self.failures)} failed "
+              f"→ {self.output_dir}")
+        for name, t in sorted(tables.items()):
+            years = f", years {t['years'][0]}-{t['years'][-1]}" if t["years"] else ""
+            mark = "✘" if t["schema_mismatches"] else "✔"
+            print(f"{mark} {name:<40} {t['rows']:>12} rows {t['files']:>5} file(s) "
+                  f"{len(t['schema'])} columns, HS {','.join(t['hs_versions'])}{years}")
+            if t["schema_mismatches"]:
+                print(f"    schema differs in {len(t['schema_mismatches'])} file(s), e.g. {t['schema_mismatches'][0]}")
+        for key, error in self.failures:
+            print(f"✘ {key}: {error}")
+        print(f"Summary: {self.summary_path}")
+        return tables
+
+
+def add_consolidate_arguments(parser):
+    """Add --consolidate and its tuning options to a download script's parser."""
+    parser.add_argument("--consolidate", metavar="DIR",
+                        help="Convert downloaded snet CSVs into a Parquet dataset in DIR, partitioned by "
+                             "HS version and year, while the download runs (needs pyarrow)")
+    parser.add_argument("--consolidate-workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"CSVs converted at the same time (default {DEFAULT_WORKERS})")
+    parser.add_argument("--block-size-mb", type=int, default=DEFAULT_BLOCK_MB,
+                        help=f"CSV block streamed per read in MB (default {DEFAULT_BLOCK_MB})")
+
+
+def consolidator_from_args(args):
+    """SnetConsolidator for parsed add_consolidate_arguments() options, or None without --consolidate."""
+    if not args.consolidate:
+        return None
+    return SnetConsolidator(args.consolidate, args.consolidate_workers, max(1, args.block_size_mb) * MB)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidate downloaded snet CSVs into a partitioned Parquet dataset.")
+    parser.add_argument("source", help="Downloaded outputs directory, e.g. outputs_2025-06-02 or outputs/snet/HS96")
+    parser.add_argument("--output", default="snet_parquet", help="Dataset directory (default snet_parquet)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"CSVs converted at the same time (default {DEFAULT_WORKERS})")
+    parser.add_argument("--block-size-mb", type=int, default=DEFAULT_BLOCK_MB,
+                        help=f"CSV block streamed per read in MB (default {DEFAULT_BLOCK_MB})")
+    args = parser.parse_args()
+
+    consolidator = SnetConsolidator(args.output, args.workers, max(1, args.block_size_mb) * MB)
+    # the local path stands in for the S3 key; it only has to contain snet/HS<VER>/...
+    source = os.path.abspath(args.source)
+    for root, dirs, names in os.walk(source):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            consolidator.submit(path.replace(os.sep, "/"), path)
+    consolidator.close()
+    return 1 if consolidator.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
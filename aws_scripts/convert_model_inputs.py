@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+convert_model_inputs.py
+
+Optional upload-side conversion of the CSV model inputs in
+data_s3_upload/model_inputs/ into compressed, partitioned copies under
+data_s3_upload/model_inputs_columnar/, which s3_upload.py uploads to the
+model_inputs_columnar/ prefix:
+
+ - parquet  (needs pyarrow): typed columns, zstd-compressed.
+ - csv.zst  (needs zstandard): the same CSV text, zstd-compressed.
+
+Files named like standardized_baci_seafood_hs96_y2004.csv are partitioned by
+HS version and year:
+
+    model_inputs_columnar/standardized_baci_seafood/hs_version=96/year=2004/standardized_baci_seafood.parquet
+
+Everything else keeps one file per table. _manifest.json records, per source
+CSV, its partition, output path, row count, byte sizes and column schema, and
+lets re-runs skip sources whose size and mtime are unchanged.
+
+    python3 aws_scripts/convert_model_inputs.py --format parquet
+    python3 aws_scripts/convert_model_inputs.py --format csv.zst --min-size-mb 10
+"""
+
+import os
+import re
+import sys
+import csv
+import argparse
+from s3_transfer import load_manifest, save_manifest
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pa_csv = pq = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SOURCE_DIR   = os.path.join("data_s3_upload", "model_inputs")
+OUTPUT_DIR   = os.path.join("data_s3_upload", "model_inputs_columnar")
+MANIFEST     = "_manifest.json"
+FORMATS      = ("parquet", "csv.zst")
+ZSTD_LEVEL   = 9
+STREAM_CHUNK = 1024 * 1024
+# CSV bytes parsed per Parquet record batch
+PARQUET_BLOCK = 16 * 1024 * 1024
+
+# HS codes, HS versions and ISO country codes, e.g. hs6, hs_version, exporter_iso3c;
+# read as strings so 030389 and 02 keep their leading zeros
+CODE_COLUMN_RE = re.compile(r"(?:^|_)(?:iso\w*|hs\d+|code)(?:_|$)|^hs_(?:version|code)$")
+
+# <table>_hs<VER>_y<YEAR>.csv, e.g. standardized_baci_seafood_hs96_y2004.csv
+PARTITIONED_RE = re.compile(r"^(?P<table>.+)_hs(?P<hs_version>\d{2})_y(?P<year>\d{4})\.csv$")
+
+
+def check_format(fmt):
+    """Exit with an install hint if the optional library for fmt is missing."""
+    if fmt == "parquet" and pq is None:
+        sys.exit("--format parquet needs pyarrow: pip install pyarrow")
+    if fmt == "csv.zst" and zstandard is None:
+        sys.exit("--format csv.zst needs zstandard: pip install zstandard")
+
+
+def source_csvs(source_dir, min_size):
+    """Relative paths of every CSV under source_dir of at least min_size bytes."""
+    paths = []
+    for root, dirs, names in os.walk(source_dir):
+        dirs.sort()
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            if name.endswith(".csv") and os.path.getsize(path) >= min_size:
+                paths.append(os.path.relpath(path, source_dir))
+    return paths
+
+
+def output_path(rel_path, fmt):
+    """(relative output path, partition dict) for a source CSV."""
+    directory, name = os.path.split(rel_path)
+    match = PARTITIONED_RE.match(name)
+    if match:
+        table = match.group("table")
+        partition = {"hs_version": match.group("hs_version"), "year": int(match.group("year"))}
+        part_dir = os.path.join(directory, table, f"hs_version={partition['hs_version']}", f"year={partition['year']}")
+    else:
+        table = name[:-len(".csv")]
+        partition = {}
+        part_dir = os.path.join(directory, table)
+    return os.path.join(part_dir, f"{table}.{fmt}"), partition
+
+
+def code_column_types(src):
+    """{column: pa.string()} for the code and ISO columns in src's header."""
+    with open(src, "r", encoding="utf-8-sig", newline="") as f:
+        header = next(csv.reader(f), [])
+    return {name: pa.string() for name in header if CODE_COLUMN_RE.search(name)}
+
+
+def convert_parquet(src, dst, block_size=PARQUET_BLOCK):
+    """Stream src into a zstd Parquet file block by block; returns (rows, schema).
+
+    Code and ISO columns are always strings; other column types are inferred
+    from the first block, so memory stays at about one block however large
+    the CSV is. consolidate_snet.py uses it too.
+    """
+    reader = pa_csv.open_csv(src, read_options=pa_csv.ReadOptions(block_size=block_size),
+                             convert_options=pa_csv.ConvertOptions(column_types=code_column_types(src)))
+    rows = 0
+    with pq.ParquetWriter(dst, reader.schema, compression="zstd") as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    schema = [{"name": field.name, "type": str(field.type)} for field in reader.schema]
+    return rows, schema
+
+
+def convert_csv_zst(src, dst):
+    """Stream src through zstd; returns (rows, schema) with column names only."""
+    rows = 0
+    with open(src, "rb") as fin:
+        header = fin.readline()
+        fin.seek(0)
+        with open(dst, "wb") as fout:
+            with zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=-1).stream_writer(fout) as writer:
+                for chunk in iter(lambda: fin.read(STREAM_CHUNK), b""):
+                    rows += chunk.count(b"\n")
+                    writer.write(chunk)
+    columns = header.decode("utf-8-sig").strip().split(",")
+    schema = [{"name": name.strip('"'), "type": None} for name in columns]
+    return max(rows - 1, 0), schema
+
+
+CONVERTERS = {"parquet": convert_parquet, "csv.zst": convert_csv_zst}
+
+
+def convert_all(source_dir, output_dir, fmt, min_size=0):
+    """Convert every changed CSV; returns (converted, skipped, source bytes, output bytes)."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    manifest = load_manifest(manifest_path)
+    tables = manifest.setdefault("tables", {})
+
+    converted = skipped = src_total = out_total = 0
+    try:
+        for rel_path in source_csvs(source_dir, min_size):
+            src = os.path.join(source_dir, rel_path)
+            out_rel, partition = output_path(rel_path, fmt)
+            dst = os.path.join(output_dir, out_rel)
+            stat = os.stat(src)
+
+            entry = tables.get(rel_path)
+            if (entry and entry["format"] == fmt and entry["source_bytes"] == stat.st_size
+                    and entry["source_mtime"] == stat.st_mtime and os.path.isfile(dst)):
+                skipped += 1
+                continue
+
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            rows, schema = CONVERTERS[fmt](src, dst + ".tmp")
+            os.replace(dst + ".tmp", dst)
+            # a format switch leaves the old output behind; remove it
+            if entry and entry["path"] != out_rel and os.path.isfile(os.path.join(output_dir, entry["path"])):
+                os.remove(os.path.join(output_dir, entry["path"]))
+
+            out_bytes = os.path.getsize(dst)
+            tables[rel_path] = {
+                "path": out_rel,
+                "format": fmt,
+                "partition": partition,
+                "rows": rows,
+                "source_bytes": stat.st_size,
+                "source_mtime": stat.st_mtime,
+                "bytes": out_bytes,
+                "schema": schema
+            }
+            converted += 1
+            src_total += stat.st_size
+            out_total += out_bytes
+            print(f"✔ {rel_path} → {out_rel} ({stat.st_size / 1e6:.1f} MB → {out_bytes / 1e6:.1f} MB, {rows} rows)")
+    finally:
+        save_manifest(manifest_path, manifest)
+
+    return converted, skipped, src_total, out_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert CSV model inputs to partitioned, compressed Parquet or csv.zst.")
+    parser.add_argument("--format", choices=FORMATS, default="parquet", help="Output format (default parquet)")
+    parser.add_argument("--source-dir", default=SOURCE_DIR, help=f"CSV inputs (default {SOURCE_DIR})")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR, help=f"Converted outputs (default {OUTPUT_DIR})")
+    parser.add_argument("--min-size-mb", type=float, default=0,
+                        help="Only convert CSVs at least this large (default: all)")
+    args = parser.parse_args()
+
+    check_format(args.format)
+    converted, skipped, src_total, out_total = convert_all(
+        args.source_dir, args.output_dir, args.format, int(args.min_size_mb * 1024 * 1024)
+    )
+
+    print("\n─── CONVERSION SUMMARY ───")
+    print(f"Converted {converted} file(s), {skipped} unchanged")
+    if converted:
+        print(f"{src_total / 1e6:.1f} MB of CSV → {out_total / 1e6:.1f} MB of {args.format} "
+              f"({src_total / max(out_total, 1):.1f}x smaller)")
+    print(f"Manifest: {os.path.join(args.output_dir, MANIFEST)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,76 +1,288 @@
+#!/usr/bin/env python3
+"""
+docker_image_create_and_upload.py
+
+Build the ARTIS Docker image and push it to AWS ECR, content-addressed:
+
+ 1. Hashes the Dockerfile, docker_image_files/ and docker_build/ (everything
+    the Dockerfile copies in) and uses the hash as the image tag.
+ 2. Asks ECR (describe_images) whether that tag already exists. If it does,
+    nothing changed: the build and push are skipped and only "latest" is
+    pointed at the existing image (a manifest copy, no layer upload).
+ 3. Otherwise builds the image (or reuses a local image with that tag),
+    streams the push with per-layer progress, fails on the first errorDetail
+    in the push stream, and retags "latest" in ECR.
+
+    python3 docker_image_create_and_upload.py              # build + push if changed
+    python3 docker_image_create_and_upload.py --force      # build + push regardless
+    python3 docker_image_create_and_upload.py -di <image>  # push an existing local image
+
+--build-only and --push-only split the two halves so the setup scripts can
+build while terraform is still creating the ECR repository, then push.
+
+--with-package copies the ARTIS package sources (DESCRIPTION, NAMESPACE, R/
+from data_s3_upload/ARTIS_model_code/) into docker_build/artis_pkg/ with their
+code hash (artis_code_hash.py). The Dockerfile copies that directory in just
+before its last layer and installs the package there, so a code change only
+rebuilds that layer, not the apt, pip and R dependency layers. The hash is
+kept as the image stamp, so jobs skip devtools::install() while the code in
+S3 has the same hash. Without --with-package the directory is left empty.
+
+The build and the push are logged as artis_events "image-build" and
+"image-push" stage events, and each pushed layer as an "image-push" object
+event with its size and push time.
+"""
+
 import os
+import sys
+import time
 import base64
+import shutil
+import hashlib
 import argparse
 import docker
 import boto3
+import artis_code_hash
+import artis_events
 
 LOCAL_REPOSITORY = "artis-image"
 
+# everything the Dockerfile can see; any change here produces a new tag
+BUILD_CONTEXT = ["Dockerfile", "docker_image_files", "docker_build"]
+HASH_CHUNK    = 1024 * 1024
+TAG_LENGTH    = 16
+
+# files copied in after the dependency layers (outside docker_image_files/, which is copied before them)
+BUILD_DIR     = "docker_build"
+# staged by --with-package; installed by the Dockerfile's last layer when present
+PACKAGE_DIR   = os.path.join(BUILD_DIR, "artis_pkg")
+
 # If someone only set AWS_ACCESS_KEY / AWS_SECRET_ACCESS_KEY, alias them:
 if 'AWS_ACCESS_KEY' in os.environ and 'AWS_ACCESS_KEY_ID' not in os.environ:
     os.environ['AWS_ACCESS_KEY_ID'] = os.environ['AWS_ACCESS_KEY']
 if 'AWS_SECRET_ACCESS_KEY' in os.environ and 'AWS_SECRET_ACCESS_KEY' not in os.environ:
     os.environ['AWS_SECRET_ACCESS_KEY'] = os.environ['AWS_SECRET_ACCESS_KEY']
 
-# Command line argument parsing
-parser = argparse.ArgumentParser()
-parser.add_argument("-di", "--docker_image", help="Existing Docker Image to reuse")
-args = parser.parse_args()
-existing_image = args.docker_image
-
-# Initialize Docker client
-# Note: Docker Desktop (or daemon) must be running
-docker_client = docker.from_env()
-
-# List current local Docker images
-docker_images = docker_client.images.list()
-print("Current Docker Images:")
-print(docker_images)
-
-# Build or reuse Docker image
-if existing_image:
-    docker_image = docker_client.images.get(existing_image)
-else:
-    docker_fp = "."
+
+def context_files(paths=BUILD_CONTEXT):
+    """Sorted list of every file in the build context."""
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names))
+    return sorted(files)
+
+
+def context_hash(paths=BUILD_CONTEXT):
+    """SHA-256 over the relative path and contents of every build context file."""
+    digest = hashlib.sha256()
+    for path in context_files(paths):
+        digest.update(path.replace(os.sep, "/").encode() + b"\0")
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def create_ecr_client():
+    """ECR client using the default credential chain and the configured region."""
+    session = boto3.session.Session()
+    aws_region = session.region_name or os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
+    if not aws_region:
+        raise RuntimeError("AWS region not set in environment or config.")
+    print(f"Using AWS region: {aws_region}")
+    return boto3.client("ecr", region_name=aws_region)
+
+
+def remote_image(ecr_client, repository, tag):
+    """describe_images entry for repository:tag, or None if ECR does not have it."""
+    try:
+        response = ecr_client.describe_images(repositoryName=repository, imageIds=[{"imageTag": tag}])
+    except (ecr_client.exceptions.ImageNotFoundException,
+            ecr_client.exceptions.RepositoryNotFoundException):
+        return None
+    details = response.get("imageDetails", [])
+    return details[0] if details else None
+
+
+def retag_remote(ecr_client, repository, source_tag, target_tag="latest"):
+    """Point target_tag at the image tagged source_tag without pulling or pushing layers."""
+    image = ecr_client.batch_get_image(
+        repositoryName=repository, imageIds=[{"imageTag": source_tag}]
+    )["images"][0]
+    try:
+        ecr_client.put_image(
+            repositoryName=repository,
+            imageManifest=image["imageManifest"],
+            imageManifestMediaType=image.get("imageManifestMediaType", "application/vnd.docker.distribution.manifest.v2+json"),
+            imageTag=target_tag
+        )
+        print(f"✔ {repository}:{target_tag} → {source_tag}")
+    except ecr_client.exceptions.ImageAlreadyExistsException:
+        print(f"✔ {repository}:{target_tag} already points at {source_tag}")
+
+
+def ecr_login(docker_client, ecr_client):
+    """Log the Docker client in to ECR; returns the registry host."""
+    # Remove any existing Docker auth config to avoid stale tokens
+    docker_config = os.path.join(os.environ.get("HOME", "~"), ".docker/config.json")
+    if os.path.exists(docker_config):
+        os.remove(docker_config)
+
+    auth_data = ecr_client.get_authorization_token()["authorizationData"][0]
+    ecr_username, ecr_password = base64.b64decode(auth_data["authorizationToken"]).decode().split(':')
+    ecr_url = auth_data["proxyEndpoint"].replace("https://", "")
+    print("Got AWS ECR login token")
+
+    docker_client.login(username=ecr_username, password=ecr_password, registry=ecr_url, reauth=True)
+    print("Docker logged in and authenticated with ECR")
+    return ecr_url
+
+
+def local_image(docker_client, name):
+    try:
+        return docker_client.images.get(name)
+    except docker.errors.ImageNotFound:
+        return None
+
+
+def build_image(docker_client, repository, tag, docker_fp="."):
+    """Build the image from docker_fp, streaming the build log; returns the image."""
     print(f"Starting to build docker image based on Dockerfile at: {docker_fp}")
-    docker_image, _ = docker_client.images.build(path=docker_fp, tag=LOCAL_REPOSITORY)
-    docker_images = docker_client.images.list()
-    print("Current Docker Images:")
-    print(docker_images)
-
-# Remove any existing Docker auth config to avoid stale tokens
-docker_config = os.path.join(os.environ.get("HOME", "~"), ".docker/config.json")
-if os.path.exists(docker_config):
-    os.remove(docker_config)
-
-# Determine AWS region
-session = boto3.session.Session()
-aws_region = session.region_name or os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")
-if not aws_region:
-    raise RuntimeError("AWS region not set in environment or config.")
-print(f"Using AWS region: {aws_region}")
-
-# Create ECR client using default credential chain
-# This will pick up credentials from ~/.aws/credentials, env vars, or instance role
-ecr_client = boto3.client("ecr", region_name=aws_region)
-
-# Fetch ECR auth token and login to AWS ECR
-auth_data = ecr_client.get_authorization_token()["authorizationData"][0]
-ecr_username, ecr_password = base64.b64decode(auth_data["authorizationToken"]).decode().split(':')
-ecr_url = auth_data["proxyEndpoint"].replace("https://", "")
-print("Got AWS ECR login token")
-
-docker_client.login(username=ecr_username, password=ecr_password, registry=ecr_url, reauth=True)
-print("Docker logged in and authenticated with ECR")
-
-# Tag and push image to AWS ECR
-ecr_repo = f"{ecr_url}/{LOCAL_REPOSITORY}"
-docker_image.tag(ecr_repo, tag='latest')
-print(f"Pushing local image {LOCAL_REPOSITORY} to AWS ECR: {ecr_repo}")
-
-push_log = docker_client.images.push(ecr_repo, tag='latest')
-print(push_log)
-if "error" in push_log.lower():
-    print("Failed to upload docker image to ECR.")
-else:
-    print("Successfully uploaded docker image to ECR.")
+    for line in docker_client.api.build(path=docker_fp, tag=f"{repository}:{tag}", rm=True, decode=True):
+        if "errorDetail" in line:
+            raise RuntimeError(f"Docker build failed: {line['errorDetail'].get('message', line)}")
+        if line.get("stream", "").strip():
+            print(line["stream"], end="")
+    return docker_client.images.get(f"{repository}:{tag}")
+
+
+def push_image(docker_client, repository, tag):
+    """Push repository:tag, printing each layer's status changes; returns the pushed digest."""
+    layers  = {}
+    started = {}  # layer -> (first "Pushing" time, total bytes)
+    digest  = None
+    for line in docker_client.api.push(repository, tag=tag, stream=True, decode=True):
+        if "errorDetail" in line or "error" in line:
+            message = line.get("errorDetail", {}).get("message") or line.get("error")
+            raise RuntimeError(f"Docker push failed: {message}")
+        if "aux" in line:
+            digest = line["aux"].get("Digest")
+            continue
+        layer  = line.get("id")
+        status = line.get("status", "")
+        if not layer or status.startswith("The push refers to"):
+            continue
+        # only print transitions (Preparing → Pushing → Pushed), not every progress tick
+        progress = line.get("progressDetail") or {}
+        if status == "Pushing":
+            first, _ = started.get(layer, (time.time(), None))
+            started[layer] = (first, progress.get("total"))
+        elif status == "Pushed" and layer in started:
+            first, size = started.pop(layer)
+            artis_events.emit("image-push", key=layer, size=size, seconds=time.time() - first)
+        if layers.get(layer) != status:
+            layers[layer] = status
+            total = f" ({progress['total'] / 1024 / 1024:.1f} MB)" if progress.get("total") else ""
+            print(f"  {layer}: {status}{total}")
+
+    pushed   = sum(status == "Pushed" for status in layers.values())
+    existing = sum(status == "Layer already exists" for status in layers.values())
+    print(f"{len(layers)} layer(s): {pushed} pushed, {existing} already in ECR")
+    return digest
+
+
+def main():
+    # Command line argument parsing
+    parser = argparse.ArgumentParser(description="Build the ARTIS image and push it to ECR if its content changed.")
+    parser.add_argument("-di", "--docker_image", help="Existing Docker Image to reuse")
+    parser.add_argument("--force", action="store_true",
+                        help="Build and push even if ECR already has an image for this build context")
+    stage = parser.add_mutually_exclusive_group()
+    stage.add_argument("--build-only", action="store_true",
+                       help="Build (or reuse) the local image and stop before pushing")
+    stage.add_argument("--push-only", action="store_true",
+                       help="Push the local image built by --build-only")
+    parser.add_argument("--with-package", action="store_true",
+                        help=f"Pre-install the ARTIS R package from {artis_code_hash.CODE_DIR} in the image")
+    args = parser.parse_args()
+    existing_image = args.docker_image
+
+    # Stage before hashing so a code change produces a new tag
+    if args.with_package and not existing_image:
+        try:
+            code_hash = artis_code_hash.stage_package(PACKAGE_DIR)
+        except FileNotFoundError as e:
+            print(f"✘ {e}")
+            return 1
+        print(f"Staged ARTIS package {code_hash[:TAG_LENGTH]} in {PACKAGE_DIR}")
+    elif not existing_image:
+        # the Dockerfile always copies PACKAGE_DIR; empty it so an earlier --with-package run is not installed
+        if os.path.exists(PACKAGE_DIR):
+            shutil.rmtree(PACKAGE_DIR)
+        os.makedirs(PACKAGE_DIR)
+
+    # Initialize Docker client
+    # Note: Docker Desktop (or daemon) must be running
+    docker_client = docker.from_env()
+    ecr_client = create_ecr_client()
+
+    # Content address: the build context hash, or the image ID of a reused image
+    if existing_image:
+        docker_image = docker_client.images.get(existing_image)
+        image_tag = docker_image.id.split(":")[-1][:TAG_LENGTH]
+    else:
+        docker_image = None
+        image_tag = context_hash()[:TAG_LENGTH]
+    print(f"Image tag: {LOCAL_REPOSITORY}:{image_tag}")
+
+    if not args.force and remote_image(ecr_client, LOCAL_REPOSITORY, image_tag):
+        print(f"ECR already has {LOCAL_REPOSITORY}:{image_tag}; skipping build and push.")
+        if not args.build_only:
+            retag_remote(ecr_client, LOCAL_REPOSITORY, image_tag)
+        return 0
+
+    # Build or reuse Docker image
+    if docker_image is None and args.push_only:
+        docker_image = local_image(docker_client, f"{LOCAL_REPOSITORY}:{image_tag}")
+        if docker_image is None:
+            print(f"✘ No local image {LOCAL_REPOSITORY}:{image_tag}; run with --build-only first.")
+            return 1
+    elif docker_image is None:
+        docker_image = None if args.force else local_image(docker_client, f"{LOCAL_REPOSITORY}:{image_tag}")
+        if docker_image is not None:
+            print(f"Reusing local image {LOCAL_REPOSITORY}:{image_tag}")
+        else:
+            with artis_events.timed("image-build", key=f"{LOCAL_REPOSITORY}:{image_tag}"):
+                docker_image = build_image(docker_client, LOCAL_REPOSITORY, image_tag)
+    docker_image.tag(LOCAL_REPOSITORY, tag="latest")
+    if args.build_only:
+        print(f"Built {LOCAL_REPOSITORY}:{image_tag}; push with --push-only.")
+        return 0
+
+    # Tag and push image to AWS ECR
+    ecr_url  = ecr_login(docker_client, ecr_client)
+    ecr_repo = f"{ecr_url}/{LOCAL_REPOSITORY}"
+    docker_image.tag(ecr_repo, tag=image_tag)
+    print(f"Pushing local image {LOCAL_REPOSITORY}:{image_tag} to AWS ECR: {ecr_repo}")
+
+    try:
+        with artis_events.timed("image-push", key=f"{LOCAL_REPOSITORY}:{image_tag}"):
+            digest = push_image(docker_client, ecr_repo, image_tag)
+    except RuntimeError as e:
+        print(f"✘ {e}")
+        print("Failed to upload docker image to ECR.")
+        return 1
+
+    retag_remote(ecr_client, LOCAL_REPOSITORY, image_tag)
+    print(f"Successfully uploaded docker image to ECR ({digest or image_tag}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,68 +1,93 @@
 # libraries
 import os
-import boto3
+import sys
+import argparse
+import itertools
 from datetime import date
-import time  # Import the time module
+import s3_transfer
+import s3_index
+import consolidate_snet
 
-# Functions=======================================================================
+# Command line argument parsing
+parser = argparse.ArgumentParser(description="Download the outputs/ prefix of the ARTIS S3 bucket.")
+s3_transfer.add_download_arguments(parser)
+parser.add_argument("--use-index", action="store_true",
+                    help="Take the object list from the local S3 listing index (s3_index.py) instead of listing S3")
+s3_index.add_index_arguments(parser)
+s3_transfer.add_filter_arguments(parser)
+consolidate_snet.add_consolidate_arguments(parser)
+args = parser.parse_args()
+download_kwargs = s3_transfer.download_kwargs(args)
 
-# Create an S3 client based on region
-def create_s3_client(region=None):
-    s3_client = None
-    if region is None:
-        # Create an S3 bucket client in the default region in the aws config file
-        s3_client = boto3.client("s3")
-    else:
-        # Create an S3 bucket client in a specific AWS region
-        s3_client = boto3.client("s3", region_name=region)
-    return s3_client
-#==================================================================================
+# --include/--exclude/--hs/--year/--solver/--max-size-mb selection, applied to the listing
+key_filter = s3_transfer.filter_from_args(parser, args)
 
-# Define AWS region
-region = "us-east-1"
+# Define AWS region (ARTIS_S3_REGION / AWS_REGION, default us-east-1)
+region = s3_transfer.resolve_region()
 
-# Define bucket name
-artis_bucket_name = "s3_bucket_name"
+# Define bucket name (ARTIS_S3_BUCKET overrides the templated default)
+artis_bucket_name = "artis-s3-bucket"
+artis_bucket_name = s3_transfer.resolve_bucket(artis_bucket_name)
 
-# Create an S3 client to interact with AWS S3
-s3_client = create_s3_client(region=region)
+# Record of completed downloads (size, mtime, ETag) used by --resume
+download_manifest = ".s3_download_manifest.json"
 
-# Start the timer
-start_time = time.time()
+# Shared S3 client with one pooled connection per download worker
+s3_client = s3_transfer.get_s3_client(region=region, max_pool_connections=download_kwargs["workers"])
 
-# Create a paginator to iterate through S3 bucket objects
-paginator = s3_client.get_paginator('list_objects_v2')
-# Create a PageIterator from the Paginator
-paginator_config = {
-    "Bucket": artis_bucket_name,
-    "Prefix": "outputs/" # only list objects within the outputs directory
-}
-page_iterator = paginator.paginate(**paginator_config)
+# List objects within the outputs directory (only the solver/HS subtrees --solver and --hs
+# select) and download them while listing continues, or read the listing from the local
+# index when it is fresh enough
+prefixes = key_filter.prefixes("outputs/")
+if args.use_index:
+    index = s3_index.open_index(s3_client, artis_bucket_name, prefixes,
+                                args.index, args.index_ttl, args.refresh_index)
+    objects = itertools.chain.from_iterable(index.objects(prefix) for prefix in prefixes)
+else:
+    objects = itertools.chain.from_iterable(
+        s3_transfer.iter_objects(s3_client, artis_bucket_name, prefix) for prefix in prefixes
+    )
+objects = key_filter.apply(objects)
 
-for page in page_iterator:
-    # Get contents from page
-    page_contents = page["Contents"]
-    # Iterate over contents and create directories when needed otherwise download file
-    for item in page_contents:
-        if item['Key'][-1] == "/":
-            print(f"Creating directory {item['Key']}")
-            os.makedirs(item['Key'], exist_ok=True)
-        else:
-            # Ensure the directory exists before downloading the file
-            dir_name = os.path.dirname(item['Key'])
-            if not os.path.exists(dir_name):
-                os.makedirs(dir_name)
-            print(f"Downloading file {item['Key']}")
-            s3_client.download_file(artis_bucket_name, item['Key'], item['Key'])
+# Size estimate of the selection without moving any bytes
+if args.dry_run:
+    s3_transfer.print_selection(objects)
+    sys.exit(0)
 
-# Rename outputs directory with today's date
-today = date.today()
-print(f"Adding date {today} to outputs directory")
-os.rename("outputs", f"outputs_{today}")
+# Optional snet CSV → Parquet conversion, fed by each finished download
+consolidator = consolidate_snet.consolidator_from_args(args)
+stats = s3_transfer.download_objects(
+    s3_client,
+    artis_bucket_name,
+    objects,
+    local_path_for=lambda key: key,
+    manifest_path=download_manifest,
+    on_complete=consolidator.submit if consolidator else None,
+    **download_kwargs
+)
 
-# Stop the timer and calculate the elapsed time
-end_time = time.time()
-elapsed_time = end_time - start_time
-print(f"Download completed in {elapsed_time:.2f} seconds.")
+# Print throughput summary
+s3_transfer.print_download_summary(stats)
+if key_filter.active:
+    print(f"Selected {key_filter.kept} object(s) ({key_filter.kept_bytes / s3_transfer.MB:.1f} MB), "
+          f"filtered out {key_filter.dropped}")
+
+# Wait for the last conversions; a failed conversion never fails the download
+if consolidator:
+    consolidator.close()
+
+# Only date-stamp a complete copy; a partial outputs/ stays in place for --resume
+if stats.failures:
+    print("Some files failed to download. Re-run with --resume to fetch only the missing files.")
+    sys.exit(1)
+
+# Rename outputs directory with today's date; a filtered selection is not a full copy,
+# so it stays in outputs/ where later (filtered or full) runs add to it
+if key_filter.active:
+    print("Filtered download: outputs/ is not date-stamped")
+elif os.path.isdir("outputs"):
+    today = date.today()
+    print(f"Adding date {today} to outputs directory")
+    os.rename("outputs", f"outputs_{today}")
 
 print("Done!")
@@ -4,73 +4,96 @@
 # s3_download.py
 import os
 import sys
-import time
+import argparse
 from datetime import date
-import boto3
+import s3_transfer
+import s3_index
+import consolidate_snet
 
-def create_s3_client():
-    # Region from env or default
-    region = os.environ.get("ARTIS_S3_REGION") \
-          or os.environ.get("AWS_REGION") \
-          or os.environ.get("AWS_DEFAULT_REGION") \
-          or "us-east-1"
-    return boto3.client("s3", region_name=region)
+# Record of completed downloads (size, mtime, ETag) used by --resume
+DOWNLOAD_MANIFEST = ".s3_download_manifest.json"
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python s3_download.py <HSxx>   e.g., python s3_download.py HS12")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Download outputs/snet/<HSxx>/ from S3, e.g. python s3_download_single_HS_dir.py HS12"
+    )
+    parser.add_argument("hs_folder", help="HS version folder, e.g. HS12")
+    s3_transfer.add_download_arguments(parser)
+    parser.add_argument("--use-index", action="store_true",
+                        help="Take the object list from the local S3 listing index (s3_index.py) instead of listing S3")
+    s3_index.add_index_arguments(parser)
+    s3_transfer.add_filter_arguments(parser)
+    consolidate_snet.add_consolidate_arguments(parser)
+    args = parser.parse_args()
+    download_kwargs = s3_transfer.download_kwargs(args)
+    key_filter = s3_transfer.filter_from_args(parser, args)
 
-    hs_folder = sys.argv[1].strip("/ ")
+    hs_folder = args.hs_folder.strip("/ ")
 
-    bucket     = os.environ.get("ARTIS_S3_BUCKET", "artis-s3-bucket")
+    bucket     = s3_transfer.resolve_bucket()
     root_prefix = os.environ.get("ARTIS_S3_ROOT_PREFIX", "outputs/snet").strip("/ ")
     s3_prefix  = f"{root_prefix}/{hs_folder}/"  # e.g., outputs/snet/HS12/
     dest_root  = os.environ.get("ARTIS_DEST_ROOT", s3_prefix.rstrip("/"))
     no_rename  = os.environ.get("ARTIS_NO_RENAME", "0") == "1"
 
-    s3 = create_s3_client()
+    s3 = s3_transfer.get_s3_client(max_pool_connections=download_kwargs["workers"])
 
     print(f"Bucket: s3://{bucket}")
     print(f"S3 prefix: {s3_prefix}")
     print(f"Local dest root: {dest_root}")
 
+    def local_path_for(key):
+        return os.path.join(dest_root, os.path.relpath(key, s3_prefix))
+
+    # downloads start while later listing pages are still being fetched,
+    # unless the listing comes from the local index
+    if args.use_index:
+        index = s3_index.open_index(s3, bucket, [s3_prefix], args.index, args.index_ttl, args.refresh_index)
+        objects = index.objects(s3_prefix)
+    else:
+        objects = s3_transfer.iter_objects(s3, bucket, s3_prefix)
+    # --include/--exclude/--year/--max-size-mb narrow the listing before anything is fetched
+    objects = key_filter.apply(objects)
+
+    if args.dry_run:
+        s3_transfer.print_selection(objects)
+        return
+
     os.makedirs(dest_root, exist_ok=True)
+    consolidator = consolidate_snet.consolidator_from_args(args)
+    stats = s3_transfer.download_objects(
+        s3, bucket, objects, local_path_for,
+        manifest_path=DOWNLOAD_MANIFEST,
+        stage="download-hs",
+        on_complete=consolidator.submit if consolidator else None,
+        **download_kwargs
+    )
 
-    start = time.time()
-    paginator = s3.get_paginator("list_objects_v2")
-    pages = paginator.paginate(Bucket=bucket, Prefix=s3_prefix)
-
-    downloaded = 0
-    for page in pages:
-        contents = page.get("Contents", [])
-        if not contents:
-            continue
-        for obj in contents:
-            key = obj["Key"]
-            if key.endswith("/"):
-                continue  # skip folder placeholders
-
-            rel = os.path.relpath(key, s3_prefix)
-            local_path = os.path.join(dest_root, rel)
-            os.makedirs(os.path.dirname(local_path), exist_ok=True)
-
-            print(f"Downloading s3://{bucket}/{key} -> {local_path}")
-            s3.download_file(bucket, key, local_path)
-            downloaded += 1
-
-    if downloaded == 0:
+    s3_transfer.print_download_summary(stats)
+    if key_filter.active:
+        print(f"Selected {key_filter.kept} object(s) ({key_filter.kept_bytes / s3_transfer.MB:.1f} MB), "
+              f"filtered out {key_filter.dropped}")
+
+    # converted while downloading; only the tail of the queue is left here
+    if consolidator:
+        consolidator.close()
+
+    if stats.failures:
+        # leave dest_root un-renamed so a --resume run finds the partial copy
+        print("Some files failed to download. Re-run with --resume to fetch only the missing files.")
+        sys.exit(1)
+
+    if not stats.files and not stats.skipped:
         print(f"No objects found under s3://{bucket}/{s3_prefix}")
-    else:
-        print(f"Downloaded {downloaded} file(s).")
-        if not no_rename:
-            parent = os.path.dirname(dest_root.rstrip("/"))
-            base   = os.path.basename(dest_root.rstrip("/"))
-            new_dest = os.path.join(parent, f"{base}_{date.today()}")
-            print(f"Renaming {dest_root} -> {new_dest}")
-            os.rename(dest_root, new_dest)
-
-    print(f"Completed in {time.time() - start:.2f} seconds.")
+    elif key_filter.active:
+        # only part of the HS folder; keep it where later runs can add to it
+        print(f"Filtered download: {dest_root} is not date-stamped")
+    elif not no_rename:
+        parent = os.path.dirname(dest_root.rstrip("/"))
+        base   = os.path.basename(dest_root.rstrip("/"))
+        new_dest = os.path.join(parent, f"{base}_{date.today()}")
+        print(f"Renaming {dest_root} -> {new_dest}")
+        os.rename(dest_root, new_dest)
 
 if __name__ == "__main__":
     main()
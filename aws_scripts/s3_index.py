@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+s3_index.py
+
+Local SQLite index of an S3 bucket listing, so listing-heavy steps (restart
+planning, downloads) answer "which keys exist under this prefix / match this
+pattern" from one cached list_objects_v2 pass instead of listing again.
+
+ - S3Index.refresh() runs one paginated listing of a prefix (the whole bucket
+   by default) and stores key, size, ETag and last-modified time.
+ - S3Index.ensure() refreshes only when no listing covering the prefix is
+   younger than the TTL (ARTIS_S3_INDEX_TTL seconds, default 3600).
+ - S3Index.objects() yields entries shaped like list_objects_v2 "Contents"
+   items, filtered by prefix and optionally by regex, so they can be passed
+   straight to s3_transfer.download_objects().
+
+    python3 s3_index.py refresh --prefix outputs/
+    python3 s3_index.py query --prefix outputs/snet/HS96/ --regex '_consumption_\\d{4}_HS96\\.qs$'
+"""
+
+import os
+import re
+import sys
+import time
+import sqlite3
+import argparse
+import s3_transfer
+
+DEFAULT_INDEX_PATH = ".s3_index.sqlite"
+DEFAULT_TTL        = 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    bucket        TEXT NOT NULL,
+    key           TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    etag          TEXT NOT NULL,
+    last_modified TEXT NOT NULL,
+    PRIMARY KEY (bucket, key)
+);
+CREATE TABLE IF NOT EXISTS listings (
+    bucket    TEXT NOT NULL,
+    prefix    TEXT NOT NULL,
+    listed_at REAL NOT NULL,
+    PRIMARY KEY (bucket, prefix)
+);
+"""
+
+
+def resolve_ttl(default=DEFAULT_TTL):
+    """Index TTL in seconds: ARTIS_S3_INDEX_TTL, then default."""
+    return float(os.environ.get("ARTIS_S3_INDEX_TTL", default))
+
+
+def _prefix_range(prefix):
+    """Half-open key range [prefix, upper) so prefix lookups use the primary key."""
+    if not prefix:
+        return "", None
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _regexp(pattern, value):
+    return re.search(pattern, value) is not None
+
+
+class S3Index:
+    """SQLite-backed listing of one bucket."""
+
+    def __init__(self, bucket, path=DEFAULT_INDEX_PATH):
+        self.bucket = bucket
+        self.path   = path
+        self.conn   = sqlite3.connect(path)
+        self.conn.create_function("REGEXP", 2, _regexp, deterministic=True)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def listed_at(self, prefix=""):
+        """Time of the newest listing covering prefix, or None."""
+        rows = self.conn.execute(
+            "SELECT prefix, listed_at FROM listings WHERE bucket = ?", (self.bucket,)
+        ).fetchall()
+        times = [listed for listed_prefix, listed in rows if prefix.startswith(listed_prefix)]
+        return max(times, default=None)
+
+    def is_fresh(self, prefix="", ttl=None):
+        listed = self.listed_at(prefix)
+        ttl = resolve_ttl() if ttl is None else ttl
+        return listed is not None and time.time() - listed < ttl
+
+    def refresh(self, s3, prefix=""):
+        """Replace the indexed entries under prefix with one fresh listing; returns the count."""
+        start = time.time()
+        low, high = _prefix_range(prefix)
+        rows = (
+            (self.bucket, obj["Key"], obj["Size"], obj["ETag"].strip('"'), obj["LastModified"].isoformat())
+            for obj in s3_transfer.iter_objects(s3, self.bucket, prefix)
+        )
+        with self.conn:
+            if high is None:
+                self.conn.execute("DELETE FROM objects WHERE bucket = ?", (self.bucket,))
+            else:
+                self.conn.execute(
+                    "DELETE FROM objects WHERE bucket = ? AND key >= ? AND key < ?",
+                    (self.bucket, low, high)
+                )
+            self.conn.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?)", rows)
+            self.conn.execute(
+                "INSERT OR REPLACE INTO listings VALUES (?, ?, ?)", (self.bucket, prefix, start)
+            )
+        return self.count(prefix)
+
+    def ensure(self, s3, prefix="", ttl=None):
+        """Refresh prefix unless a listing covering it is younger than ttl."""
+        if not self.is_fresh(prefix, ttl):
+            count = self.refresh(s3, prefix)
+            print(f"Indexed {count} object(s) under s3://{self.bucket}/{prefix}")
+
+    def count(self, prefix=""):
+        low, high = _prefix_range(prefix)
+        if high is None:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM objects WHERE bucket = ?", (self.bucket,)
+            ).fetchone()[0]
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM objects WHERE bucket = ? AND key >= ? AND key < ?",
+            (self.bucket, low, high)
+        ).fetchone()[0]
+
+    def objects(self, prefix="", pattern=None):
+        """Yield {Key, Size, ETag, LastModified} entries under prefix, optionally matching pattern."""
+        low, high = _prefix_range(prefix)
+        sql    = "SELECT key, size, etag, last_modified FROM objects WHERE bucket = ? AND key >= ?"
+        params = [self.bucket, low]
+        if high is not None:
+            sql += " AND key < ?"
+            params.append(high)
+        if pattern:
+            sql += " AND key REGEXP ?"
+            params.append(pattern)
+        sql += " ORDER BY key"
+        for key, size, etag, last_modified in self.conn.execute(sql, params):
+            yield {"Key": key, "Size": size, "ETag": etag, "LastModified": last_modified}
+
+    def keys(self, prefix="", pattern=None):
+        return [obj["Key"] for obj in self.objects(prefix, pattern)]
+
+
+def open_index(s3, bucket, prefixes, path=DEFAULT_INDEX_PATH, ttl=None, refresh=False):
+    """Open the index for bucket and make sure every prefix is listed and fresh."""
+    index = S3Index(bucket, path)
+    for prefix in prefixes:
+        if refresh:
+            count = index.refresh(s3, prefix)
+            print(f"Indexed {count} object(s) under s3://{bucket}/{prefix}")
+        else:
+            index.ensure(s3, prefix, ttl)
+    return index
+
+
+def add_index_arguments(parser):
+    """Add the shared index options to a script's parser."""
+    parser.add_argument("--index", metavar="PATH", default=DEFAULT_INDEX_PATH,
+                        help=f"SQLite listing index (default {DEFAULT_INDEX_PATH})")
+    parser.add_argument("--index-ttl", type=float, default=None,
+                        help=f"Re-list prefixes whose index is older than this many seconds "
+                             f"(default ARTIS_S3_INDEX_TTL or {DEFAULT_TTL})")
+    parser.add_argument("--refresh-index", action="store_true",
+                        help="Re-list S3 even if the index is still fresh")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query the local S3 listing index.")
+    parser.add_argument("command", choices=["refresh", "query"])
+    parser.add_argument("--prefix", default="", help="Key prefix to list or query (default: whole bucket)")
+    parser.add_argument("--regex", help="Only print keys matching this regular expression (query)")
+    parser.add_argument("--long", action="store_true", help="Also print size, ETag and last-modified time (query)")
+    add_index_arguments(parser)
+    args = parser.parse_args()
+
+    bucket = s3_transfer.resolve_bucket()
+    s3     = s3_transfer.get_s3_client()
+
+    with open_index(s3, bucket, [args.prefix], args.index, args.index_ttl,
+                    refresh=args.refresh_index or args.command == "refresh") as index:
+        if args.command == "refresh":
+            return
+        for obj in index.objects(args.prefix, args.regex):
+            if args.long:
+                print(f"{obj['Size']:>14} {obj['ETag']:<36} {obj['LastModified']}  {obj['Key']}")
+            else:
+                print(obj["Key"])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+s3_stage_copy.py
+
+Server-side version of move_all_est.sh: selects solver outputs under one S3
+prefix (by default the *all-country-est_*.RDS country solutions) and copies
+them under another prefix, or from another run's bucket, without
+downloading them. Objects below --multipart-threshold-mb take one
+CopyObject call; larger ones are copied as parallel UploadPartCopy ranges.
+The solver/HS/year layout below the prefix is kept.
+
+    # stage last run's country solutions for a restart in this run's bucket
+    python3 s3_stage_copy.py outputs/ outputs/ --source-bucket artis-s3-bucket-old
+
+    # only HS96 2004-2006, check the selection first
+    python3 s3_stage_copy.py runs/2025-06-02/outputs/ outputs/ --hs 96 --years 2004,2005,2006 --dry-run
+"""
+
+import os
+import sys
+import time
+import fnmatch
+import argparse
+import s3_transfer
+import s3_index
+
+# Define bucket name (ARTIS_S3_BUCKET overrides the templated default)
+artis_bucket_name = "artis-s3-bucket"
+artis_bucket_name = s3_transfer.resolve_bucket(artis_bucket_name)
+
+DEFAULT_PATTERN = "*all-country-est_*.RDS"
+
+
+def select_copies(objects, source_prefix, dest_prefix, pattern, hs_versions=None, years=None):
+    """(src_key, dest_key, size) for listed objects whose file name matches pattern and HS version / year."""
+    copies = []
+    for obj in objects:
+        key = obj["Key"]
+        if key.endswith("/") or not fnmatch.fnmatch(key.rsplit("/", 1)[-1], pattern):
+            continue
+        hs, year = s3_transfer.hs_and_year(key[len(source_prefix):])
+        if hs_versions and hs not in hs_versions:
+            continue
+        if years and year not in years:
+            continue
+        copies.append((key, dest_prefix + key[len(source_prefix):], obj["Size"]))
+    return copies
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Copy solver outputs between S3 prefixes or buckets without downloading them.")
+    parser.add_argument("source_prefix", help="Prefix to copy from, e.g. outputs/ or runs/2025-06-02/outputs/")
+    parser.add_argument("dest_prefix", help="Prefix to copy to, e.g. outputs/")
+    parser.add_argument("--source-bucket",
+                        help=f"Bucket to copy from (default: the destination bucket, {artis_bucket_name})")
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN,
+                        help=f"Glob the file name must match (default '{DEFAULT_PATTERN}', '*' for everything)")
+    parser.add_argument("--hs", default=os.environ.get("HS_VERSIONS", ""),
+                        help="Comma-separated HS versions to copy (default: HS_VERSIONS, else all)")
+    parser.add_argument("--years", help="Comma-separated analysis years to copy (default: all)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip objects that already exist at the destination with the same size")
+    parser.add_argument("--dry-run", action="store_true", help="List what would be copied and exit")
+    parser.add_argument("-w", "--workers", type=int, default=s3_transfer.DEFAULT_COPY_WORKERS,
+                        help=f"Objects copied concurrently (default {s3_transfer.DEFAULT_COPY_WORKERS})")
+    parser.add_argument("--multipart-threshold-mb", type=int, default=s3_transfer.DEFAULT_COPY_THRESHOLD_MB,
+                        help=f"Copy objects at least this large in parts (default {s3_transfer.DEFAULT_COPY_THRESHOLD_MB})")
+    parser.add_argument("--part-size-mb", type=int, default=s3_transfer.DEFAULT_COPY_PART_MB,
+                        help=f"Multipart copy part size in MB (default {s3_transfer.DEFAULT_COPY_PART_MB})")
+    parser.add_argument("--part-workers", type=int, default=s3_transfer.DEFAULT_COPY_PART_WORKERS,
+                        help=f"Parts copied in parallel per object (default {s3_transfer.DEFAULT_COPY_PART_WORKERS})")
+    parser.add_argument("--use-index", action="store_true",
+                        help="Take the source listing from the local S3 listing index (s3_index.py) instead of listing S3")
+    s3_index.add_index_arguments(parser)
+    args = parser.parse_args()
+
+    args.source_prefix = args.source_prefix.lstrip("/")
+    args.dest_prefix   = args.dest_prefix.lstrip("/")
+    source_bucket = args.source_bucket or artis_bucket_name
+    if source_bucket == artis_bucket_name and args.source_prefix == args.dest_prefix:
+        parser.error("source and destination are the same; pass --source-bucket or a different dest_prefix")
+    return args
+
+
+def main():
+    args = parse_args()
+    workers      = max(1, args.workers)
+    part_workers = max(1, args.part_workers)
+    hs_versions  = {hs.strip() for hs in args.hs.split(",") if hs.strip()}
+    years        = {int(y) for y in args.years.split(",")} if args.years else None
+
+    # server-side copies are API calls only, so one pooled connection per part in flight
+    s3 = s3_transfer.get_s3_client(max_pool_connections=workers * part_workers)
+    source_bucket = args.source_bucket or artis_bucket_name
+
+    print(f"Source: s3://{source_bucket}/{args.source_prefix}")
+    print(f"Destination: s3://{artis_bucket_name}/{args.dest_prefix}")
+    print(f"Pattern: {args.pattern}" + (f", HS {','.join(sorted(hs_versions))}" if hs_versions else "")
+          + (f", years {','.join(map(str, sorted(years)))}" if years else ""))
+
+    if args.use_index:
+        index = s3_index.open_index(s3, source_bucket, [args.source_prefix],
+                                    args.index, args.index_ttl, args.refresh_index)
+        objects = index.objects(args.source_prefix)
+    else:
+        objects = s3_transfer.iter_objects(s3, source_bucket, args.source_prefix)
+    copies = select_copies(objects, args.source_prefix, args.dest_prefix, args.pattern, hs_versions, years)
+
+    if args.resume:
+        existing = s3_transfer.list_objects(s3, artis_bucket_name, [args.dest_prefix])
+        before = len(copies)
+        copies = [c for c in copies if existing.get(c[1], (None,))[0] != c[2]]
+        print(f"Skipping {before - len(copies)} object(s) already at the destination")
+
+    total = sum(c[2] for c in copies)
+    print(f"{len(copies)} object(s), {total / s3_transfer.MB:.1f} MB to copy")
+    if not copies:
+        return 0
+    if args.dry_run:
+        for src_key, dest_key, size in copies:
+            print(f"  {size / s3_transfer.MB:10.1f} MB  {src_key} → {dest_key}")
+        return 0
+
+    start = time.time()
+    results = s3_transfer.copy_objects(
+        s3, artis_bucket_name, copies,
+        workers=workers,
+        source_bucket=source_bucket,
+        threshold=args.multipart_threshold_mb * s3_transfer.MB,
+        part_size=args.part_size_mb * s3_transfer.MB,
+        part_workers=part_workers
+    )
+    s3_transfer.print_copy_summary(results, time.time() - start)
+
+    if not all(r[4] for r in results):
+        print("Some objects failed to copy. Re-run with --resume to copy only the missing ones.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
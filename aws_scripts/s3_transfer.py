@@ -0,0 +1,904 @@
+#!/usr/bin/env python3
+"""
+s3_transfer.py
+
+Shared S3 transfer library used by s3_upload.py, s3_download.py and
+s3_download_single_HS_dir.py, so all three resolve the region, bucket and
+credentials the same way and share one tuned client per process.
+
+ - get_s3_client() caches one client per region with a configurable
+   connection pool, TCP keepalive and botocore's adaptive retry mode, which
+   backs off and rate-limits on throttling errors such as 503 SlowDown.
+ - Listing: iter_objects() yields entries page by page; list_objects()
+   collects {key: (size, etag)} for a set of prefixes.
+ - Upload: upload_files() runs multipart uploads through a bounded worker
+   pool; upload_stream() uploads any file-like object.
+ - Download: download_objects() consumes keys as the paginator yields them,
+   splits large objects into ranged GETs, bounds queued and in-flight bytes,
+   writes "<path>.part" files renamed into place once complete and, with
+   resume=True, skips local files whose size and ETag already match.
+   stream_object() yields an object's bytes without touching disk.
+ - Filters: KeyFilter selects listing entries by include/exclude glob or
+   regex, HS version, year, solver and size before anything is downloaded,
+   and narrows the prefixes that need listing at all.
+ - Copy: copy_objects() copies keys inside S3 with CopyObject, or with
+   parallel UploadPartCopy ranges for objects above the multipart
+   threshold, so no bytes pass through the local machine.
+ - Every uploaded, downloaded, skipped or failed object is logged as an
+   artis_events "object" event with its size, duration and the retries the
+   client made for its key (counted from each response's RetryAttempts).
+"""
+
+import os
+import re
+import json
+import math
+import fnmatch
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+import artis_events
+
+MB = 1024 * 1024
+
+DEFAULT_REGION = "us-east-1"
+DEFAULT_BUCKET = "artis-s3-bucket"
+
+# client tuning; ARTIS_S3_MAX_ATTEMPTS overrides the retry budget
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_MAX_ATTEMPTS     = 10
+
+# upload defaults: files in flight, multipart part size, parts in flight per file
+DEFAULT_UPLOAD_WORKERS   = 8
+DEFAULT_CHUNK_MB         = 16
+DEFAULT_FILE_CONCURRENCY = 4
+
+DEFAULT_WORKERS            = 16
+DEFAULT_RANGE_THRESHOLD_MB = 256
+DEFAULT_RANGE_SIZE_MB      = 64
+DEFAULT_MAX_INFLIGHT_MB    = 1024
+
+# size of each streamed read from a GetObject body
+STREAM_CHUNK = 1 * MB
+
+# suffix of in-progress downloads; renamed to the final path when complete
+PART_SUFFIX = ".part"
+
+# server-side copy defaults: objects in flight, multipart switch-over and part size,
+# parts in flight per object (CopyObject itself is limited to 5 GB)
+DEFAULT_COPY_WORKERS      = 16
+DEFAULT_COPY_THRESHOLD_MB = 256
+DEFAULT_COPY_PART_MB      = 128
+DEFAULT_COPY_PART_WORKERS = 4
+MAX_COPY_OBJECT_BYTES     = 5 * 1024 * MB
+MIN_PART_BYTES            = 5 * MB
+MAX_PARTS                 = 10000
+
+# outputs/ subdirectory written by each solver (see "S3 Bucket & Output Structure")
+SOLVER_DIRS = {"quadprog": "quadprog_snet", "cvxopt": "cvxopt_snet", "snet": "snet"}
+
+# <solver>/HS96/2004/... in the key, else ..._2004_HS96.<ext> in the file name
+KEY_HS_YEAR_RE  = re.compile(r"(?:^|/)HS(?P<hs>\d{2})/(?:(?P<year>\d{4})/)?")
+NAME_HS_YEAR_RE = re.compile(r"_(?P<year>\d{4})_HS(?P<hs>\d{2})\.[^.]+$")
+
+# part sizes tried when matching a local file against a multipart ETag:
+# the boto3 default and the s3_upload.py default
+MULTIPART_CHUNK_CANDIDATES = (8 * MB, 16 * MB)
+
+
+# ─── CLIENTS ─────────────────────────────────────────────────────────────────────
+
+_clients      = {}
+_clients_lock = threading.Lock()
+
+
+class RetryCounter:
+    """Retries per S3 key, tallied by client event hooks for the timing events.
+
+    botocore reports the retries behind each response in
+    ResponseMetadata.RetryAttempts; the key of the request is remembered in
+    the per-request context so multipart parts and ranged GETs of one object
+    add up to that object's count.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self._lock  = threading.Lock()
+
+    def attach(self, client):
+        client.meta.events.register("before-parameter-build.s3", self._remember_key)
+        client.meta.events.register("after-call.s3", self._count)
+
+    def _remember_key(self, params, context, **kwargs):
+        if "Key" in params:
+            context["artis_key"] = params["Key"]
+
+    def _count(self, parsed, context, **kwargs):
+        retries = (parsed or {}).get("ResponseMetadata", {}).get("RetryAttempts", 0)
+        key = context.get("artis_key")
+        if retries and key:
+            with self._lock:
+                self.counts[key] = self.counts.get(key, 0) + retries
+
+    def pop(self, key):
+        """Retries made for key so far, resetting its count."""
+        with self._lock:
+            return self.counts.pop(key, 0)
+
+
+retries = RetryCounter()
+
+
+def resolve_region(default=DEFAULT_REGION):
+    """Region from ARTIS_S3_REGION, AWS_REGION, AWS_DEFAULT_REGION or the AWS config."""
+    return os.environ.get("ARTIS_S3_REGION") \
+        or os.environ.get("AWS_REGION") \
+        or os.environ.get("AWS_DEFAULT_REGION") \
+        or boto3.session.Session().region_name \
+        or default
+
+
+def resolve_bucket(default=DEFAULT_BUCKET):
+    """Bucket from ARTIS_S3_BUCKET (set by the setup scripts) or the given default."""
+    return os.environ.get("ARTIS_S3_BUCKET") or default
+
+
+def _credentials():
+    """Explicit credentials when only the repo's AWS_ACCESS_KEY convention is set.
+
+    Otherwise boto3's default chain (AWS_ACCESS_KEY_ID, ~/.aws, instance role)
+    is used unchanged.
+    """
+    key    = os.environ.get("AWS_ACCESS_KEY")
+    secret = os.environ.get("AWS_SECRET_ACCESS_KEY")
+    if key and secret and "AWS_ACCESS_KEY_ID" not in os.environ:
+        return {"aws_access_key_id": key, "aws_secret_access_key": secret}
+    return {}
+
+
+def get_s3_client(region=None, max_pool_connections=DEFAULT_POOL_CONNECTIONS):
+    """Return the process-wide S3 client for region.
+
+    Clients are thread-safe, so every worker shares one client and its warm
+    connection pool. Asking for a larger pool than the cached client has
+    replaces it with a bigger one.
+    """
+    region = region or resolve_region()
+    with _clients_lock:
+        client = _clients.get(region)
+        if client is None or client.meta.config.max_pool_connections < max_pool_connections:
+            config = Config(
+                max_pool_connections=max_pool_connections,
+                tcp_keepalive=True,
+                retries={
+                    "mode": "adaptive",
+                    "max_attempts": int(os.environ.get("ARTIS_S3_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS))
+                }
+            )
+            client = boto3.client("s3", region_name=region, config=config, **_credentials())
+            retries.attach(client)
+            _clients[region] = client
+    return client
+
+
+# ─── HELPERS ─────────────────────────────────────────────────────────────────────
+
+def compute_etag(local_path, chunk_size):
+    """Return the ETag S3 assigns to local_path when uploaded with chunk_size parts.
+
+    Files below the multipart threshold get the plain MD5 of their content;
+    larger files get the MD5 of the concatenated part digests plus "-<parts>".
+    The file is hashed in STREAM_CHUNK blocks, so memory stays flat for any
+    file or part size.
+    """
+    if os.path.getsize(local_path) < chunk_size:
+        digest = hashlib.md5()
+        with open(local_path, "rb") as f:
+            for block in iter(lambda: f.read(STREAM_CHUNK), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    part_digests = []
+    with open(local_path, "rb") as f:
+        while True:
+            part, remaining = hashlib.md5(), chunk_size
+            while remaining > 0:
+                block = f.read(min(STREAM_CHUNK, remaining))
+                if not block:
+                    break
+                part.update(block)
+                remaining -= len(block)
+            if remaining == chunk_size:
+                break
+            part_digests.append(part.digest())
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+def etag_matches(local_path, size, etag):
+    """True if the local file's content produces the given S3 ETag.
+
+    The part size of a multipart upload is not recorded in S3, so the common
+    part sizes and the size implied by the part count are tried in turn.
+    """
+    if "-" not in etag:
+        return compute_etag(local_path, max(size, 1) + 1) == etag
+
+    parts = int(etag.rsplit("-", 1)[1])
+    implied = math.ceil(math.ceil(size / parts) / MB) * MB
+    for chunk_size in dict.fromkeys(MULTIPART_CHUNK_CANDIDATES + (implied,)):
+        if math.ceil(size / chunk_size) == parts and compute_etag(local_path, chunk_size) == etag:
+            return True
+    return False
+
+
+def load_manifest(path):
+    """Return a saved JSON manifest ({} if none exists)."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    """Write a JSON manifest atomically so an interrupted run never corrupts it."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _object_event(stage, key, size, seconds, error=None):
+    """Log one transferred (or failed) object with the retries made for its key."""
+    if error is None:
+        artis_events.emit(stage, key=key, size=size, seconds=seconds, retries=retries.pop(key))
+    else:
+        artis_events.emit(stage, key=key, size=size, seconds=seconds, retries=retries.pop(key),
+                          status=artis_events.STATUS_FAILED, error=str(error))
+
+
+class ByteBudget:
+    """Counting semaphore over bytes queued or in transit.
+
+    A single request larger than the whole budget is still let through once
+    nothing else is in flight, so oversized objects cannot deadlock.
+    """
+
+    def __init__(self, limit):
+        self.limit     = limit
+        self.in_flight = 0
+        self._cond     = threading.Condition()
+
+    def acquire(self, n):
+        with self._cond:
+            while self.in_flight > 0 and self.in_flight + n > self.limit:
+                self._cond.wait()
+            self.in_flight += n
+
+    def release(self, n):
+        with self._cond:
+            self.in_flight -= n
+            self._cond.notify_all()
+
+
+class DownloadStats:
+    """Thread-safe tally of finished downloads for the final summary and the timing events."""
+
+    def __init__(self, stage="download"):
+        self.stage    = stage
+        self.start    = time.time()
+        self.files    = []  # (key, size_bytes, seconds)
+        self.failures = []  # (key, error)
+        self.skipped  = []  # (key, size_bytes) already present locally
+        self.callback_failures = []  # (key, error) raised by on_complete for a file that is in place
+        self._lock    = threading.Lock()
+
+    def add_file(self, key, size, seconds):
+        with self._lock:
+            self.files.append((key, size, seconds))
+        _object_event(self.stage, key, size, seconds)
+
+    def add_skipped(self, key, size):
+        with self._lock:
+            self.skipped.append((key, size))
+        artis_events.emit(self.stage, key=key, size=size, status=artis_events.STATUS_SKIPPED)
+
+    def add_failure(self, key, error, size=None, seconds=None):
+        with self._lock:
+            self.failures.append((key, str(error)))
+        _object_event(self.stage, key, size, seconds, error)
+
+    def add_callback_failure(self, key, error):
+        with self._lock:
+            self.callback_failures.append((key, str(error)))
+
+    @property
+    def total_bytes(self):
+        return sum(f[1] for f in self.files)
+
+
+class _RangedObject:
+    """Tracks the outstanding parts of one range-split download."""
+
+    def __init__(self, key, size, parts):
+        self.key       = key
+        self.size      = size
+        self.remaining = parts
+        self.failed    = False
+        self.start     = time.time()
+        self._lock     = threading.Lock()
+
+    def part_done(self, ok):
+        """Record one finished part; returns True when it was the last one."""
+        with self._lock:
+            self.remaining -= 1
+            self.failed = self.failed or not ok
+            return self.remaining == 0
+
+
+# ─── LISTING ─────────────────────────────────────────────────────────────────────
+
+def iter_objects(s3, bucket, prefix):
+    """Yield list_objects_v2 entries under prefix, page by page."""
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            yield obj
+
+
+def list_objects(s3, bucket, prefixes):
+    """Return {key: (size, etag)} for every object under the given prefixes."""
+    remote = {}
+    for prefix in prefixes:
+        for obj in iter_objects(s3, bucket, prefix):
+            remote[obj["Key"]] = (obj["Size"], obj["ETag"].strip('"'))
+    return remote
+
+
+def delete_keys(s3, bucket, keys):
+    """Delete keys from the bucket in batches of 1000 (the DeleteObjects limit)."""
+    for i in range(0, len(keys), 1000):
+        batch = keys[i:i + 1000]
+        response = s3.delete_objects(
+            Bucket=bucket,
+            Delete={"Objects": [{"Key": k} for k in batch], "Quiet": True}
+        )
+        failed = {e["Key"] for e in response.get("Errors", [])}
+        for key in batch:
+            if key in failed:
+                print(f"✘ delete s3://{bucket}/{key}")
+            else:
+                print(f"✔ deleted s3://{bucket}/{key}")
+
+
+# ─── FILTERS ─────────────────────────────────────────────────────────────────────
+
+def hs_and_year(key):
+    """(HS version, year) of a key; either is None when the key does not say."""
+    match = KEY_HS_YEAR_RE.search(key) or NAME_HS_YEAR_RE.search(key)
+    if match is None:
+        return None, None
+    year = match.group("year")
+    return match.group("hs"), int(year) if year else None
+
+
+def _key_matcher(pattern):
+    # "re:<regex>" is searched anywhere in the key; anything else is a glob over the whole key
+    if pattern.startswith("re:"):
+        return re.compile(pattern[3:]).search
+    return re.compile(fnmatch.translate(pattern)).match
+
+
+class KeyFilter:
+    """Selects listing entries before they are downloaded and counts what it passed and dropped.
+
+    A key is kept when it matches any include pattern (if given) and no
+    exclude pattern, sits under one of the solvers' directories, has one of
+    the HS versions and years, and is no larger than max_size. Keys without
+    an HS version or year are dropped once that selector is set.
+    """
+
+    def __init__(self, include=(), exclude=(), hs_versions=None, years=None, solvers=None, max_size=None):
+        self.include     = [_key_matcher(p) for p in include]
+        self.exclude     = [_key_matcher(p) for p in exclude]
+        self.hs_versions = set(hs_versions or ())
+        self.years       = set(years or ())
+        self.solver_dirs = [SOLVER_DIRS[s] for s in solvers or ()]
+        self.max_size    = max_size
+        self.kept        = 0
+        self.kept_bytes  = 0
+        self.dropped     = 0
+
+    @property
+    def active(self):
+        return bool(self.include or self.exclude or self.hs_versions or self.years
+                    or self.solver_dirs or self.max_size is not None)
+
+    def prefixes(self, root):
+        """Prefixes under root that can hold selected keys, so the rest is never listed."""
+        if not self.solver_dirs:
+            return [root]
+        hs_dirs = [f"HS{hs}/" for hs in sorted(self.hs_versions)] or [""]
+        return [f"{root}{solver}/{hs}" for solver in self.solver_dirs for hs in hs_dirs]
+
+    def accepts(self, key, size):
+        if key.endswith("/"):
+            # folder placeholders would only create empty directories
+            return not self.active
+        if self.include and not any(match(key) for match in self.include):
+            return False
+        if any(match(key) for match in self.exclude):
+            return False
+        if self.solver_dirs and not any(f"/{d}/" in f"/{key}" for d in self.solver_dirs):
+            return False
+        if self.hs_versions or self.years:
+            hs, year = hs_and_year(key)
+            if self.hs_versions and hs not in self.hs_versions:
+                return False
+            if self.years and year not in self.years:
+                return False
+        return self.max_size is None or size <= self.max_size
+
+    def apply(self, objects):
+        """Yield the entries of objects that pass, keeping the listing lazy."""
+        for obj in objects:
+            if self.accepts(obj["Key"], obj["Size"]):
+                self.kept += 1
+                self.kept_bytes += obj["Size"]
+                yield obj
+            else:
+                self.dropped += 1
+
+
+def add_filter_arguments(parser):
+    """Add the shared selection options to a download script's parser."""
+    parser.add_argument("--include", action="append", default=[], metavar="PATTERN",
+                        help="Only download keys matching this glob (whole key, e.g. '*_consumption_*') "
+                             "or 're:<regex>'; repeatable")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help="Skip keys matching this glob or 're:<regex>'; repeatable")
+    parser.add_argument("--hs", help="Comma-separated HS versions to download, e.g. 96,02 (default: all)")
+    parser.add_argument("--year", help="Comma-separated analysis years to download (default: all)")
+    parser.add_argument("--solver", help=f"Comma-separated output trees to download: {', '.join(SOLVER_DIRS)} "
+                                         "(default: all)")
+    parser.add_argument("--max-size-mb", type=float, default=None,
+                        help="Skip objects larger than this many MB")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List the selected objects and their total size without downloading")
+
+
+def filter_from_args(parser, args):
+    """KeyFilter for parsed add_filter_arguments() options; bad values are reported via parser.error()."""
+    def split(value):
+        return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+    solvers = split(args.solver)
+    unknown = [s for s in solvers if s not in SOLVER_DIRS]
+    if unknown:
+        parser.error(f"unknown --solver {', '.join(unknown)}; choose from {', '.join(SOLVER_DIRS)}")
+    try:
+        years = [int(y) for y in split(args.year)]
+        return KeyFilter(
+            include=args.include,
+            exclude=args.exclude,
+            hs_versions=[hs.upper().removeprefix("HS") for hs in split(args.hs)],
+            years=years,
+            solvers=solvers,
+            max_size=None if args.max_size_mb is None else int(args.max_size_mb * MB)
+        )
+    except (ValueError, re.error) as e:
+        parser.error(str(e))
+
+
+def print_selection(objects):
+    """Dry run: print what a download would fetch, per output tree and HS version, and return the total bytes."""
+    groups = {}
+    for obj in objects:
+        match = re.match(r"(.*?/HS\d{2})/", obj["Key"])
+        group = match.group(1) if match else os.path.dirname(obj["Key"])
+        count, size = groups.get(group, (0, 0))
+        groups[group] = (count + 1, size + obj["Size"])
+
+    print("\n─── DRY RUN ───")
+    for group, (count, size) in sorted(groups.items()):
+        print(f"  {count:8d} file(s) {size / MB:12.1f} MB  {group}/")
+    files = sum(c for c, _ in groups.values())
+    total = sum(s for _, s in groups.values())
+    print(f"Would download {files} file(s), {total / MB:.1f} MB ({total / 1024 / MB:.2f} GB). Nothing was downloaded.")
+    return total
+
+
+# ─── UPLOAD ──────────────────────────────────────────────────────────────────────
+
+def create_transfer_config(chunk_mb=DEFAULT_CHUNK_MB, file_concurrency=DEFAULT_FILE_CONCURRENCY):
+    """Multipart settings applied to every upload."""
+    return TransferConfig(
+        multipart_threshold=chunk_mb * MB,
+        multipart_chunksize=chunk_mb * MB,
+        max_concurrency=file_concurrency,
+        use_threads=file_concurrency > 1
+    )
+
+
+def upload_file(s3, bucket, local_path, key, transfer_config=None, stage="upload"):
+    """Upload one file to S3, printing success or failure and logging a timing event.
+
+    Returns a (local_path, key, size_bytes, seconds, ok) tuple for the summary.
+    """
+    size  = os.path.getsize(local_path)
+    start = time.time()
+    error = None
+    try:
+        s3.upload_file(local_path, bucket, key, Config=transfer_config)
+        print(f"✔ {local_path} → s3://{bucket}/{key}")
+    except (BotoCoreError, ClientError, OSError) as e:
+        error = e
+        print(f"✘ {local_path} → s3://{bucket}/{key}: {e}")
+    seconds = time.time() - start
+    _object_event(stage, key, size, seconds, error)
+    return local_path, key, size, seconds, error is None
+
+
+def upload_files(s3, bucket, pairs, workers=DEFAULT_UPLOAD_WORKERS, transfer_config=None, stage="upload"):
+    """Upload (local_path, key) pairs with a bounded pool of worker threads."""
+    results = []
+    # largest files first so one big CSV does not start last and run alone
+    pairs = sorted(pairs, key=lambda p: os.path.getsize(p[0]), reverse=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(upload_file, s3, bucket, local_path, key, transfer_config, stage)
+            for local_path, key in pairs
+        ]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
+
+
+def upload_stream(s3, bucket, key, fileobj, transfer_config=None):
+    """Upload a readable binary file-like object (pipe, gzip stream, buffer) to key."""
+    s3.upload_fileobj(fileobj, bucket, key, Config=transfer_config)
+
+
+def print_upload_summary(results, elapsed, slowest=10, stage="upload"):
+    """Print aggregate upload throughput and the slowest per-file timings.
+
+    Also logs the run as one artis_events stage event.
+    """
+    ok_results  = [r for r in results if r[4]]
+    failed      = len(results) - len(ok_results)
+    total_bytes = sum(r[2] for r in ok_results)
+    rate        = total_bytes / MB / elapsed if elapsed > 0 else 0.0
+    artis_events.emit(stage, size=total_bytes, seconds=elapsed, kind=artis_events.KIND_STAGE,
+                      status=artis_events.STATUS_FAILED if failed else artis_events.STATUS_OK,
+                      files=len(ok_results), failures=failed)
+
+    print()
+    print(f"Uploaded {len(ok_results)} file(s), {total_bytes / MB:.1f} MB "
+          f"in {elapsed:.2f} seconds ({rate:.2f} MB/s). Failed: {failed}.")
+
+    if results:
+        print(f"Slowest {min(slowest, len(results))} file(s):")
+        for local_path, _, size, seconds, ok in sorted(results, key=lambda r: r[3], reverse=True)[:slowest]:
+            file_rate = size / MB / seconds if seconds > 0 else 0.0
+            status    = "✔" if ok else "✘"
+            print(f"  {status} {seconds:8.2f}s {size / MB:10.1f} MB {file_rate:8.2f} MB/s  {local_path}")
+
+
+# ─── COPY ────────────────────────────────────────────────────────────────────────
+
+def _multipart_copy(s3, source, bucket, dest_key, size, part_size, part_workers):
+    # parts are at least 5 MB and at most 10,000 per object
+    part_size = max(part_size, MIN_PART_BYTES, math.ceil(size / MAX_PARTS))
+    ranges = [(first, min(first + part_size, size) - 1) for first in range(0, size, part_size)]
+    upload_id = s3.create_multipart_upload(Bucket=bucket, Key=dest_key)["UploadId"]
+
+    def copy_part(number, first, last):
+        response = s3.upload_part_copy(
+            Bucket=bucket, Key=dest_key, UploadId=upload_id, PartNumber=number,
+            CopySource=source, CopySourceRange=f"bytes={first}-{last}"
+        )
+        return {"PartNumber": number, "ETag": response["CopyPartResult"]["ETag"]}
+
+    try:
+        with ThreadPoolExecutor(max_workers=part_workers) as pool:
+            parts = list(pool.map(lambda r: copy_part(*r), [(i + 1, *rng) for i, rng in enumerate(ranges)]))
+        s3.complete_multipart_upload(Bucket=bucket, Key=dest_key, UploadId=upload_id,
+                                     MultipartUpload={"Parts": parts})
+    except BaseException:
+        # an unfinished multipart upload keeps billing for its parts until aborted
+        s3.abort_multipart_upload(Bucket=bucket, Key=dest_key, UploadId=upload_id)
+        raise
+
+
+def copy_object(s3, bucket, src_key, dest_key, size, source_bucket=None,
+                threshold=DEFAULT_COPY_THRESHOLD_MB * MB,
+                part_size=DEFAULT_COPY_PART_MB * MB,
+                part_workers=DEFAULT_COPY_PART_WORKERS,
+                stage="copy"):
+    """Copy one object server-side, printing success or failure and logging a timing event.
+
+    Objects below threshold (never more than CopyObject's 5 GB limit) take one
+    CopyObject call; larger ones are copied in part_size ranges,
+    part_workers at a time. Returns a (src_key, dest_key, size_bytes,
+    seconds, ok) tuple for the summary.
+    """
+    source = {"Bucket": source_bucket or bucket, "Key": src_key}
+    start  = time.time()
+    error  = None
+    try:
+        if size < min(threshold, MAX_COPY_OBJECT_BYTES):
+            s3.copy_object(Bucket=bucket, Key=dest_key, CopySource=source)
+        else:
+            _multipart_copy(s3, source, bucket, dest_key, size, part_size, part_workers)
+        print(f"✔ s3://{source['Bucket']}/{src_key} → s3://{bucket}/{dest_key}")
+    except (BotoCoreError, ClientError) as e:
+        error = e
+        print(f"✘ s3://{source['Bucket']}/{src_key} → s3://{bucket}/{dest_key}: {e}")
+    seconds = time.time() - start
+    _object_event(stage, dest_key, size, seconds, error)
+    return src_key, dest_key, size, seconds, error is None
+
+
+def copy_objects(s3, bucket, copies, workers=DEFAULT_COPY_WORKERS, source_bucket=None, stage="copy", **copy_options):
+    """Copy (src_key, dest_key, size) triples server-side with a bounded pool of worker threads.
+
+    copy_options (threshold, part_size, part_workers) are passed to copy_object().
+    """
+    results = []
+    # largest objects first so one multipart copy does not start last and run alone
+    copies = sorted(copies, key=lambda c: c[2], reverse=True)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(copy_object, s3, bucket, src_key, dest_key, size, source_bucket, stage=stage, **copy_options)
+            for src_key, dest_key, size in copies
+        ]
+        for future in as_completed(futures):
+            results.append(future.result())
+    return results
+
+
+def print_copy_summary(results, elapsed, slowest=10, stage="copy"):
+    """Print how many objects and bytes were copied and the slowest copies.
+
+    Also logs the run as one artis_events stage event.
+    """
+    ok_results  = [r for r in results if r[4]]
+    failed      = len(results) - len(ok_results)
+    total_bytes = sum(r[2] for r in ok_results)
+    artis_events.emit(stage, size=total_bytes, seconds=elapsed, kind=artis_events.KIND_STAGE,
+                      status=artis_events.STATUS_FAILED if failed else artis_events.STATUS_OK,
+                      files=len(ok_results), failures=failed)
+
+    print()
+    print(f"Copied {len(ok_results)} object(s), {total_bytes / MB:.1f} MB, server-side "
+          f"in {elapsed:.2f} seconds. Failed: {failed}.")
+
+    if results:
+        print(f"Slowest {min(slowest, len(results))} copy(ies):")
+        for src_key, _, size, seconds, ok in sorted(results, key=lambda r: r[3], reverse=True)[:slowest]:
+            status = "✔" if ok else "✘"
+            print(f"  {status} {seconds:8.2f}s {size / MB:10.1f} MB  {src_key}")
+
+
+# ─── DOWNLOAD ────────────────────────────────────────────────────────────────────
+
+def stream_object(s3, bucket, key, chunk_size=STREAM_CHUNK):
+    """Yield the bytes of one object in chunks without writing it to disk."""
+    response = s3.get_object(Bucket=bucket, Key=key)
+    for chunk in response["Body"].iter_chunks(chunk_size):
+        yield chunk
+
+
+def _stream_body(body, f):
+    for chunk in body.iter_chunks(STREAM_CHUNK):
+        f.write(chunk)
+
+
+def _download_whole(s3, bucket, key, local_path, size, stats, start):
+    tmp_path = local_path + PART_SUFFIX
+    response = s3.get_object(Bucket=bucket, Key=key)
+    with open(tmp_path, "wb") as f:
+        _stream_body(response["Body"], f)
+    os.replace(tmp_path, local_path)
+    stats.add_file(key, size, time.time() - start)
+    print(f"✔ s3://{bucket}/{key} → {local_path}")
+
+
+def _download_range(s3, bucket, key, tmp_path, first, last):
+    response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={first}-{last}")
+    with open(tmp_path, "r+b") as f:
+        f.seek(first)
+        _stream_body(response["Body"], f)
+
+
+def print_download_summary(stats, slowest=10):
+    """Print aggregate download throughput and the slowest per-file timings.
+
+    Also logs the run as one artis_events stage event.
+    """
+    elapsed = time.time() - stats.start
+    total   = stats.total_bytes
+    rate    = total / MB / elapsed if elapsed > 0 else 0.0
+    artis_events.emit(stats.stage, size=total, seconds=elapsed, kind=artis_events.KIND_STAGE,
+                      status=artis_events.STATUS_FAILED if stats.failures else artis_events.STATUS_OK,
+                      files=len(stats.files), failures=len(stats.failures), skipped=len(stats.skipped))
+
+    print()
+    print(f"Downloaded {len(stats.files)} file(s), {total / MB:.1f} MB "
+          f"in {elapsed:.2f} seconds ({rate:.2f} MB/s). Failed: {len(stats.failures)}.")
+    if stats.skipped:
+        skipped_mb = sum(s[1] for s in stats.skipped) / MB
+        print(f"Skipped {len(stats.skipped)} file(s), {skipped_mb:.1f} MB already present locally.")
+
+    if stats.files:
+        print(f"Slowest {min(slowest, len(stats.files))} file(s):")
+        for key, size, seconds in sorted(stats.files, key=lambda f: f[2], reverse=True)[:slowest]:
+            file_rate = size / MB / seconds if seconds > 0 else 0.0
+            print(f"  {seconds:8.2f}s {size / MB:10.1f} MB {file_rate:8.2f} MB/s  {key}")
+
+    for key, error in stats.failures:
+        print(f"✘ {key}: {error}")
+    for key, error in stats.callback_failures:
+        print(f"✘ {key} (downloaded, follow-up failed): {error}")
+
+
+def download_objects(s3, bucket, objects, local_path_for,
+                     workers=DEFAULT_WORKERS,
+                     range_threshold=DEFAULT_RANGE_THRESHOLD_MB * MB,
+                     range_size=DEFAULT_RANGE_SIZE_MB * MB,
+                     max_inflight=DEFAULT_MAX_INFLIGHT_MB * MB,
+                     resume=False,
+                     manifest_path=None,
+                     stage="download",
+                     on_complete=None):
+    """Download list_objects_v2 entries concurrently.
+
+    objects is any iterable of listing entries (usually iter_objects(), so
+    downloads start while later pages are still being listed) and
+    local_path_for maps an S3 key to its local destination path. Keys ending
+    in "/" are folder placeholders and only create the local directory.
+
+    With resume=True an existing local file is skipped when its size and ETag
+    match the listing. manifest_path records {key: size, mtime, etag} for
+    every completed file so those checks do not need to re-hash the file.
+    stage names the artis_events events logged for each object.
+    on_complete(key, local_path) is called from the worker thread as soon as
+    each file is in place (or skipped as already local), so a follow-up stage
+    can start on it while the rest is still downloading. An exception it
+    raises does not fail the download; it is kept in stats.callback_failures.
+
+    Returns a DownloadStats; failures are collected rather than raised.
+    """
+    stats    = DownloadStats(stage)
+    budget   = ByteBudget(max_inflight)
+    manifest = load_manifest(manifest_path)
+    manifest_lock = threading.Lock()
+
+    def record(key, local_path, size, etag):
+        with manifest_lock:
+            manifest[key] = {"size": size, "mtime": os.path.getmtime(local_path), "etag": etag}
+
+    def already_local(key, local_path, size, etag):
+        if not os.path.isfile(local_path) or os.path.getsize(local_path) != size:
+            return False
+        entry = manifest.get(key)
+        if entry and entry["size"] == size and entry["mtime"] == os.path.getmtime(local_path):
+            return entry["etag"] == etag
+        if etag_matches(local_path, size, etag):
+            record(key, local_path, size, etag)
+            return True
+        return False
+
+    def complete(key, local_path):
+        if not on_complete:
+            return
+        try:
+            on_complete(key, local_path)
+        except Exception as e:
+            stats.add_callback_failure(key, e)
+            print(f"✘ {key}: on_complete failed: {e}")
+
+    def run_whole(key, local_path, size, etag):
+        start = time.time()
+        try:
+            _download_whole(s3, bucket, key, local_path, size, stats, start)
+            record(key, local_path, size, etag)
+        except Exception as e:
+            stats.add_failure(key, e, size, time.time() - start)
+            print(f"✘ s3://{bucket}/{key}: {e}")
+            if os.path.exists(local_path + PART_SUFFIX):
+                os.remove(local_path + PART_SUFFIX)
+            return
+        finally:
+            budget.release(size)
+        complete(key, local_path)
+
+    def run_part(tracker, local_path, etag, first, last):
+        ok = True
+        tmp_path = local_path + PART_SUFFIX
+        try:
+            _download_range(s3, bucket, tracker.key, tmp_path, first, last)
+        except Exception as e:
+            ok = False
+            print(f"✘ s3://{bucket}/{tracker.key} bytes {first}-{last}: {e}")
+        finally:
+            budget.release(last - first + 1)
+        if tracker.part_done(ok):
+            if tracker.failed:
+                stats.add_failure(tracker.key, "one or more ranged parts failed",
+                                  tracker.size, time.time() - tracker.start)
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, local_path)
+                record(tracker.key, local_path, tracker.size, etag)
+                stats.add_file(tracker.key, tracker.size, time.time() - tracker.start)
+                print(f"✔ s3://{bucket}/{tracker.key} → {local_path}")
+                complete(tracker.key, local_path)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for obj in objects:
+                key        = obj["Key"]
+                size       = obj["Size"]
+                etag       = obj["ETag"].strip('"')
+                local_path = local_path_for(key)
+
+                if key.endswith("/"):
+                    os.makedirs(local_path, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(local_path) or ".", exist_ok=True)
+
+                if resume and already_local(key, local_path, size, etag):
+                    stats.add_skipped(key, size)
+                    complete(key, local_path)
+                    continue
+
+                if size < range_threshold:
+                    budget.acquire(size)
+                    pool.submit(run_whole, key, local_path, size, etag)
+                    continue
+
+                # preallocate so each ranged part can be written at its own offset
+                with open(local_path + PART_SUFFIX, "wb") as f:
+                    f.truncate(size)
+                ranges  = [(first, min(first + range_size, size) - 1)
+                           for first in range(0, size, range_size)]
+                tracker = _RangedObject(key, size, len(ranges))
+                for first, last in ranges:
+                    budget.acquire(last - first + 1)
+                    pool.submit(run_part, tracker, local_path, etag, first, last)
+    finally:
+        # keep what finished even if the run was interrupted
+        if manifest_path:
+            save_manifest(manifest_path, manifest)
+
+    return stats
+
+
+def add_download_arguments(parser):
+    """Add the shared concurrency options to a download script's parser."""
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Concurrent GET requests (default {DEFAULT_WORKERS})")
+    parser.add_argument("--range-threshold-mb", type=int, default=DEFAULT_RANGE_THRESHOLD_MB,
+                        help=f"Split objects at least this large into ranged GETs (default {DEFAULT_RANGE_THRESHOLD_MB})")
+    parser.add_argument("--range-size-mb", type=int, default=DEFAULT_RANGE_SIZE_MB,
+                        help=f"Size of each ranged GET in MB (default {DEFAULT_RANGE_SIZE_MB})")
+    parser.add_argument("--max-inflight-mb", type=int, default=DEFAULT_MAX_INFLIGHT_MB,
+                        help=f"Upper bound on bytes queued or in transit (default {DEFAULT_MAX_INFLIGHT_MB})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip local files whose size and ETag already match S3")
+
+
+def download_kwargs(args):
+    """Translate parsed add_download_arguments() options for download_objects()."""
+    return {
+        "workers":         max(1, args.workers),
+        "range_threshold": args.range_threshold_mb * MB,
+        "range_size":      max(1, args.range_size_mb) * MB,
+        "max_inflight":    args.max_inflight_mb * MB,
+        "resume":          args.resume,
+    }
@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
 import os
+import io
+import re
 import sys
-import boto3
-from botocore.exceptions import ClientError
+import json
+import time
+import argparse
+import s3_transfer
+import artis_code_hash
+from s3_transfer import MB, load_manifest, save_manifest
 
 # ─── CONFIGURATION (from env vars) ──────────────────────────────────────────────
 
@@ -18,48 +24,290 @@ if not (aws_key and aws_secret and aws_region):
     )
 
 # S3 bucket to mirror into
-S3_BUCKET = os.environ.get("ARTIS_S3_BUCKET", "artis-s3-bucket")
+S3_BUCKET = s3_transfer.resolve_bucket()
 
 # local root directory to mirror
 DATA_DIR  = "data_s3_upload"
 
+# local record of what was uploaded (path, size, mtime, content hash) for --sync
+MANIFEST_FILE = ".s3_upload_manifest.json"
+
+# written by convert_model_inputs.py; lists the CSVs that have a Parquet/csv.zst copy
+COLUMNAR_MANIFEST = os.path.join(DATA_DIR, "model_inputs_columnar", "_manifest.json")
+
+# --hs-layout: shared inputs go under model_inputs/shared/, HS-specific files
+# (hs-hs-match_HS96.csv, standardized_baci_seafood_hs96_y2004.csv, ...) under
+# model_inputs/HS<VER>/, and one fetch manifest per HS version under
+# model_inputs/manifests/HS<VER>.json lists what a job for that HS version needs
+INPUTS_PREFIX         = "model_inputs/"
+SHARED_PREFIX         = "model_inputs/shared/"
+FETCH_MANIFEST_PREFIX = "model_inputs/manifests/"
+HS_FILE_RE            = re.compile(r"_(?:HS|hs)(\d{2})(?:_y(\d{4}))?(?=[._])")
+
+# number of files uploaded at the same time
+DEFAULT_WORKERS = s3_transfer.DEFAULT_UPLOAD_WORKERS
+# multipart part size and number of parts in flight per file
+DEFAULT_CHUNK_MB = s3_transfer.DEFAULT_CHUNK_MB
+DEFAULT_FILE_CONCURRENCY = s3_transfer.DEFAULT_FILE_CONCURRENCY
+
 
 # ─── HELPERS ─────────────────────────────────────────────────────────────────────
 
-def create_s3_client():
-    """Return an S3 client using explicit credentials."""
-    return boto3.client(
-        "s3",
-        region_name=aws_region,
-        aws_access_key_id=aws_key,
-        aws_secret_access_key=aws_secret
-    )
+def collect_files(data_dir):
+    """Return (local_path, s3_key) pairs for every file under data_dir."""
+    pairs = []
+    for root, _, files in os.walk(data_dir):
+        for fname in files:
+            local_path = os.path.join(root, fname)
+            # strip off leading DATA_DIR/ to build the S3 key
+            rel_path = os.path.relpath(local_path, data_dir)
+            # normalize to forward slashes for S3
+            s3_key   = rel_path.replace(os.sep, "/")
+            pairs.append((local_path, s3_key))
+    return pairs
+
+def converted_sources():
+    """S3 keys of model_inputs/ CSVs that have a converted copy in model_inputs_columnar/."""
+    tables = load_manifest(COLUMNAR_MANIFEST).get("tables", {})
+    return {"model_inputs/" + rel_path.replace(os.sep, "/") for rel_path in tables}
+
+def hs_scoped_key(key, hs_versions):
+    """Map a flat model_inputs/ key to the HS-scoped layout.
+
+    Returns None for files of an HS version that is not selected.
+    """
+    if not key.startswith(INPUTS_PREFIX):
+        return key
+    rel_path = key[len(INPUTS_PREFIX):]
+    match = HS_FILE_RE.search(os.path.basename(rel_path))
+    if not match:
+        return SHARED_PREFIX + rel_path
+    if hs_versions and match.group(1) not in hs_versions:
+        return None
+    return f"{INPUTS_PREFIX}HS{match.group(1)}/{rel_path}"
+
+def apply_hs_layout(pairs, hs_versions):
+    """Re-key (local_path, key) pairs into the HS-scoped layout, dropping unselected HS versions."""
+    scoped = []
+    for local_path, key in pairs:
+        new_key = hs_scoped_key(key, hs_versions)
+        if new_key is not None:
+            scoped.append((local_path, new_key))
+    return scoped
+
+def fetch_manifests(pairs):
+    """{hs_version: manifest} of the shared inputs plus that HS version's own files.
+
+    Each file entry maps its S3 key to the flat model_inputs/ path the model
+    code expects; year-specific files carry their year so per-year jobs can
+    fetch only their own.
+    """
+    shared, per_hs = [], {}
+    for local_path, key in pairs:
+        if not key.startswith(INPUTS_PREFIX):
+            continue
+        rel_path = os.path.relpath(local_path, os.path.join(DATA_DIR, "model_inputs")).replace(os.sep, "/")
+        entry = {"key": key, "path": INPUTS_PREFIX + rel_path, "size": os.path.getsize(local_path)}
+        match = HS_FILE_RE.search(os.path.basename(rel_path))
+        if match is None:
+            shared.append(entry)
+            continue
+        if match.group(2):
+            entry["year"] = int(match.group(2))
+        per_hs.setdefault(match.group(1), []).append(entry)
+
+    manifests = {}
+    for hs_version, files in sorted(per_hs.items()):
+        files = sorted(shared + files, key=lambda e: e["key"])
+        manifests[hs_version] = {
+            "hs_version": hs_version,
+            "files": files,
+            "bytes": sum(e["size"] for e in files)
+        }
+    return manifests
+
+def upload_fetch_manifests(s3, bucket, manifests, transfer_config):
+    for hs_version, manifest in manifests.items():
+        key = f"{FETCH_MANIFEST_PREFIX}HS{hs_version}.json"
+        body = io.BytesIO(json.dumps(manifest, indent=2).encode())
+        s3_transfer.upload_stream(s3, bucket, key, body, transfer_config)
+        print(f"✔ fetch manifest s3://{bucket}/{key} "
+              f"({len(manifest['files'])} files, {manifest['bytes'] / MB:.1f} MB)")
+
+def upload_code_hash(s3, bucket, transfer_config):
+    """Record the hash of the uploaded ARTIS package sources (see artis_code_hash.py)."""
+    digest = artis_code_hash.code_hash(os.path.join(DATA_DIR, "ARTIS_model_code"))
+    if digest is None:
+        return
+    body = io.BytesIO((digest + "\n").encode())
+    s3_transfer.upload_stream(s3, bucket, artis_code_hash.CODE_HASH_KEY, body, transfer_config)
+    print(f"✔ code hash s3://{bucket}/{artis_code_hash.CODE_HASH_KEY} ({digest[:16]})")
+
+def local_entry(manifest, local_path, key, chunk_size):
+    """Return the manifest entry for a local file, hashing only if it changed."""
+    stat = os.stat(local_path)
+    entry = manifest.get(key)
+    if (entry
+            and entry["size"] == stat.st_size
+            and entry["mtime"] == stat.st_mtime
+            and entry["chunk_size"] == chunk_size):
+        return entry
+    return {
+        "path": local_path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "chunk_size": chunk_size,
+        "etag": s3_transfer.compute_etag(local_path, chunk_size)
+    }
+
+def sync_prefixes(data_dir):
+    """S3 prefixes owned by the sync: one per top-level entry of data_dir.
 
-def upload_file(s3, bucket, local_path, key):
-    """Upload one file to S3, printing success or failure."""
-    try:
-        s3.upload_file(local_path, bucket, key)
-        print(f"✔ {local_path} → s3://{bucket}/{key}")
-    except ClientError as e:
-        print(f"✘ {local_path} → s3://{bucket}/{key}: {e}")
+    Directories own everything under "<name>/"; a top-level file owns only its
+    exact key (see owned_key). Anything else in the bucket (e.g. outputs/) is
+    never listed or deleted.
+    """
+    prefixes = []
+    for name in sorted(os.listdir(data_dir)):
+        if os.path.isdir(os.path.join(data_dir, name)):
+            prefixes.append(f"{name}/")
+        else:
+            prefixes.append(name)
+    return prefixes
+
+def owned_key(key, prefixes):
+    """True if key belongs to the sync: under a "<dir>/" prefix or equal to a file prefix.
+
+    A file prefix such as README.md is listed as a prefix, so the listing also
+    returns unrelated keys like README.md.bak; those are not owned.
+    """
+    return any(key.startswith(p) if p.endswith("/") else key == p for p in prefixes)
+
+def hs_layout_prefixes(prefixes, hs_versions):
+    """Sync prefixes for --hs-layout: model_inputs/ is narrowed to shared/ and the selected HS<VER>/.
+
+    The flat model_inputs/ keys read by jobs without a fetch manifest and the
+    folders of HS versions not being uploaded are then never listed, so
+    --delete cannot remove them.
+    """
+    scoped = [p for p in prefixes if p != INPUTS_PREFIX]
+    if INPUTS_PREFIX in prefixes:
+        scoped.append(SHARED_PREFIX)
+        scoped.extend(f"{INPUTS_PREFIX}HS{hs}/" for hs in sorted(hs_versions))
+    return scoped
+
+def plan_sync(s3, bucket, pairs, manifest, chunk_size, prefixes):
+    """Compare local files with the bucket listing under prefixes.
+
+    Returns (to_upload, stale_keys, entries) where entries is the refreshed
+    manifest for every local file.
+    """
+    remote = {k: v for k, v in s3_transfer.list_objects(s3, bucket, prefixes).items() if owned_key(k, prefixes)}
+
+    entries   = {}
+    to_upload = []
+    for local_path, key in pairs:
+        entry = local_entry(manifest, local_path, key, chunk_size)
+        entries[key] = entry
+        if remote.get(key) != (entry["size"], entry["etag"]):
+            to_upload.append((local_path, key))
+
+    local_keys = set(entries)
+    stale_keys = sorted(k for k in remote if k not in local_keys and not k.endswith("/"))
+    return to_upload, stale_keys, entries
 
 # ─── MAIN ────────────────────────────────────────────────────────────────────────
 
+def parse_args():
+    parser = argparse.ArgumentParser(description=f"Mirror {DATA_DIR}/ into an S3 bucket.")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Number of files uploaded concurrently (default {DEFAULT_WORKERS}, 1 = serial)")
+    parser.add_argument("--chunk-size-mb", type=int, default=DEFAULT_CHUNK_MB,
+                        help=f"Multipart threshold and part size in MB (default {DEFAULT_CHUNK_MB})")
+    parser.add_argument("--file-concurrency", type=int, default=DEFAULT_FILE_CONCURRENCY,
+                        help=f"Multipart parts uploaded in parallel per file (default {DEFAULT_FILE_CONCURRENCY})")
+    parser.add_argument("--sync", action="store_true",
+                        help=f"Only upload files that are new or changed compared to the bucket (uses {MANIFEST_FILE})")
+    parser.add_argument("--delete", action="store_true",
+                        help="With --sync, delete keys under the synced prefixes that no longer exist locally")
+    parser.add_argument("--columnar-only", action="store_true",
+                        help="Skip model_inputs/ CSVs that have a converted copy (see convert_model_inputs.py). "
+                             "The ARTIS R pipeline still reads the CSVs, so do not use this for model runs; "
+                             "CSVs already in the bucket are never deleted by it")
+    parser.add_argument("--hs-layout", action="store_true",
+                        help=f"Upload shared inputs under {SHARED_PREFIX}, HS-specific ones under "
+                             f"{INPUTS_PREFIX}HS<VER>/, and a fetch manifest per HS version")
+    parser.add_argument("--hs",
+                        help="Comma-separated HS versions to upload with --hs-layout (default: HS_VERSIONS, else all)")
+    args = parser.parse_args()
+    if args.delete and not args.sync:
+        parser.error("--delete requires --sync")
+    if args.hs is not None and not args.hs_layout:
+        parser.error("--hs only applies with --hs-layout")
+    if args.hs is None:
+        args.hs = os.environ.get("HS_VERSIONS", "")
+    return args
+
 def main():
-    s3 = create_s3_client()
+    args = parse_args()
+    workers = max(1, args.workers)
+    file_concurrency = max(1, args.file_concurrency)
 
     if not os.path.isdir(DATA_DIR):
         sys.exit(f"Error: data directory '{DATA_DIR}' not found.")
 
-    # Walk through all files under DATA_DIR
-    for root, _, files in os.walk(DATA_DIR):
-        for fname in files:
-            local_path = os.path.join(root, fname)
-            # strip off leading DATA_DIR/ to build the S3 key
-            rel_path = os.path.relpath(local_path, DATA_DIR)
-            # normalize to forward slashes for S3
-            s3_key   = rel_path.replace(os.sep, "/")
-            upload_file(s3, S3_BUCKET, local_path, s3_key)
+    # one client and one connection pool shared by every worker and part
+    s3 = s3_transfer.get_s3_client(region=aws_region, max_pool_connections=workers * file_concurrency)
+    transfer_config = s3_transfer.create_transfer_config(args.chunk_size_mb, file_concurrency)
+
+    pairs = collect_files(DATA_DIR)
+    prefixes = sync_prefixes(DATA_DIR)
+    converted = set()
+    if args.columnar_only:
+        converted = converted_sources()
+        pairs = [(path, key) for path, key in pairs if key not in converted]
+        print(f"Skipping {len(converted)} CSV(s) with a converted copy in model_inputs_columnar/")
+        print("Warning: the ARTIS R pipeline reads model_inputs/*.csv, not model_inputs_columnar/; "
+              "only use --columnar-only for buckets that are not used for model runs")
+    if args.hs_layout:
+        hs_versions = {hs.strip() for hs in args.hs.split(",") if hs.strip()}
+        pairs = apply_hs_layout(pairs, hs_versions)
+        manifests = fetch_manifests(pairs)
+        prefixes = hs_layout_prefixes(prefixes, hs_versions or set(manifests))
+        print(f"HS-scoped layout for HS version(s): {', '.join(sorted(manifests)) or 'none'}")
+    start = time.time()
+
+    if args.sync:
+        manifest = load_manifest(MANIFEST_FILE)
+        pairs, stale_keys, entries = plan_sync(
+            s3, S3_BUCKET, pairs, manifest, args.chunk_size_mb * MB, prefixes
+        )
+        # fetch manifests are generated, never local files; CSVs skipped by --columnar-only
+        # still exist locally and are what the model reads, so they are never stale
+        stale_keys = [k for k in stale_keys if not k.startswith(FETCH_MANIFEST_PREFIX) and k not in converted]
+        print(f"Sync: {len(pairs)} new or changed file(s), "
+              f"{len(entries) - len(pairs)} unchanged, {len(stale_keys)} stale key(s) in bucket")
+
+    print(f"Uploading {len(pairs)} file(s) from {DATA_DIR}/ to s3://{S3_BUCKET}/ "
+          f"with {workers} worker(s)")
+    results = s3_transfer.upload_files(s3, S3_BUCKET, pairs, workers, transfer_config)
+    if all(r[4] for r in results):
+        if args.hs_layout:
+            upload_fetch_manifests(s3, S3_BUCKET, manifests, transfer_config)
+        upload_code_hash(s3, S3_BUCKET, transfer_config)
+
+    if args.sync:
+        # only remember files that are known to match the bucket
+        failed_keys = {r[1] for r in results if not r[4]}
+        save_manifest(MANIFEST_FILE, {k: v for k, v in entries.items() if k not in failed_keys})
+        if args.delete and stale_keys:
+            print(f"Deleting {len(stale_keys)} stale key(s)")
+            s3_transfer.delete_keys(s3, S3_BUCKET, stale_keys)
+
+    s3_transfer.print_upload_summary(results, time.time() - start)
+
+    if any(not r[4] for r in results):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+run_benchmarks.py
+
+Repeatable timings for the S3 transfer and Batch submission paths, measured
+against local stand-ins so they need no AWS account and cost nothing:
+
+ - S3: a moto server started in this process (pip install "moto[server]"),
+   or any S3-compatible endpoint given with --endpoint-url (MinIO,
+   LocalStack). The scripts under test reach it through AWS_ENDPOINT_URL.
+ - Batch: an in-process stand-in client that answers every call after a
+   fixed latency (--api-latency-ms) and records the submitted jobs.
+
+Benchmarks (--only to pick some), each swept over --file-counts,
+--file-size-kb and --workers where that applies:
+
+  upload       aws_scripts/s3_upload.py on a synthetic data_s3_upload/ tree
+  upload-large the same tree plus --large-files CSVs of --large-mb each
+  download     aws_scripts/s3_download.py on a synthetic outputs/ tree
+  download-hs  aws_scripts/s3_download_single_HS_dir.py HS96
+  list         paginated listing of outputs/ (s3_transfer.iter_objects)
+  latency      per-request PUT / HEAD / GET latency percentiles
+  submit       submit_artis_jobs.py (with and without --per-year),
+               submit_artis_pipeline.py and submit_restart_artis_snet_jobs.py
+
+Results go to benchmarks/results/<timestamp>_<commit>.json; --compare prints
+each benchmark's change against an earlier result file.
+
+    python3 benchmarks/run_benchmarks.py
+    python3 benchmarks/run_benchmarks.py --file-counts 500,5000 --workers 1,8,32 --large-mb 2048
+    python3 benchmarks/run_benchmarks.py --only upload,download --compare benchmarks/results/<old>.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import runpy
+import shutil
+import socket
+import argparse
+import platform
+import tempfile
+import statistics
+import contextlib
+import subprocess
+from datetime import datetime
+
+import synthetic_trees
+
+REPO_DIR    = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, "aws_scripts")
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+sys.path[:0] = [REPO_DIR, SCRIPTS_DIR]
+
+import boto3  # noqa: E402
+import s3_transfer  # noqa: E402
+import artis_jobs  # noqa: E402
+
+try:
+    from moto.server import ThreadedMotoServer
+except ImportError:
+    ThreadedMotoServer = None
+
+BENCHMARKS = ("upload", "upload-large", "download", "download-hs", "list", "latency", "submit")
+BUCKET     = "artis-benchmark-bucket"
+MB         = synthetic_trees.MB
+
+# a change of more than this much is flagged by --compare
+REGRESSION_THRESHOLD = 0.10
+
+
+# ─── STAND-INS ───────────────────────────────────────────────────────────────────
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def s3_endpoint(endpoint_url=None):
+    """Yield an S3 endpoint URL: endpoint_url as given, or a moto server for the duration."""
+    if endpoint_url:
+        yield endpoint_url
+        return
+    if ThreadedMotoServer is None:
+        sys.exit('The local S3 stand-in needs moto: pip install "moto[server]" (or pass --endpoint-url)')
+    port   = free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.stop()
+
+
+class StandInBatch:
+    """Batch client stand-in: each call waits latency seconds, submitted jobs are recorded."""
+
+    def __init__(self, latency):
+        self.latency   = latency
+        self.submitted = []
+
+    def submit_job(self, **request):
+        time.sleep(self.latency)
+        job_id = str(uuid.uuid4())
+        self.submitted.append(request)
+        return {"jobId": job_id, "jobName": request["jobName"], "jobArn": f"arn:aws:batch:::job/{job_id}"}
+
+    def describe_jobs(self, jobs):
+        time.sleep(self.latency)
+        return {"jobs": [{"jobId": job_id, "status": "SUCCEEDED"} for job_id in jobs]}
+
+
+# ─── MEASUREMENT ─────────────────────────────────────────────────────────────────
+
+def percentiles(samples):
+    """p50 / p95 / max of samples (seconds) in milliseconds."""
+    ordered = sorted(samples)
+    return {
+        "p50": round(1000 * statistics.median(ordered), 3),
+        "p95": round(1000 * ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3),
+        "max": round(1000 * ordered[-1], 3)
+    }
+
+
+def result(benchmark, params, runs, files=0, size=0, **extra):
+    """Result record for repeated runs (seconds each); throughput uses the median run."""
+    seconds = statistics.median(runs)
+    record = {
+        "benchmark": benchmark,
+        "params": params,
+        "seconds": round(seconds, 4),
+        "runs": [round(r, 4) for r in runs],
+        "files": files,
+        "bytes": size,
+        "mb_per_s": round(size / MB / seconds, 2) if size and seconds else None,
+        "files_per_s": round(files / seconds, 2) if files and seconds else None
+    }
+    record.update(extra)
+    label = ", ".join(f"{k}={v}" for k, v in params.items())
+    rate  = f"  {record['mb_per_s']} MB/s" if record["mb_per_s"] else ""
+    print(f"✔ {benchmark:<12} {label:<60} {seconds:8.2f}s{rate}")
+    return record
+
+
+def run_script(script, args, cwd, env, log):
+    """Run a repo script as a subprocess in cwd; returns its wall-clock seconds."""
+    start = time.time()
+    with open(log, "a") as f:
+        f.write(f"\n$ {script} {' '.join(args)}\n")
+        f.flush()
+        code = subprocess.call([sys.executable, script] + args, cwd=cwd, env=env, stdout=f, stderr=subprocess.STDOUT)
+    seconds = time.time() - start
+    if code != 0:
+        raise RuntimeError(f"{os.path.basename(script)} exited with code {code}; see {log}")
+    return seconds
+
+
+def empty_bucket(s3):
+    keys = [obj["Key"] for obj in s3_transfer.iter_objects(s3, BUCKET, "")]
+    if keys:
+        s3_transfer.delete_keys(s3, BUCKET, keys)
+
+
+def seed_bucket(s3, root):
+    """Upload every file under root (keys relative to root); returns the number of keys."""
+    pairs = [
+        (os.path.join(dirpath, name), os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, "/"))
+        for dirpath, _, names in os.walk(root) for name in names
+    ]
+    s3_transfer.upload_files(s3, BUCKET, pairs, workers=32)
+    return len(pairs)
+
+
+# ─── BENCHMARKS ──────────────────────────────────────────────────────────────────
+
+def bench_upload(args, s3, work, env, log, large=False):
+    results = []
+    for count in args.file_counts:
+        for size_kb in args.file_size_kb:
+            tree = os.path.join(work, f"upload_{count}_{size_kb}")
+            files, size = synthetic_trees.make_upload_tree(
+                tree, count, size_kb * 1024,
+                large_files=args.large_files if large else 0, large_size=args.large_mb * MB
+            )
+            for workers in args.workers:
+                runs = []
+                for _ in range(args.repeat):
+                    empty_bucket(s3)
+                    runs.append(run_script(os.path.join(SCRIPTS_DIR, "s3_upload.py"),
+                                           ["--workers", str(workers)], tree, env, log))
+                params = {"files": count, "file_kb": size_kb, "workers": workers}
+                if large:
+                    params.update(large_files=args.large_files, large_mb=args.large_mb)
+                results.append(result("upload-large" if large else "upload", params, runs, files, size))
+            shutil.rmtree(tree)
+    return results
+
+
+def bench_download(args, s3, work, env, log, single_hs=False):
+    results = []
+    for count in args.file_counts:
+        for size_kb in args.file_size_kb:
+            tree = os.path.join(work, f"outputs_{count}_{size_kb}")
+            files, size = synthetic_trees.make_outputs_tree(tree, count, size_kb * 1024)
+            empty_bucket(s3)
+            seed_bucket(s3, tree)
+            shutil.rmtree(tree)
+            if single_hs:
+                script, script_args = "s3_download_single_HS_dir.py", ["HS96"]
+                # only the snet/HS96/ part of the tree
+                files = sum(1 for _ in s3_transfer.iter_objects(s3, BUCKET, "outputs/snet/HS96/"))
+                size  = files * size_kb * 1024
+            else:
+                script, script_args = "s3_download.py", []
+            for workers in args.workers:
+                runs = []
+                for _ in range(args.repeat):
+                    dest = tempfile.mkdtemp(dir=work)
+                    runs.append(run_script(os.path.join(SCRIPTS_DIR, script),
+                                           script_args + ["--workers", str(workers)], dest, env, log))
+                    shutil.rmtree(dest)
+                params = {"files": count, "file_kb": size_kb, "workers": workers}
+                results.append(result("download-hs" if single_hs else "download", params, runs, files, size))
+    return results
+
+
+def bench_list(args, s3, work):
+    results = []
+    for count in args.file_counts:
+        tree = os.path.join(work, f"list_{count}")
+        synthetic_trees.make_outputs_tree(tree, count, 1)
+        empty_bucket(s3)
+        seed_bucket(s3, tree)
+        shutil.rmtree(tree)
+        runs, keys = [], 0
+        for _ in range(args.repeat):
+            start = time.time()
+            keys = sum(1 for _ in s3_transfer.iter_objects(s3, BUCKET, "outputs/"))
+            runs.append(time.time() - start)
+        pages = max(1, -(-keys // 1000))
+        results.append(result("list", {"files": count}, runs, keys,
+                              latency_ms={"per_page": round(1000 * statistics.median(runs) / pages, 3)}))
+    return results
+
+
+def bench_latency(args, s3):
+    results = []
+    empty_bucket(s3)
+    for size_kb in args.file_size_kb:
+        body = synthetic_trees._csv_block(size_kb * 1024)
+        timings = {"put": [], "head": [], "get": []}
+        for i in range(args.latency_requests):
+            key = f"latency/{size_kb}/{i:05d}.csv"
+            for op, call in (
+                ("put",  lambda: s3.put_object(Bucket=BUCKET, Key=key, Body=body)),
+                ("head", lambda: s3.head_object(Bucket=BUCKET, Key=key)),
+                ("get",  lambda: s3.get_object(Bucket=BUCKET, Key=key)["Body"].read())
+            ):
+                start = time.time()
+                call()
+                timings[op].append(time.time() - start)
+        total = sum(sum(t) for t in timings.values())
+        results.append(result("latency", {"file_kb": size_kb, "requests": args.latency_requests}, [total],
+                              3 * args.latency_requests,
+                              latency_ms={op: percentiles(t) for op, t in timings.items()}))
+    return results
+
+
+def bench_submit(args, work, log):
+    """Run the submit scripts in-process with the Batch stand-in patched in."""
+    scripts = [
+        ("submit_artis_jobs.py", []),
+        ("submit_artis_jobs.py", ["--per-year"]),
+        ("submit_artis_pipeline.py", []),
+        ("submit_restart_artis_snet_jobs.py", []),
+    ]
+    hs_versions = ",".join(synthetic_trees.HS_FIRST_YEAR)
+    results = []
+    create_batch_client, boto3_client = artis_jobs.create_batch_client, boto3.client
+    cwd, argv = os.getcwd(), sys.argv
+    try:
+        os.chdir(work)
+        os.environ["HS_VERSIONS"] = hs_versions
+        for script, script_args in scripts:
+            runs, calls = [], 0
+            for _ in range(args.repeat):
+                batch = StandInBatch(args.api_latency_ms / 1000)
+                artis_jobs.create_batch_client = lambda: batch
+                boto3.client = lambda service, *a, **kw: batch if service == "batch" else boto3_client(service, *a, **kw)
+                sys.argv = [script] + script_args
+                start = time.time()
+                with open(log, "a") as f, contextlib.redirect_stdout(f):
+                    try:
+                        runpy.run_path(os.path.join(REPO_DIR, script), run_name="__main__")
+                    except SystemExit as e:
+                        if e.code not in (None, 0):
+                            raise RuntimeError(f"{script} exited with code {e.code}; see {log}")
+                runs.append(time.time() - start)
+                calls = len(batch.submitted)
+            overhead = (statistics.median(runs) - calls * args.api_latency_ms / 1000) / max(calls, 1)
+            results.append(result(
+                "submit", {"script": " ".join([script] + script_args), "hs_versions": hs_versions,
+                           "api_latency_ms": args.api_latency_ms},
+                runs, submit_calls=calls, latency_ms={"overhead_per_call": round(1000 * overhead, 3)}
+            ))
+    finally:
+        artis_jobs.create_batch_client, boto3.client = create_batch_client, boto3_client
+        sys.argv = argv
+        os.chdir(cwd)
+    return results
+
+
+# ─── RESULTS ─────────────────────────────────────────────────────────────────────
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_results(report):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(RESULTS_DIR, f"{stamp}_{report['commit']}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare(old_path, report):
+    """Print each benchmark's median time against the same benchmark and params in old_path."""
+    with open(old_path, "r") as f:
+        old = json.load(f)
+    previous = {(r["benchmark"], json.dumps(r["params"], sort_keys=True)): r for r in old["results"]}
+
+    print(f"\n─── COMPARED WITH {old['commit']} ({old['created']}) ───")
+    regressions = 0
+    for record in report["results"]:
+        before = previous.get((record["benchmark"], json.dumps(record["params"], sort_keys=True)))
+        if before is None or not before["seconds"]:
+            continue
+        change = record["seconds"] / before["seconds"] - 1
+        mark = "✘" if change > REGRESSION_THRESHOLD else "✔"
+        regressions += change > REGRESSION_THRESHOLD
+        label = ", ".join(f"{k}={v}" for k, v in record["params"].items())
+        print(f"{mark} {record['benchmark']:<12} {label:<60} {before['seconds']:8.2f}s → {record['seconds']:8.2f}s "
+              f"({change:+.0%})")
+    print(f"{regressions} benchmark(s) more than {REGRESSION_THRESHOLD:.0%} slower")
+    return regressions
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the S3 transfer and Batch submission scripts against local stand-ins.")
+    parser.add_argument("--only", help=f"Comma-separated benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument("--endpoint-url", help="Existing S3-compatible endpoint to use instead of an in-process moto server")
+    parser.add_argument("--file-counts", type=int_list, default=[200, 2000],
+                        help="Synthetic tree sizes in files (default 200,2000)")
+    parser.add_argument("--file-size-kb", type=int_list, default=[64],
+                        help="Size of each small file in KB (default 64)")
+    parser.add_argument("--workers", type=int_list, default=[1, 8, 32],
+                        help="Concurrency levels passed to the scripts' --workers (default 1,8,32)")
+    parser.add_argument("--large-files", type=int, default=2, help="Large CSVs in upload-large (default 2)")
+    parser.add_argument("--large-mb", type=int, default=256,
+                        help="Size of each large CSV in MB (default 256; use 2048 for the real multi-GB inputs)")
+    parser.add_argument("--latency-requests", type=int, default=200, help="Requests per operation for latency (default 200)")
+    parser.add_argument("--api-latency-ms", type=float, default=50, help="Batch stand-in latency per call (default 50)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per configuration; the median is reported (default 3)")
+    parser.add_argument("--work-dir", help="Directory for synthetic trees (default: a temporary directory)")
+    parser.add_argument("--compare", metavar="RESULTS_JSON", help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    selected = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    args.repeat = max(1, args.repeat)
+
+    work = tempfile.mkdtemp(prefix="artis-bench-", dir=args.work_dir)
+    # output of the scripts under test; kept after the run for failures
+    log  = os.path.join(tempfile.gettempdir(), "artis-benchmark.log")
+    open(log, "w").close()
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("compare", "work_dir")},
+        "results": []
+    }
+
+    try:
+        with s3_endpoint(args.endpoint_url) as endpoint:
+            # the scripts under test find the stand-in through the standard AWS variables
+            env = dict(os.environ, AWS_ENDPOINT_URL=endpoint, AWS_REGION="us-east-1",
+                       AWS_ACCESS_KEY="benchmark", AWS_SECRET_ACCESS_KEY="benchmark",
+                       ARTIS_S3_BUCKET=BUCKET, PYTHONUNBUFFERED="1")
+            env.pop("AWS_ACCESS_KEY_ID", None)
+            os.environ.update(env)
+            os.environ.pop("AWS_ACCESS_KEY_ID", None)
+            report["endpoint"] = "moto" if not args.endpoint_url else endpoint
+
+            s3 = s3_transfer.get_s3_client(max_pool_connections=max(args.workers + [32]))
+            s3.create_bucket(Bucket=BUCKET)
+
+            print(f"─── BENCHMARKS ({report['commit']}, S3 at {endpoint}) ───")
+            for name in selected:
+                if name in ("upload", "upload-large"):
+                    report["results"] += bench_upload(args, s3, work, env, log, large=name == "upload-large")
+                elif name in ("download", "download-hs"):
+                    report["results"] += bench_download(args, s3, work, env, log, single_hs=name == "download-hs")
+                elif name == "list":
+                    report["results"] += bench_list(args, s3, work)
+                elif name == "latency":
+                    report["results"] += bench_latency(args, s3)
+                elif name == "submit":
+                    report["results"] += bench_submit(args, work, log)
+    except RuntimeError as e:
+        print(f"✘ {e}")
+        return 1
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    path = save_results(report)
+    print(f"\nResults: {path}")
+    if args.compare:
+        compare(args.compare, report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+synthetic_trees.py
+
+Synthetic local trees shaped like the real ARTIS data, for run_benchmarks.py:
+
+ - data_s3_upload/: ARTIS_model_code/ (pipeline scripts and R/) plus a flat
+   model_inputs/ of many small per-HS and per-HS/year CSVs, optionally with a
+   few large CSVs;
+ - outputs/: the cvxopt_snet/, quadprog_snet/ and snet/ HS<VER>/<YEAR>/ trees
+   that the jobs write (see "S3 Bucket & Output Structure" in the README).
+
+File contents are CSV-like text so sizes are exact; they are not valid model
+inputs.
+"""
+
+import os
+import itertools
+
+MB = 1024 * 1024
+
+HS_FIRST_YEAR      = {"96": 1996, "02": 2002, "07": 2007, "12": 2012, "17": 2017}
+LAST_ANALYSIS_YEAR = 2023
+RUN_DATE           = "2025-01-01"
+COUNTRIES          = ("USA", "CHN", "NOR", "CHL", "VNM", "IDN", "IND", "PER", "THA", "ECU")
+
+# model_inputs/ names; {hs} and {year} are filled per file
+INPUT_PATTERNS = (
+    "standardized_baci_seafood_hs{hs}_y{year}.csv",
+    "hs-hs-match_HS{hs}.csv",
+    "hs-taxa-match_HS{hs}.csv",
+    "hs-taxa-CF_strict-match_HS{hs}.csv",
+    "standardized_fao_prod_{year}.csv",
+    "clean_sau_prod_{year}.csv",
+)
+CODE_FILES = ("00-aws-hpc-setup.R", "02-artis-pipeline_hs96.R", "03-combine-tables.R", "DESCRIPTION", "NAMESPACE")
+
+# outputs/ names per HS version and year
+SNET_YEAR_FILES = (
+    "{date}_S-net_raw_midpoint_{year}_HS{hs}.qs",
+    "{date}_all-country-est_{year}_HS{hs}.RDS",
+    "{date}_consumption_{year}_HS{hs}.qs",
+    "W_long_{year}_HS{hs}.csv",
+    "X_long.csv",
+    "first_dom_exp_midpoint.csv",
+    "first_foreign_exp_midpoint.csv",
+    "reweight_W_long_{year}_HS{hs}.csv",
+    "second_dom_exp_midpoint.csv",
+    "second_foreign_exp_midpoint.csv",
+)
+SOLVER_YEAR_FILES = (
+    "{date}_all-country-est_{year}_HS{hs}.RDS",
+    "{date}_all-data-prior-to-solve-country_{year}_HS{hs}.RData",
+) + tuple(f"{{date}}_country-est_{iso}_{{year}}_HS{{hs}}.RDS" for iso in COUNTRIES)
+
+
+def _csv_block(size=MB):
+    row = b"exporter_iso3c,importer_iso3c,hs6,year,product_weight_t,total_v\n" \
+          b"USA,CHN,030389,2004,1234.5678,98765.4321\n"
+    return (row * (size // len(row) + 1))[:size]
+
+
+_BLOCK = _csv_block()
+
+
+def write_file(path, size):
+    """Write size bytes of CSV-like text to path."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            chunk = _BLOCK[:min(remaining, len(_BLOCK))]
+            f.write(chunk)
+            remaining -= len(chunk)
+
+
+def analysis_years(hs_version):
+    return range(HS_FIRST_YEAR[hs_version], LAST_ANALYSIS_YEAR + 1)
+
+
+def make_upload_tree(root, file_count, file_size, large_files=0, large_size=0):
+    """data_s3_upload/ under root with file_count small inputs and large_files large CSVs.
+
+    Returns (files, bytes) of the whole tree.
+    """
+    data_dir = os.path.join(root, "data_s3_upload")
+    files = total = 0
+    for name in CODE_FILES:
+        write_file(os.path.join(data_dir, "ARTIS_model_code", name), 4096)
+        files, total = files + 1, total + 4096
+    for i in range(20):
+        write_file(os.path.join(data_dir, "ARTIS_model_code", "R", f"artis_function_{i:02d}.R"), 8192)
+        files, total = files + 1, total + 8192
+
+    # cycle HS version × year × pattern, like the real per-HS/year inputs
+    names = set()
+    combos = itertools.cycle(
+        (pattern, hs, year)
+        for hs in HS_FIRST_YEAR for year in analysis_years(hs) for pattern in INPUT_PATTERNS
+    )
+    copy = 0
+    while len(names) < file_count:
+        pattern, hs, year = next(combos)
+        name = pattern.format(hs=hs, year=year)
+        if name in names:
+            copy += 1
+            name = name.replace(".csv", f"_{copy}.csv")
+        names.add(name)
+        write_file(os.path.join(data_dir, "model_inputs", name), file_size)
+    files, total = files + file_count, total + file_count * file_size
+
+    for i in range(large_files):
+        write_file(os.path.join(data_dir, "model_inputs", f"standardized_combined_prod_large_{i}.csv"), large_size)
+    files, total = files + large_files, total + large_files * large_size
+    return files, total
+
+
+def make_outputs_tree(root, file_count, file_size, hs_versions=("96",)):
+    """outputs/{cvxopt_snet,quadprog_snet,snet}/HS<VER>/<YEAR>/ under root with about file_count files.
+
+    Files are spread evenly over every HS version and year, so the tree has
+    the real depth. Returns (files, bytes).
+    """
+    slots = [(hs, year) for hs in hs_versions for year in analysis_years(hs)]
+    per_year = max(1, file_count // len(slots))
+    layouts = [("snet", SNET_YEAR_FILES), ("cvxopt_snet", SOLVER_YEAR_FILES), ("quadprog_snet", SOLVER_YEAR_FILES)]
+
+    files = 0
+    for hs, year in slots:
+        names = itertools.cycle((prefix, pattern) for prefix, patterns in layouts for pattern in patterns)
+        for i in range(per_year):
+            prefix, pattern = next(names)
+            name = pattern.format(date=RUN_DATE, year=year, hs=hs)
+            if i >= len(SNET_YEAR_FILES) + 2 * len(SOLVER_YEAR_FILES):
+                name = f"{i}_{name}"
+            write_file(os.path.join(root, "outputs", prefix, f"HS{hs}", str(year), name), file_size)
+            files += 1
+    return files, files * file_size
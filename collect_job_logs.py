@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+collect_job_logs.py
+
+Pull the CloudWatch logs of the AWS Batch jobs recorded in one or more run
+files (see monitor_artis_jobs.py) into one local file per HS version / year,
+instead of opening every job's "Log stream name" in the console.
+
+ - Resolves each job's log group and streams (one per attempt) with
+   describe_jobs, 100 IDs per call.
+ - Reads every stream concurrently with get_log_events, paging with
+   nextForwardToken. The tokens are saved next to the logs, so a re-run or
+   --follow only fetches lines that are new since the last read.
+ - --grep searches all collected logs at once for a regex (e.g. R's "Error"
+   or "warning") and lists the jobs with matches, failed jobs first.
+
+    python3 collect_job_logs.py                          # latest run file in runs/
+    python3 collect_job_logs.py --grep 'Error|warning'
+    python3 collect_job_logs.py runs/<file>.json --follow --grep 'Error'
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+import artis_jobs
+
+LOGS_DIR          = "logs"
+DEFAULT_LOG_GROUP = "/aws/batch/job"
+TOKENS_FILE       = "_tokens.json"
+DEFAULT_WORKERS   = 8
+TERMINAL_STATES   = {"SUCCEEDED", "FAILED"}
+
+
+def create_logs_client(workers=DEFAULT_WORKERS):
+    """CloudWatch Logs client with one pooled connection per worker and adaptive retries for throttling."""
+    config = Config(max_pool_connections=workers, retries={"mode": "adaptive", "max_attempts": 10})
+    return boto3.client("logs", region_name=os.environ.get("AWS_REGION", "us-east-1"), config=config)
+
+
+def job_streams(job):
+    """(log group, [stream per attempt, oldest first]) of one describe_jobs entry."""
+    container = job.get("container", {})
+    group = container.get("logConfiguration", {}).get("options", {}).get("awslogs-group", DEFAULT_LOG_GROUP)
+    streams = [a.get("container", {}).get("logStreamName") for a in job.get("attempts", [])]
+    # the running attempt is not in attempts yet
+    if container.get("logStreamName") not in streams:
+        streams.append(container.get("logStreamName"))
+    return group, [s for s in streams if s]
+
+
+def log_file_name(label):
+    """Local file for a job label, e.g. HS96/2005 → HS96_2005.log."""
+    return re.sub(r"[^\w.-]+", "_", label) + ".log"
+
+
+class LogCollector:
+    """Appends new CloudWatch events of each job's streams to its file, tracking nextForwardToken per stream."""
+
+    def __init__(self, logs, out_dir, pattern=None):
+        self.logs        = logs
+        self.out_dir     = out_dir
+        self.pattern     = pattern
+        self.tokens_path = os.path.join(out_dir, TOKENS_FILE)
+        self.tokens      = {}
+        if os.path.isfile(self.tokens_path):
+            with open(self.tokens_path, "r") as f:
+                self.tokens = json.load(f)
+        self._lock = threading.Lock()
+
+    def save_tokens(self):
+        tmp_path = self.tokens_path + ".tmp"
+        with self._lock, open(tmp_path, "w") as f:
+            json.dump(self.tokens, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.tokens_path)
+
+    def fetch(self, label, job):
+        """Append the events not read yet for one job; returns the number of new lines."""
+        group, streams = job_streams(job)
+        new_lines = 0
+        with open(os.path.join(self.out_dir, log_file_name(label)), "a") as f:
+            for attempt, stream in enumerate(streams, 1):
+                token = self.tokens.get(stream)
+                started = token is not None
+                while True:
+                    request = {"logGroupName": group, "logStreamName": stream, "startFromHead": True}
+                    if token:
+                        request["nextToken"] = token
+                    try:
+                        response = self.logs.get_log_events(**request)
+                    except ClientError as e:
+                        # the stream is created a little after the job starts
+                        if e.response["Error"]["Code"] == "ResourceNotFoundException":
+                            break
+                        raise
+                    if not started:
+                        f.write(f"─── attempt {attempt}: {group}/{stream} ───\n")
+                        started = True
+                    for event in response["events"]:
+                        stamp = datetime.fromtimestamp(event["timestamp"] / 1000).strftime("%Y-%m-%d %H:%M:%S")
+                        line  = event["message"].rstrip("\n")
+                        f.write(f"{stamp} {line}\n")
+                        new_lines += 1
+                        if self.pattern and self.pattern.search(line):
+                            print(f"[{label}] {line}")
+                    # the same token coming back means the end of the stream so far
+                    if response["nextForwardToken"] == token:
+                        break
+                    token = response["nextForwardToken"]
+                if token is not None:
+                    with self._lock:
+                        self.tokens[stream] = token
+        return new_lines
+
+
+def grep_file(path, pattern):
+    """(lines, matches, first matching line) of one collected log."""
+    lines = matches = 0
+    first = None
+    if not os.path.isfile(path):
+        return 0, 0, None
+    with open(path, "r", errors="replace") as f:
+        for line in f:
+            if line.startswith("─── attempt "):
+                continue
+            lines += 1
+            if pattern and pattern.search(line):
+                matches += 1
+                first = first or line.strip()
+    return lines, matches, first
+
+
+def print_summary(jobs, state, out_dir, pattern):
+    """One line per job: state, collected lines and, with --grep, matches; failed and matching jobs first."""
+    rows = []
+    for label, job_id in jobs:
+        status = state.get(job_id, {}).get("status", "UNKNOWN")
+        lines, matches, first = grep_file(os.path.join(out_dir, log_file_name(label)), pattern)
+        rows.append((status != "FAILED", -matches, label, status, lines, matches, first))
+
+    print("\n─── JOB LOGS ───")
+    header = f"  {'JOB':<20} {'STATE':<10} {'LINES':>8}"
+    print(header + (f" {'MATCHES':>8}  FIRST MATCH" if pattern else ""))
+    for _, _, label, status, lines, matches, first in sorted(rows):
+        mark = "✘" if status == "FAILED" or matches else ("✔" if status == "SUCCEEDED" else " ")
+        row  = f"{mark} {label:<20} {status:<10} {lines:8d}"
+        if pattern:
+            row += f" {matches:8d}  {(first or '')[:100]}"
+        print(row)
+    if pattern:
+        hits = sum(1 for r in rows if r[5])
+        print(f"{hits} of {len(rows)} job(s) match /{pattern.pattern}/")
+    print(f"Logs in {out_dir}/")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect CloudWatch logs of submitted ARTIS AWS Batch jobs.")
+    parser.add_argument("run_files", nargs="*",
+                        help="Run files whose jobs to collect (default: the latest file in runs/)")
+    parser.add_argument("--job", action="append", default=[], metavar="JOB_ID",
+                        help="Also collect this job ID (array children as <id>:<index>); repeatable")
+    parser.add_argument("--out", default=LOGS_DIR,
+                        help=f"Directory for the logs, one subdirectory per run file (default {LOGS_DIR})")
+    parser.add_argument("--grep", metavar="REGEX", help="Report lines matching this regex in every job's log")
+    parser.add_argument("-i", "--ignore-case", action="store_true", help="Match --grep case-insensitively")
+    parser.add_argument("--follow", action="store_true", help="Keep tailing until every job has finished")
+    parser.add_argument("--interval", type=float, default=30, help="Seconds between reads with --follow (default 30)")
+    parser.add_argument("-w", "--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Log streams read concurrently (default {DEFAULT_WORKERS})")
+    args = parser.parse_args()
+
+    pattern = re.compile(args.grep, re.IGNORECASE if args.ignore_case else 0) if args.grep else None
+    run_files = args.run_files or ([] if args.job else [artis_jobs.latest_run_file()])
+    if run_files == [None]:
+        sys.exit(f"No run files found in {artis_jobs.RUNS_DIR}/. Submit jobs first or pass a run file or --job.")
+
+    # (label, job id, output directory) for every job
+    groups = [(os.path.join(args.out, os.path.splitext(os.path.basename(run_file))[0]),
+               artis_jobs.run_jobs(artis_jobs.load_run(run_file))) for run_file in run_files]
+    if args.job:
+        groups.append((os.path.join(args.out, "jobs"), [(job_id, job_id) for job_id in args.job]))
+
+    workers = max(1, args.workers)
+    batch   = artis_jobs.create_batch_client()
+    logs    = create_logs_client(workers)
+    collectors = {}
+    for out_dir, _ in groups:
+        os.makedirs(out_dir, exist_ok=True)
+        collectors[out_dir] = LogCollector(logs, out_dir, pattern if args.follow else None)
+    work  = [(out_dir, label, job_id) for out_dir, jobs in groups for label, job_id in jobs]
+    state = {}
+
+    while True:
+        pending = [job_id for _, _, job_id in work if state.get(job_id, {}).get("status") not in TERMINAL_STATES]
+        for job in artis_jobs.describe_jobs(batch, pending):
+            state[job["jobId"]] = job
+        # finished jobs were fully read in an earlier round
+        todo = [(out_dir, label, job_id) for out_dir, label, job_id in work if job_id in pending]
+
+        def fetch(item):
+            out_dir, label, job_id = item
+            if job_id not in state:
+                return 0
+            return collectors[out_dir].fetch(label, state[job_id])
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            new_lines = sum(pool.map(fetch, todo))
+        for collector in collectors.values():
+            collector.save_tokens()
+        print(f"Read {new_lines} new line(s) from {len(todo)} job(s)")
+
+        done = all(state.get(job_id, {}).get("status") in TERMINAL_STATES for _, _, job_id in work)
+        if done or not args.follow:
+            break
+        print(f"Next read in {args.interval:.0f}s (Ctrl+C to stop)")
+        time.sleep(args.interval)
+
+    for out_dir, jobs in groups:
+        print_summary(jobs, state, out_dir, pattern)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+artis_prefetch.py
+
+Job-start prefetcher baked into the ARTIS image. job_shell_scripts/prefetch.sh
+runs it before R starts, so the files docker_image_artis_pkg_download.R used
+to fetch with one save_object() call at a time are downloaded concurrently
+through s3_transfer.download_objects():
+
+ - ARTIS_model_code/ into the working directory, prefix stripped (R/,
+   DESCRIPTION, the pipeline scripts), as the R script did;
+ - the job's HS fetch manifest (model_inputs/manifests/HS<VER>.json, written
+   by s3_upload.py --hs-layout) when HS_VERSION or ARTIS_HS_VERSION is set,
+   restricted to ARTIS_ANALYSIS_YEAR's files for per-year jobs.
+
+Any other manifest or prefix can be fetched instead:
+
+    python3 artis_prefetch.py
+    python3 artis_prefetch.py --manifest model_inputs/manifests/HS96.json --workers 32
+    python3 artis_prefetch.py --prefix ARTIS_model_code/ --prefix model_inputs/shared/=model_inputs/
+
+Exits non-zero if anything failed, so prefetch.sh falls back to the R downloads.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from botocore.exceptions import ClientError
+import s3_transfer
+
+# templated by the setup scripts; ARTIS_S3_BUCKET overrides it
+artis_bucket_name = "artis-s3-bucket"
+
+CODE_PREFIX           = "ARTIS_model_code/"
+FETCH_MANIFEST_PREFIX = "model_inputs/manifests/"
+RENVIRON              = ".Renviron"
+
+
+def load_renviron(path=RENVIRON):
+    """Export the KEY="value" lines of .Renviron (the image's AWS keys) unless already set."""
+    if not os.path.isfile(path):
+        return
+    with open(path, "r") as f:
+        for line in f:
+            name, sep, value = line.strip().partition("=")
+            if sep and name and not name.startswith("#"):
+                os.environ.setdefault(name.strip(), value.strip().strip('"'))
+
+
+def parse_prefix(spec):
+    """Split "PREFIX" or "PREFIX=DEST" into (prefix, local directory replacing the prefix)."""
+    prefix, _, dest = spec.partition("=")
+    return prefix, dest
+
+
+def job_manifest_key():
+    """Fetch manifest key for this job's HS version, or None outside an HS job."""
+    hs_version = os.environ.get("HS_VERSION") or os.environ.get("ARTIS_HS_VERSION")
+    return f"{FETCH_MANIFEST_PREFIX}HS{hs_version}.json" if hs_version else None
+
+
+def read_manifest(s3, bucket, key):
+    """Parsed fetch manifest at key, or None if it does not exist."""
+    try:
+        body = s3.get_object(Bucket=bucket, Key=key)["Body"].read()
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None
+        raise
+    return json.loads(body)
+
+
+def manifest_files(manifest, year=None):
+    """Manifest entries, without other years' files when year is set."""
+    return [f for f in manifest["files"]
+            if year is None or f.get("year") is None or int(f["year"]) == year]
+
+
+def prefetch(s3, bucket, prefixes, manifest_entries, **download_kwargs):
+    """Download every object under prefixes plus manifest_entries; returns a DownloadStats."""
+    local_paths = {}
+
+    def objects():
+        # local paths are recorded as entries are yielded; download_objects
+        # looks each one up right after receiving it
+        for prefix, dest in prefixes:
+            for obj in s3_transfer.iter_objects(s3, bucket, prefix):
+                if obj["Key"] == prefix:
+                    continue
+                local_paths[obj["Key"]] = os.path.join(dest, obj["Key"][len(prefix):])
+                yield obj
+        for entry in manifest_entries:
+            local_paths[entry["key"]] = entry["path"]
+            yield {"Key": entry["key"], "Size": entry["size"], "ETag": entry.get("etag", "")}
+
+    return s3_transfer.download_objects(s3, bucket, objects(), local_paths.__getitem__,
+                                        stage="prefetch", **download_kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrently fetch ARTIS model code and inputs at job start.")
+    parser.add_argument("--prefix", action="append", default=[], metavar="PREFIX[=DEST]",
+                        help=f"Fetch every key under PREFIX into DEST (default: the working directory); "
+                             f"repeatable. Default: {CODE_PREFIX}")
+    parser.add_argument("--manifest", action="append", default=[], metavar="KEY",
+                        help="Fetch the files listed in this fetch manifest (repeatable). "
+                             "Default: the HS_VERSION / ARTIS_HS_VERSION manifest, if present")
+    s3_transfer.add_download_arguments(parser)
+    args = parser.parse_args()
+
+    load_renviron()
+    bucket   = s3_transfer.resolve_bucket(artis_bucket_name)
+    kwargs   = s3_transfer.download_kwargs(args)
+    s3       = s3_transfer.get_s3_client(max_pool_connections=kwargs["workers"])
+    year     = os.environ.get("ARTIS_ANALYSIS_YEAR")
+    year     = int(year) if year else None
+
+    explicit  = bool(args.prefix or args.manifest)
+    prefixes  = [parse_prefix(spec) for spec in args.prefix] if explicit else [(CODE_PREFIX, "")]
+    manifests = args.manifest if explicit else [key for key in [job_manifest_key()] if key]
+
+    entries = []
+    for key in manifests:
+        manifest = read_manifest(s3, bucket, key)
+        if manifest is None:
+            if explicit:
+                print(f"✘ s3://{bucket}/{key} does not exist")
+                return 1
+            print(f"No fetch manifest s3://{bucket}/{key}; fetching model code only")
+            continue
+        files = manifest_files(manifest, year)
+        print(f"Fetch manifest {key}: {len(files)} file(s)" + (f" for {year}" if year else ""))
+        entries.extend(files)
+
+    start = time.time()
+    stats = prefetch(s3, bucket, prefixes, entries, **kwargs)
+    s3_transfer.print_download_summary(stats)
+    print(f"Prefetched {len(stats.files)} file(s) in {time.time() - start:.1f}s with {kwargs['workers']} worker(s)")
+    return 1 if stats.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 #!/bin/bash
 
+source job_shell_scripts/prefetch.sh
 R -e "source('docker_image_artis_pkg_download.R')"
 R -e "source('03-combine-tables.R')"
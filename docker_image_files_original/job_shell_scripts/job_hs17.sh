@@ -1,4 +1,8 @@
 #!/bin/bash
 
+# HS version of this job; selects model_inputs/manifests/HS17.json in prefetch.sh
+export HS_VERSION=17
+
+source job_shell_scripts/prefetch.sh
 R -e "source('docker_image_artis_pkg_download.R')"
 R -e "source('02-artis-pipeline_hs17.R')"
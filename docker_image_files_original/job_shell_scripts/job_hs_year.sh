@@ -0,0 +1,37 @@
+#!/bin/bash
+# Runs the ARTIS pipeline for a single analysis year of one HS version.
+# Submitted by `submit_artis_jobs.py --per-year` as an AWS Batch array job:
+#   HS_VERSION          HS version, e.g. 96
+#   ARTIS_HS_YEARS      comma-separated years, indexed by AWS_BATCH_JOB_ARRAY_INDEX
+#   ARTIS_ANALYSIS_YEAR set directly instead when only one year is submitted
+set -e
+
+if [ -z "$ARTIS_ANALYSIS_YEAR" ]; then
+  IFS=',' read -r -a years <<< "$ARTIS_HS_YEARS"
+  ARTIS_ANALYSIS_YEAR="${years[$AWS_BATCH_JOB_ARRAY_INDEX]}"
+fi
+export ARTIS_ANALYSIS_YEAR
+
+if [ -z "$HS_VERSION" ] || [ -z "$ARTIS_ANALYSIS_YEAR" ]; then
+  echo "HS_VERSION and a year (ARTIS_ANALYSIS_YEAR or ARTIS_HS_YEARS + AWS_BATCH_JOB_ARRAY_INDEX) must be set"
+  exit 1
+fi
+echo "Running HS${HS_VERSION} analysis year ${ARTIS_ANALYSIS_YEAR}"
+
+source job_shell_scripts/prefetch.sh
+R -e "source('docker_image_artis_pkg_download.R')"
+
+# Restrict the model run to this job's year (same line rewrite as create_pipeline_versions.sh).
+# sed succeeds without a matching line, so fail here rather than run every year.
+test_years_re='^[[:space:]]*test_years[[:space:]]*<-'
+if ! grep -q "$test_years_re" 00-aws-hpc-setup.R; then
+  echo "Could not find 'test_years <-' in 00-aws-hpc-setup.R to restrict the run to ${ARTIS_ANALYSIS_YEAR}"
+  exit 1
+fi
+sed -i "s/${test_years_re}.*/test_years <- c(${ARTIS_ANALYSIS_YEAR})/" 00-aws-hpc-setup.R
+if ! grep -qx "test_years <- c(${ARTIS_ANALYSIS_YEAR})" 00-aws-hpc-setup.R; then
+  echo "Rewriting test_years in 00-aws-hpc-setup.R to ${ARTIS_ANALYSIS_YEAR} failed"
+  exit 1
+fi
+
+R -e "source('02-artis-pipeline_hs${HS_VERSION}.R')"
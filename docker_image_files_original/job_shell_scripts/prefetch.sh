@@ -0,0 +1,18 @@
+#!/bin/bash
+# Sourced by the job scripts before R starts: fetches ARTIS_model_code/ and this
+# job's HS fetch manifest concurrently with artis_prefetch.py. On success
+# ARTIS_PREFETCHED=1 tells docker_image_artis_pkg_download.R to skip its own
+# serial downloads and only install the package; on failure R downloads as before.
+#   ARTIS_PREFETCH_WORKERS  concurrent GETs (default 16)
+
+if [ -x venv/bin/python ]; then
+  artis_python=venv/bin/python
+else
+  artis_python=python3
+fi
+
+if "$artis_python" artis_prefetch.py --workers "${ARTIS_PREFETCH_WORKERS:-16}"; then
+  export ARTIS_PREFETCHED=1
+else
+  echo "Prefetch failed; docker_image_artis_pkg_download.R will download the files instead"
+fi
@@ -4,6 +4,7 @@ import sys
 import argparse
 import shutil
 import re
+import setup_runner
 
 # Command line argument parsing------------------------------------------------------
 parser = argparse.ArgumentParser()
@@ -14,6 +15,13 @@ parser.add_argument("-aws_secret_key", "--aws_secret_access_key", help = "AWS Se
 parser.add_argument("-s3", "--s3_bucket", help = "AWS S3 Bucket name")
 parser.add_argument("-ecr", "--ecr_repo", help = "AWS ECR Repository name")
 parser.add_argument("-di", "--docker_image", help = "Existing Docker Image")
+parser.add_argument("--force", action = "append", default = [], metavar = "STAGE",
+                    choices = ["terraform", "convert", "upload", "image-build", "image-push", "all"],
+                    help = "Re-run a stage even if its inputs are unchanged (repeatable, or 'all')")
+parser.add_argument("--convert-inputs", choices = ["parquet", "csv.zst"],
+                    help = "Also upload model inputs as partitioned Parquet or csv.zst (aws_scripts/convert_model_inputs.py)")
+parser.add_argument("--with-package", action = "store_true",
+                    help = "Pre-install the ARTIS R package in the Docker image (skips devtools::install() in jobs)")
 
 args = parser.parse_args()
 
@@ -24,12 +32,11 @@ s3_bucket_name = args.s3_bucket
 ecr_repo_name = args.ecr_repo
 existing_image = args.docker_image
 
-# Copy appropriate dockerfile to project root directory based on chip infrastructure---------------
-print("Creating new Dockerfile")
+# Pick the dockerfile template based on chip infrastructure---------------
 if args.chip == "x86":
-    shutil.copyfile("docker_mac_x86/Dockerfile", "./Dockerfile")
+    dockerfile_template = "docker_mac_x86/Dockerfile"
 else:
-    shutil.copyfile("docker_mac_arm64/Dockerfile", "./Dockerfile")
+    dockerfile_template = "docker_mac_arm64/Dockerfile"
 
 # Add AWS credentials to all relevant places--------------------------------------------------------
 print("Adding AWS credentials to local environment")
@@ -37,19 +44,20 @@ print("Adding AWS credentials to local environment")
 os.environ["AWS_ACCESS_KEY"] = aws_access_key
 os.environ["AWS_SECRET_ACCESS_KEY"] = aws_secret_key
 os.environ["AWS_REGION"] = "us-east-1"
+# S3 bucket read by s3_upload.py and the download scripts (see s3_transfer.resolve_bucket)
+os.environ["ARTIS_S3_BUCKET"] = s3_bucket_name
 
 # Add AWS credentials to Dockerfile for docker image
-print("Adding AWS credentials to Dockerfile")
-docker_f = open("Dockerfile", "r")
+# Rendered files are only rewritten when their content changes (see setup_runner.write_if_changed)
+print("Creating new Dockerfile with AWS credentials")
+docker_f = open(dockerfile_template, "r")
 dockerfile = docker_f.read()
 docker_f.close()
 
 dockerfile = re.sub("\"YOUR_ACCESS_KEY\"", f"\"{aws_access_key}\"", dockerfile)
 dockerfile = re.sub("\"YOUR_SECRET_ACCESS_KEY\"", f"\"{aws_secret_key}\"", dockerfile)
 
-docker_f = open("Dockerfile", "w")
-docker_f.write(dockerfile)
-docker_f.close()
+setup_runner.write_if_changed("Dockerfile", dockerfile)
 
 # Add AWS credentials to R environment for docker image
 # Create copy of original docker image files that will have custom names
@@ -59,16 +67,33 @@ docker_files_dir = "docker_image_files"
 if os.path.exists(docker_files_dir):
     shutil.rmtree(docker_files_dir)
 
-shutil.copytree(docker_original_files_dir, docker_files_dir)
+# artis_prefetch.py goes in docker_build/helpers/ below instead
+shutil.copytree(docker_original_files_dir, docker_files_dir,
+                ignore=shutil.ignore_patterns("artis_prefetch.py", "__pycache__"))
 
 print("Adding AWS credentials to R environment for docker image")
 renviron_f = open("docker_image_files/.Renviron", "w")
 renviron_f.writelines([
-    f"AWS_ACCESS_KEY=\"{aws_access_key}\"",
-    f"AWS_SECRET_ACCESS_KEY=\"{aws_secret_key}\""
+    f"AWS_ACCESS_KEY=\"{aws_access_key}\"\n",
+    f"AWS_SECRET_ACCESS_KEY=\"{aws_secret_key}\"\n"
 ])
 renviron_f.close()
 
+# Job-start prefetcher: S3 bucket name plus the shared transfer and timing event modules it imports.
+# They change more often than the image's dependencies, so the Dockerfile copies
+# docker_build/helpers/ in after the dependency layers rather than with docker_image_files/
+print("Adding S3 bucket name and transfer helpers to the job-start prefetcher")
+helpers_dir = os.path.join("docker_build", "helpers")
+os.makedirs(helpers_dir, exist_ok=True)
+prefetch_f = open(os.path.join(docker_original_files_dir, "artis_prefetch.py"), "r")
+prefetch = prefetch_f.read()
+prefetch_f.close()
+
+prefetch = re.sub("artis_bucket_name = \"artis-s3-bucket\"", f"artis_bucket_name = \"{s3_bucket_name}\"", prefetch)
+setup_runner.write_if_changed(os.path.join(helpers_dir, "artis_prefetch.py"), prefetch)
+shutil.copyfile(os.path.join("aws_scripts", "s3_transfer.py"), os.path.join(helpers_dir, "s3_transfer.py"))
+shutil.copyfile(os.path.join("aws_scripts", "artis_events.py"), os.path.join(helpers_dir, "artis_events.py"))
+
 # writing out original main tf file to project root directory
 tf_dir = "terraform_scripts"
 main_tf_f = open(os.path.join(tf_dir, "main.tf"), "r")
@@ -76,9 +101,7 @@ main_tf = main_tf_f.read()
 main_tf_f.close()
 
 print("Creating terraform main.tf file")
-main_tf_f = open("main.tf", "w")
-main_tf_f.write(main_tf)
-main_tf_f.close()
+setup_runner.write_if_changed("main.tf", main_tf)
 
 # Adding S3 and ECR names to all appropriate files
 
@@ -94,9 +117,7 @@ variables_tf = re.sub("default = \"artis-image\"", f"default = \"{ecr_repo_name}
 if chip_infrastructure == "arm64":
     variables_tf = re.sub("default = \"X86_64\"", f"default = \"ARM64\"", variables_tf)
 
-tf_var_f = open("variables.tf", "w")
-tf_var_f.write(variables_tf)
-tf_var_f.close()
+setup_runner.write_if_changed("variables.tf", variables_tf)
 
 # Adding S3 bucket name to all R files
 original_docker_dir = "docker_image_files_original"
@@ -130,19 +151,30 @@ s3_upload = s3_upload_f.read()
 s3_upload_f.close()
 
 s3_upload = re.sub("s3_bucket_name = \"artis-s3-bucket\"", f"s3_bucket_name = \"{s3_bucket_name}\"", s3_upload)
-s3_upload_f = open("s3_upload.py", "w")
-s3_upload_f.write(s3_upload)
-s3_upload_f.close()
+setup_runner.write_if_changed("s3_upload.py", s3_upload)
 
 print("Creating S3 download script")
 s3_download_f = open(os.path.join(aws_script_dir, "s3_download.py"), "r")
 s3_download = s3_download_f.read()
 s3_download_f.close()
 
-s3_download = re.sub("artis_bucket_name = \"artis-s3-bucket\"", f"s3_bucket_name = \"{s3_bucket_name}\"", s3_download)
-s3_download_f = open("s3_download.py", "w")
-s3_download_f.write(s3_download)
-s3_download_f.close()
+s3_download = re.sub("artis_bucket_name = \"artis-s3-bucket\"", f"artis_bucket_name = \"{s3_bucket_name}\"", s3_download)
+setup_runner.write_if_changed("s3_download.py", s3_download)
+
+print("Creating S3 stage copy script")
+with open(os.path.join(aws_script_dir, "s3_stage_copy.py"), "r") as s3_stage_copy_f:
+    s3_stage_copy = s3_stage_copy_f.read()
+s3_stage_copy = re.sub("artis_bucket_name = \"artis-s3-bucket\"", f"artis_bucket_name = \"{s3_bucket_name}\"", s3_stage_copy)
+setup_runner.write_if_changed("s3_stage_copy.py", s3_stage_copy)
+
+# Shared S3 transfer helpers imported by the upload and download scripts
+print("Copying S3 transfer, listing index, code hash, timing event and snet consolidation helper modules")
+shutil.copyfile(os.path.join(aws_script_dir, "s3_transfer.py"), "s3_transfer.py")
+shutil.copyfile(os.path.join(aws_script_dir, "s3_index.py"), "s3_index.py")
+shutil.copyfile(os.path.join(aws_script_dir, "artis_code_hash.py"), "artis_code_hash.py")
+shutil.copyfile(os.path.join(aws_script_dir, "artis_events.py"), "artis_events.py")
+shutil.copyfile(os.path.join(aws_script_dir, "consolidate_snet.py"), "consolidate_snet.py")
+shutil.copyfile(os.path.join(aws_script_dir, "convert_model_inputs.py"), "convert_model_inputs.py")
 
 # Adding ECR repo name to docker creation and upload
 print("Creating Docker image creation and upload script")
@@ -151,34 +183,58 @@ ecr = ecr_f.read()
 ecr_f.close()
 
 ecr = re.sub("LOCAL_REPOSITORY = \"artis-image\"", f"LOCAL_REPOSITORY = \"{ecr_repo_name}\"", ecr)
-ecr_f = open("docker_image_create_and_upload.py", "w")
-ecr_f.write(ecr)
-ecr_f.close()
-
-try:
-    # Run terraform commands to create AWS infrastructure
-    print("Creating AWS infrastructure")
-    os.system("terraform init")
-    os.system("terraform fmt")
-    os.system("terraform validate")
-    os.system("terraform apply -auto-approve")
-
-    # Run python script to upload all S3 files
-    print("Uploading model input files")
-    os.system("python3 s3_upload.py")
-
-    # Run python script to create and upload ARTIS docker image
-    print("Creating docker image and uploading docker image to remote AWS ECR")
-    if existing_image == None:
-        os.system("python3 docker_image_create_and_upload.py")
-    else:
-        os.system(f"python3 docker_image_create_and_upload.py -di {existing_image}")
-
-    # Runing script to submit jobs to AWS ARTIS HPC
-    #print("Submitting Jobs to AWS ARTIS HPC")
-    #os.system("python3 submit_artis_jobs.py")
-
-    print("Done!")
-except:
-    print("Error occured...destroying all AWS resources")
-    os.system("terraform destroy -auto-approve")
\ No newline at end of file
+setup_runner.write_if_changed("docker_image_create_and_upload.py", ecr)
+
+# Run setup stages: the image build runs concurrently with terraform; the S3 upload
+# and the image push start once terraform has created the bucket and ECR repo.
+# Each stage is skipped when the hash of its inputs matches its last successful run.
+image_inputs = ["Dockerfile", "docker_image_files", helpers_dir]
+build_cmd = ["python3", "docker_image_create_and_upload.py"]
+if existing_image is not None:
+    build_cmd += ["-di", existing_image]
+if args.with_package:
+    # the package sources become part of the image, so they are image inputs too
+    build_cmd += ["--with-package"]
+    image_inputs += [os.path.join("data_s3_upload", "ARTIS_model_code", name) for name in ("DESCRIPTION", "NAMESPACE", "R")]
+if {"image-build", "image-push", "all"} & set(args.force):
+    # also bypass the script's own "already in ECR" check
+    build_cmd += ["--force"]
+
+# hashed when the stage starts, so files written by the convert stage are included
+upload = setup_runner.Stage("upload", [["python3", "s3_upload.py", "--sync"]], after=["terraform"],
+                            inputs=lambda: setup_runner.hash_inputs(files=["s3_upload.py"], stat_files=["data_s3_upload"]))
+
+stages = [
+    setup_runner.Stage("terraform", [
+        ["terraform", "init"],
+        ["terraform", "fmt"],
+        ["terraform", "validate"],
+        ["terraform", "apply", "-auto-approve"]
+    ], inputs=setup_runner.hash_inputs(files=["main.tf", "variables.tf"])),
+    upload,
+    setup_runner.Stage("image-build", [build_cmd + ["--build-only"]],
+                       inputs=setup_runner.hash_inputs(files=image_inputs, values=[existing_image or ""])),
+    setup_runner.Stage("image-push", [build_cmd + ["--push-only"]], after=["terraform", "image-build"],
+                       inputs=setup_runner.hash_inputs(files=image_inputs + ["docker_image_create_and_upload.py"],
+                                                       values=[existing_image or ""]))
+]
+
+# Optional conversion of the CSV model inputs before they are uploaded
+if args.convert_inputs:
+    convert_script = os.path.join(aws_script_dir, "convert_model_inputs.py")
+    stages.append(setup_runner.Stage(
+        "convert", [["python3", convert_script, "--format", args.convert_inputs]],
+        inputs=setup_runner.hash_inputs(files=[convert_script], stat_files=["data_s3_upload/model_inputs"],
+                                        values=[args.convert_inputs])
+    ))
+    upload.after.append("convert")
+
+# Runing script to submit jobs to AWS ARTIS HPC
+#print("Submitting Jobs to AWS ARTIS HPC")
+#os.system("python3 submit_artis_jobs.py")
+
+if not setup_runner.run_stages(stages, force=args.force):
+    print("Setup failed. Fix the failing stage and re-run; `terraform destroy` removes any AWS resources already created.")
+    sys.exit(1)
+
+print("Done!")
@@ -3,6 +3,7 @@ import sys
 import argparse
 import shutil
 import re
+import setup_runner
 
 # Command line argument parsing------------------------------------------------------
 parser = argparse.ArgumentParser()
@@ -13,6 +14,13 @@ parser.add_argument("-aws_secret_key", "--aws_secret_access_key", help="AWS Secr
 parser.add_argument("-s3", "--s3_bucket", help="AWS S3 Bucket name")
 parser.add_argument("-ecr", "--ecr_repo", help="AWS ECR Repository name")
 parser.add_argument("-di", "--docker_image", help="Existing Docker Image")
+parser.add_argument("--force", action="append", default=[], metavar="STAGE",
+                    choices=["terraform", "convert", "upload", "image-build", "image-push", "all"],
+                    help="Re-run a stage even if its inputs are unchanged (repeatable, or 'all')")
+parser.add_argument("--convert-inputs", choices=["parquet", "csv.zst"],
+                    help="Also upload model inputs as partitioned Parquet or csv.zst (aws_scripts/convert_model_inputs.py)")
+parser.add_argument("--with-package", action="store_true",
+                    help="Pre-install the ARTIS R package in the Docker image (skips devtools::install() in jobs)")
 args = parser.parse_args()
 
 chip_infrastructure   = args.chip
@@ -22,27 +30,27 @@ s3_bucket_name        = args.s3_bucket
 ecr_repo_name         = args.ecr_repo
 existing_image        = args.docker_image
 
-# Copy appropriate Dockerfile based on chip infrastructure-------------------------
-print("Creating new Dockerfile")
+# Pick the Dockerfile template based on chip infrastructure-------------------------
 if chip_infrastructure == "x86":
-    shutil.copyfile("docker_mac_x86/Dockerfile", "./Dockerfile")
+    dockerfile_template = "docker_mac_x86/Dockerfile"
 else:
-    shutil.copyfile("docker_mac_arm64/Dockerfile", "./Dockerfile")
+    dockerfile_template = "docker_mac_arm64/Dockerfile"
 
 # Add AWS credentials to local environment------------------------------------------
 print("Adding AWS credentials to local environment")
 os.environ["AWS_ACCESS_KEY"]        = aws_access_key
 os.environ["AWS_SECRET_ACCESS_KEY"] = aws_secret_key
 os.environ["AWS_REGION"]            = "us-east-1"
+os.environ["ARTIS_S3_BUCKET"]       = s3_bucket_name
 
 # Inject AWS credentials into Dockerfile--------------------------------------------
-print("Adding AWS credentials to Dockerfile")
-with open("Dockerfile", "r") as docker_f:
+# Rendered files are only rewritten when their content changes (see setup_runner.write_if_changed)
+print("Creating new Dockerfile with AWS credentials")
+with open(dockerfile_template, "r") as docker_f:
     dockerfile = docker_f.read()
 dockerfile = re.sub(r"\"YOUR_ACCESS_KEY\"", f"\"{aws_access_key}\"", dockerfile)
 dockerfile = re.sub(r"\"YOUR_SECRET_ACCESS_KEY\"", f"\"{aws_secret_key}\"", dockerfile)
-with open("Dockerfile", "w") as docker_f:
-    docker_f.write(dockerfile)
+setup_runner.write_if_changed("Dockerfile", dockerfile)
 
 # Prepare Docker image files--------------------------------------------------------
 print("Creating custom set of files for use by docker image")
@@ -50,7 +58,9 @@ docker_original_files_dir = "docker_image_files_original"
 docker_files_dir          = "docker_image_files"
 if os.path.exists(docker_files_dir):
     shutil.rmtree(docker_files_dir)
-shutil.copytree(docker_original_files_dir, docker_files_dir)
+# artis_prefetch.py goes in docker_build/helpers/ below instead
+shutil.copytree(docker_original_files_dir, docker_files_dir,
+                ignore=shutil.ignore_patterns("artis_prefetch.py", "__pycache__"))
 
 print("Adding AWS credentials to R environment for docker image")
 with open(os.path.join(docker_files_dir, ".Renviron"), "w") as renviron_f:
@@ -59,13 +69,25 @@ with open(os.path.join(docker_files_dir, ".Renviron"), "w") as renviron_f:
         f"AWS_SECRET_ACCESS_KEY=\"{aws_secret_key}\"\n"
     ])
 
+# Job-start prefetcher: S3 bucket name plus the shared transfer and timing event modules it imports.
+# They change more often than the image's dependencies, so the Dockerfile copies
+# docker_build/helpers/ in after the dependency layers rather than with docker_image_files/
+print("Adding S3 bucket name and transfer helpers to the job-start prefetcher")
+helpers_dir = os.path.join("docker_build", "helpers")
+os.makedirs(helpers_dir, exist_ok=True)
+with open(os.path.join(docker_original_files_dir, "artis_prefetch.py"), "r") as prefetch_f:
+    prefetch = prefetch_f.read()
+prefetch = re.sub(r'artis_bucket_name = "artis-s3-bucket"', f'artis_bucket_name = "{s3_bucket_name}"', prefetch)
+setup_runner.write_if_changed(os.path.join(helpers_dir, "artis_prefetch.py"), prefetch)
+shutil.copyfile(os.path.join("aws_scripts", "s3_transfer.py"), os.path.join(helpers_dir, "s3_transfer.py"))
+shutil.copyfile(os.path.join("aws_scripts", "artis_events.py"), os.path.join(helpers_dir, "artis_events.py"))
+
 # Write out Terraform files---------------------------------------------------------
 tf_dir = "terraform_scripts"
 print("Creating terraform main.tf file")
 with open(os.path.join(tf_dir, "main.tf"), "r") as main_tf_f:
     main_tf = main_tf_f.read()
-with open("main.tf", "w") as main_tf_f:
-    main_tf_f.write(main_tf)
+setup_runner.write_if_changed("main.tf", main_tf)
 
 print("Creating variables.tf file")
 with open(os.path.join(tf_dir, "variables.tf"), "r") as tf_var_f:
@@ -74,8 +96,7 @@ variables_tf = re.sub(r'default = "artis-s3-bucket"', f'default = "{s3_bucket_na
 variables_tf = re.sub(r'default = "artis-image"', f'default = "{ecr_repo_name}"', variables_tf)
 if chip_infrastructure == "arm64":
     variables_tf = re.sub(r'default = "X86_64"', 'default = "ARM64"', variables_tf)
-with open("variables.tf", "w") as tf_var_f:
-    tf_var_f.write(variables_tf)
+setup_runner.write_if_changed("variables.tf", variables_tf)
 
 # Update R scripts with S3 bucket name---------------------------------------------
 original_docker_dir = docker_original_files_dir
@@ -99,44 +120,84 @@ print("Creating S3 upload script")
 with open(os.path.join(aws_script_dir, "s3_upload.py"), "r") as s3_upload_f:
     s3_upload = s3_upload_f.read()
 s3_upload = re.sub(r's3_bucket_name = "artis-s3-bucket"', f's3_bucket_name = "{s3_bucket_name}"', s3_upload)
-with open("s3_upload.py", "w") as s3_upload_f:
-    s3_upload_f.write(s3_upload)
+setup_runner.write_if_changed("s3_upload.py", s3_upload)
 
 print("Creating S3 download script")
 with open(os.path.join(aws_script_dir, "s3_download.py"), "r") as s3_download_f:
     s3_download = s3_download_f.read()
 s3_download = re.sub(r'artis_bucket_name = "artis-s3-bucket"', f'artis_bucket_name = "{s3_bucket_name}"', s3_download)
-with open("s3_download.py", "w") as s3_download_f:
-    s3_download_f.write(s3_download)
+setup_runner.write_if_changed("s3_download.py", s3_download)
+
+print("Creating S3 stage copy script")
+with open(os.path.join(aws_script_dir, "s3_stage_copy.py"), "r") as s3_stage_copy_f:
+    s3_stage_copy = s3_stage_copy_f.read()
+s3_stage_copy = re.sub(r'artis_bucket_name = "artis-s3-bucket"', f'artis_bucket_name = "{s3_bucket_name}"', s3_stage_copy)
+setup_runner.write_if_changed("s3_stage_copy.py", s3_stage_copy)
+
+print("Copying S3 transfer, listing index, code hash, timing event and snet consolidation helper modules")
+shutil.copyfile(os.path.join(aws_script_dir, "s3_transfer.py"), "s3_transfer.py")
+shutil.copyfile(os.path.join(aws_script_dir, "s3_index.py"), "s3_index.py")
+shutil.copyfile(os.path.join(aws_script_dir, "artis_code_hash.py"), "artis_code_hash.py")
+shutil.copyfile(os.path.join(aws_script_dir, "artis_events.py"), "artis_events.py")
+shutil.copyfile(os.path.join(aws_script_dir, "consolidate_snet.py"), "consolidate_snet.py")
+shutil.copyfile(os.path.join(aws_script_dir, "convert_model_inputs.py"), "convert_model_inputs.py")
 
 print("Creating Docker image creation and upload script")
 with open(os.path.join(aws_script_dir, "docker_image_create_and_upload.py"), "r") as ecr_f:
     ecr = ecr_f.read()
 ecr = re.sub(r'LOCAL_REPOSITORY = "artis-image"', f'LOCAL_REPOSITORY = "{ecr_repo_name}"', ecr)
-with open("docker_image_create_and_upload.py", "w") as ecr_f:
-    ecr_f.write(ecr)
+setup_runner.write_if_changed("docker_image_create_and_upload.py", ecr)
 
 # Execute infrastructure setup, uploads, and image push----------------------------
-try:
-    print("Creating AWS infrastructure")
-    os.system("terraform init")
-    os.system("terraform fmt")
-    os.system("terraform validate")
-    os.system("terraform apply -auto-approve")
-
-    if args.skip_upload:
-        print("Skipping S3 upload step as requested")
-    else:
-        print("Uploading model input files")
-        os.system("python3 s3_upload.py")
-
-    print("Creating docker image and uploading docker image to remote AWS ECR")
-    if existing_image is None:
-        os.system("python3 docker_image_create_and_upload.py")
-    else:
-        os.system(f"python3 docker_image_create_and_upload.py -di {existing_image}")
-
-    print("Done!")
-except:
-    print("Error occured...destroying all AWS resources")
-    os.system("terraform destroy -auto-approve")
+# the image build runs concurrently with terraform; the S3 upload and the push
+# wait for terraform (bucket, ECR repo). Each stage is skipped when the hash of
+# its inputs matches its last successful run.
+image_inputs = ["Dockerfile", "docker_image_files", helpers_dir]
+build_cmd = ["python3", "docker_image_create_and_upload.py"]
+if existing_image is not None:
+    build_cmd += ["-di", existing_image]
+if args.with_package:
+    # the package sources become part of the image, so they are image inputs too
+    build_cmd += ["--with-package"]
+    image_inputs += [os.path.join("data_s3_upload", "ARTIS_model_code", name) for name in ("DESCRIPTION", "NAMESPACE", "R")]
+if {"image-build", "image-push", "all"} & set(args.force):
+    # also bypass the script's own "already in ECR" check
+    build_cmd += ["--force"]
+
+stages = [
+    setup_runner.Stage("terraform", [
+        ["terraform", "init"],
+        ["terraform", "fmt"],
+        ["terraform", "validate"],
+        ["terraform", "apply", "-auto-approve"]
+    ], inputs=setup_runner.hash_inputs(files=["main.tf", "variables.tf"])),
+    setup_runner.Stage("image-build", [build_cmd + ["--build-only"]],
+                       inputs=setup_runner.hash_inputs(files=image_inputs, values=[existing_image or ""])),
+    setup_runner.Stage("image-push", [build_cmd + ["--push-only"]], after=["terraform", "image-build"],
+                       inputs=setup_runner.hash_inputs(files=image_inputs + ["docker_image_create_and_upload.py"],
+                                                       values=[existing_image or ""]))
+]
+if args.skip_upload:
+    print("Skipping S3 upload step as requested")
+else:
+    # hashed when the stage starts, so files written by the convert stage are included
+    upload = setup_runner.Stage("upload", [["python3", "s3_upload.py", "--sync"]], after=["terraform"],
+                                inputs=lambda: setup_runner.hash_inputs(files=["s3_upload.py"],
+                                                                        stat_files=["data_s3_upload"]))
+    stages.append(upload)
+
+    # Optional conversion of the CSV model inputs before they are uploaded
+    if args.convert_inputs:
+        convert_script = os.path.join(aws_script_dir, "convert_model_inputs.py")
+        stages.append(setup_runner.Stage(
+            "convert", [["python3", convert_script, "--format", args.convert_inputs]],
+            inputs=setup_runner.hash_inputs(files=[convert_script], stat_files=["data_s3_upload/model_inputs"],
+                                            values=[args.convert_inputs])
+        ))
+        upload.after.append("convert")
+
+if not setup_runner.run_stages(stages, force=args.force):
+    print("Setup failed. Fix the failing stage and re-run; `terraform destroy` removes any AWS resources already created.")
+    sys.exit(1)
+
+print("Done!")
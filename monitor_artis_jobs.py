@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+monitor_artis_jobs.py
+
+Follow the AWS Batch jobs recorded in one or more run files (written by
+submit_artis_jobs.py, submit_artis_pipeline.py, submit_restart_artis_snet_jobs.py
+and submit_combine_tables_job.py) until they all finish.
+
+ - Polls describe_jobs in batches of up to 100 IDs and only for jobs that are
+   not finished yet, backing off while nothing changes or when throttled.
+ - Shows a compact table of state, attempt count and elapsed time per
+   HS version / year.
+ - Writes per-job queue-wait and run-duration statistics to JSON for sizing
+   future runs.
+
+    python3 monitor_artis_jobs.py                   # latest run file in runs/
+    python3 monitor_artis_jobs.py runs/<file>.json --once
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from botocore.exceptions import ClientError
+import artis_jobs
+
+TERMINAL_STATES = {"SUCCEEDED", "FAILED"}
+STATE_ORDER = ["SUBMITTED", "PENDING", "RUNNABLE", "STARTING", "RUNNING", "SUCCEEDED", "FAILED"]
+
+
+def poll(batch, jobs, state):
+    """Refresh state for unfinished jobs; returns True if any status changed."""
+    pending = [job_id for _, job_id in jobs if state.get(job_id, {}).get("status") not in TERMINAL_STATES]
+    changed = False
+    for job in artis_jobs.describe_jobs(batch, pending):
+        previous = state.get(job["jobId"], {}).get("status")
+        changed = changed or previous != job["status"]
+        state[job["jobId"]] = job
+    return changed
+
+
+def seconds_between(start_ms, end_ms):
+    if start_ms is None or end_ms is None:
+        return None
+    return round((end_ms - start_ms) / 1000.0, 1)
+
+
+def job_stats(label, job_id, job):
+    """Queue-wait and run-duration statistics for one describe_jobs entry."""
+    created = job.get("createdAt")
+    started = job.get("startedAt")
+    stopped = job.get("stoppedAt")
+    return {
+        "label": label,
+        "job_id": job_id,
+        "status": job.get("status"),
+        "status_reason": job.get("statusReason"),
+        "attempts": len(job.get("attempts", [])),
+        "created_at": created,
+        "started_at": started,
+        "stopped_at": stopped,
+        "queue_wait_s": seconds_between(created, started),
+        "run_s": seconds_between(started, stopped)
+    }
+
+
+def format_elapsed(seconds):
+    if seconds is None:
+        return "-"
+    hours, rest = divmod(int(seconds), 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours:d}:{minutes:02d}:{secs:02d}"
+
+
+def print_table(jobs, state):
+    now_ms = time.time() * 1000
+    if sys.stdout.isatty():
+        print("\033[2J\033[H", end="")
+    print(f"{'JOB':<20} {'STATE':<10} {'TRY':>3} {'ELAPSED':>9}")
+    counts = {}
+    for label, job_id in jobs:
+        job    = state.get(job_id, {})
+        status = job.get("status", "UNKNOWN")
+        counts[status] = counts.get(status, 0) + 1
+        # running time once started, time in queue before that
+        start  = job.get("startedAt") or job.get("createdAt")
+        end    = job.get("stoppedAt") or now_ms
+        print(f"{label:<20} {status:<10} {len(job.get('attempts', [])):>3} "
+              f"{format_elapsed(seconds_between(start, end) if start else None):>9}")
+    summary = ", ".join(f"{s}: {counts[s]}" for s in STATE_ORDER + ["UNKNOWN"] if s in counts)
+    print(f"\n{len(jobs)} job(s) - {summary}")
+
+
+def write_stats(path, jobs, state):
+    entries = [job_stats(label, job_id, state.get(job_id, {})) for label, job_id in jobs]
+    finished = [e for e in entries if e["run_s"] is not None]
+    summary = {
+        "jobs": len(entries),
+        "succeeded": sum(e["status"] == "SUCCEEDED" for e in entries),
+        "failed": sum(e["status"] == "FAILED" for e in entries),
+        "max_queue_wait_s": max((e["queue_wait_s"] for e in entries if e["queue_wait_s"] is not None), default=None),
+        "max_run_s": max((e["run_s"] for e in finished), default=None),
+        "mean_run_s": round(sum(e["run_s"] for e in finished) / len(finished), 1) if finished else None
+    }
+    with open(path, "w") as f:
+        json.dump({"summary": summary, "jobs": entries}, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor submitted ARTIS AWS Batch jobs.")
+    parser.add_argument("run_files", nargs="*",
+                        help="Run files to monitor (default: the latest file in runs/)")
+    parser.add_argument("--interval", type=float, default=30,
+                        help="Seconds between polls while jobs are changing (default 30)")
+    parser.add_argument("--max-interval", type=float, default=300,
+                        help="Upper bound for the poll interval while nothing changes (default 300)")
+    parser.add_argument("--once", action="store_true", help="Poll once, print the table and exit")
+    parser.add_argument("--stats", help="Statistics JSON path (default: <run file>_stats.json)")
+    args = parser.parse_args()
+
+    run_files = args.run_files or [artis_jobs.latest_run_file()]
+    if run_files == [None]:
+        sys.exit(f"No run files found in {artis_jobs.RUNS_DIR}/. Submit jobs first or pass a run file.")
+
+    jobs = []
+    for run_file in run_files:
+        jobs.extend(artis_jobs.run_jobs(artis_jobs.load_run(run_file)))
+    stats_path = args.stats or f"{os.path.splitext(run_files[-1])[0]}_stats.json"
+
+    batch    = artis_jobs.create_batch_client()
+    state    = {}
+    interval = args.interval
+    while True:
+        try:
+            changed  = poll(batch, jobs, state)
+            interval = args.interval if changed else min(interval * 1.5, args.max_interval)
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in ("TooManyRequestsException", "ThrottlingException"):
+                raise
+            interval = min(interval * 2, args.max_interval)
+            print(f"Throttled by AWS Batch, next poll in {interval:.0f}s")
+
+        print_table(jobs, state)
+        write_stats(stats_path, jobs, state)
+
+        done = all(state.get(job_id, {}).get("status") in TERMINAL_STATES for _, job_id in jobs)
+        if done or args.once:
+            break
+        print(f"Next poll in {interval:.0f}s (Ctrl+C to stop; statistics in {stats_path})")
+        time.sleep(interval)
+
+    print(f"Statistics written to {stats_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+plan_restart_jobs.py
+
+Work out which parts of an ARTIS run are still missing in S3 and submit jobs
+for only those parts.
+
+ 1. Lists the quadprog, cvxopt and snet output prefixes once each into the
+    local listing index (s3_index.py), reused while younger than its TTL.
+ 2. Looks up which *_all-country-est_<year>_HS<ver>.RDS files (per solver) and
+    snet consumption outputs already exist.
+ 3. Computes the minimal set of (HS, year, stage) tasks still missing:
+      solve - a solver's all-country-est file is missing, so the full
+              pipeline has to run for that year (job_hs_year.sh);
+      snet  - both country solutions exist but the snet outputs do not, so
+              get_snet() is restarted for that year (02-artis-pipeline-restart-snet.R).
+ 4. With --submit, submits one job per (HS, stage) covering only the missing
+    years, passing HS version and years as parameters, and records the
+    jobs in a run file for monitor_artis_jobs.py.
+
+Without --submit the plan is only printed.
+
+    python3 plan_restart_jobs.py                 # dry run for HS_VERSIONS
+    python3 plan_restart_jobs.py --hs 96 --submit
+"""
+
+import os
+import re
+import sys
+import argparse
+import artis_jobs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "aws_scripts"))
+import s3_transfer  # noqa: E402
+import s3_index  # noqa: E402
+
+QUADPROG_PREFIX = "outputs/quadprog_snet/"
+CVXOPT_PREFIX   = "outputs/cvxopt_snet/"
+SNET_PREFIX     = "outputs/snet/"
+
+# same pattern get_snet() and the restart scripts use to find country solutions
+COUNTRY_EST_RE = re.compile(r"_all-country-est_(\d{4})_HS(\d{2})\.RDS$")
+# consumption table written by get_snet() once a year is finished
+SNET_DONE_RE   = re.compile(r"_consumption_(\d{4})_HS(\d{2})\.qs$")
+
+
+def index_outputs(index, prefix, pattern):
+    """Set of (hs_version, year) with at least one indexed key under prefix matching pattern."""
+    found = set()
+    for key in index.keys(prefix, pattern.pattern):
+        match = pattern.search(key)
+        if match:
+            year, hs_version = match.groups()
+            found.add((hs_version, int(year)))
+    return found
+
+
+def plan_tasks(hs_versions, quadprog, cvxopt, snet):
+    """Return {(hs_version, stage): [years]} for every missing (HS, year, stage)."""
+    tasks = {}
+    for hs_version in hs_versions:
+        for year in artis_jobs.analysis_years(hs_version):
+            key = (hs_version, year)
+            if key not in quadprog or key not in cvxopt:
+                stage = "solve"
+            elif key not in snet:
+                stage = "snet"
+            else:
+                continue
+            tasks.setdefault((hs_version, stage), []).append(year)
+    return tasks
+
+
+def submit_tasks(batch, tasks, profiles=None, policy=None):
+    """Submit one job (or year array job) per (HS, stage); returns run file nodes."""
+    nodes = {}
+    for (hs_version, stage), years in sorted(tasks.items()):
+        resources = artis_jobs.resolve_resources(profiles, hs_version, years, stage)
+        if stage == "solve":
+            response = artis_jobs.submit_hs_year_jobs(batch, hs_version, years, resources=resources, policy=policy)
+            kind = "hs"
+        else:
+            response = artis_jobs.submit_restart_job(batch, hs_version, years, resources=resources, policy=policy)
+            kind = "restart"
+        nodes[f"HS{hs_version}-{stage}"] = artis_jobs.run_node(
+            kind, response, hs_version=hs_version, years=years, stage=stage, resources=resources
+        )
+        print(f"Submitted {stage} for HS{hs_version} ({len(years)} year(s), "
+              f"{artis_jobs.describe_resources(resources)}, {artis_jobs.describe_retry_policy(policy, stage)}): "
+              f"{response['jobId']} on {response['jobQueue']}")
+    return nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Submit jobs for only the missing (HS, year, stage) slices of a run.")
+    parser.add_argument("--hs", help="Comma-separated HS versions (default: HS_VERSIONS)")
+    parser.add_argument("--submit", action="store_true", help="Submit the planned jobs (default: dry run)")
+    parser.add_argument("--resources", metavar="FILE",
+                        help="Resource profile file (default: ARTIS_RESOURCE_PROFILES, else the job definition's size)")
+    parser.add_argument("--retry-policy", metavar="FILE",
+                        help="Retry policy file: evaluateOnExit rules, per-stage timeouts and ordered job queues "
+                             "(default: ARTIS_RETRY_POLICY, else the job definition's retries and artis-job-queue)")
+    s3_index.add_index_arguments(parser)
+    args = parser.parse_args()
+
+    hs_versions = args.hs.split(",") if args.hs else artis_jobs.read_hs_versions()
+    profiles = artis_jobs.load_resource_profiles(args.resources)
+    policy = artis_jobs.load_retry_policy(args.retry_policy)
+    bucket = s3_transfer.resolve_bucket()
+    s3 = s3_transfer.get_s3_client()
+
+    prefixes = [QUADPROG_PREFIX, CVXOPT_PREFIX, SNET_PREFIX]
+    with s3_index.open_index(s3, bucket, prefixes, args.index, args.index_ttl, args.refresh_index) as index:
+        quadprog = index_outputs(index, QUADPROG_PREFIX, COUNTRY_EST_RE)
+        cvxopt   = index_outputs(index, CVXOPT_PREFIX, COUNTRY_EST_RE)
+        snet     = index_outputs(index, SNET_PREFIX, SNET_DONE_RE)
+
+    tasks = plan_tasks(hs_versions, quadprog, cvxopt, snet)
+    if not tasks:
+        print("Nothing missing: every HS version/year has country solutions and snet outputs.")
+        return
+
+    for (hs_version, stage), years in sorted(tasks.items()):
+        resources = artis_jobs.describe_resources(artis_jobs.resolve_resources(profiles, hs_version, years, stage))
+        print(f"HS{hs_version} {stage:<5} {len(years):>3} year(s) [{resources}]: {', '.join(str(y) for y in years)}")
+
+    if not args.submit:
+        print("Dry run. Re-run with --submit to submit these jobs.")
+        return
+
+    nodes = submit_tasks(artis_jobs.create_batch_client(), tasks, profiles, policy)
+    artis_jobs.record_run("restart-plan", nodes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+setup_runner.py
+
+Run the setup stages of initial_setup.py / initial_setup_restart_snet.py as a
+small dependency graph:
+
+ - A stage starts as soon as every stage it runs after has succeeded, so
+   independent stages (e.g. terraform and the image build) run concurrently.
+ - Each stage's commands run in order; their output is streamed line by line
+   with a "[stage]" prefix.
+ - The first non-zero exit stops the run: running stages are terminated and
+   stages that have not started are cancelled.
+ - A per-stage timing breakdown is printed at the end, and every stage is
+   logged as an artis_events "setup:<stage>" event. The stages' commands
+   share the run's ARTIS_RUN_ID, so their own upload/build events land in
+   the same run of the event log.
+ - Stages with an input hash are checkpointed in .setup_checkpoints.json once
+   they succeed. On the next run a stage whose inputs hash the same (and whose
+   dependencies were skipped too) is skipped; force=[stage, ...] or "all"
+   overrides that.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "aws_scripts"))
+import artis_events  # noqa: E402
+
+STATUS_OK        = "ok"
+STATUS_FAILED    = "failed"
+STATUS_CANCELLED = "cancelled"
+STATUS_SKIPPED   = "skipped"
+
+CHECKPOINT_FILE = ".setup_checkpoints.json"
+HASH_CHUNK      = 1024 * 1024
+
+
+def _walk(paths):
+    """Sorted files under paths (files are returned as-is, missing paths ignored)."""
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+        for root, dirs, names in os.walk(path):
+            dirs.sort()
+            files.extend(os.path.join(root, name) for name in sorted(names))
+    return sorted(files)
+
+
+def hash_inputs(files=(), stat_files=(), values=()):
+    """Hash a stage's inputs.
+
+    files are hashed by content; stat_files (large trees such as
+    data_s3_upload/) by relative path, size and mtime only; values are plain
+    strings such as bucket or image names.
+    """
+    digest = hashlib.sha256()
+    for path in _walk(files):
+        digest.update(path.replace(os.sep, "/").encode() + b"\0")
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    for path in _walk(stat_files):
+        st = os.stat(path)
+        digest.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\0".replace(os.sep, "/").encode())
+    for value in values:
+        digest.update(f"{value}\0".encode())
+    return digest.hexdigest()
+
+
+def write_if_changed(path, text):
+    """Write text to path unless it already has exactly that content; returns True if written."""
+    if os.path.isfile(path):
+        with open(path, "r") as f:
+            if f.read() == text:
+                return False
+    with open(path, "w") as f:
+        f.write(text)
+    return True
+
+
+def load_checkpoints(path=CHECKPOINT_FILE):
+    if not os.path.isfile(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_checkpoints(checkpoints, path=CHECKPOINT_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoints, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class Stage:
+    """A named list of commands (argv lists) that runs after other stages.
+
+    inputs is the hash_inputs() of everything the stage reads, or a callable
+    returning it when the stage's inputs are produced by an earlier stage (it
+    is evaluated once the dependencies have finished); stages without inputs
+    always run.
+    """
+
+    def __init__(self, name, commands, after=(), inputs=None):
+        self.name     = name
+        self.commands = commands
+        self.after    = list(after)
+        self.inputs   = inputs
+        self.status   = None
+        self.seconds  = None
+        self.process  = None
+
+
+class SetupRunner:
+    def __init__(self, stages, checkpoint_path=CHECKPOINT_FILE, force=()):
+        names = {stage.name for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.after if dep not in names]
+            if missing:
+                raise ValueError(f"Stage {stage.name} runs after unknown stage(s): {', '.join(missing)}")
+        self.stages     = stages
+        self.print_lock = threading.Lock()
+        self.state_lock = threading.Condition()
+        self.aborted    = False
+        self.width      = max(len(stage.name) for stage in stages)
+        self.force      = set(force)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoints     = load_checkpoints(checkpoint_path) if checkpoint_path else {}
+        # exported before any stage starts so every command inherits it
+        self.run_id = artis_events.run_id()
+
+    def log(self, stage, line):
+        with self.print_lock:
+            print(f"[{stage.name:<{self.width}}] {line}", flush=True)
+
+    def run_stage(self, stage):
+        start = time.time()
+        env = dict(os.environ, PYTHONUNBUFFERED="1")
+        status = STATUS_OK
+        for command in stage.commands:
+            with self.state_lock:
+                if self.aborted:
+                    status = STATUS_CANCELLED
+                    break
+                self.log(stage, f"$ {' '.join(command)}")
+                try:
+                    stage.process = subprocess.Popen(
+                        command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                        text=True, bufsize=1, env=env
+                    )
+                except OSError as e:
+                    self.log(stage, f"✘ could not start: {e}")
+                    status = STATUS_FAILED
+                    break
+            for line in stage.process.stdout:
+                self.log(stage, line.rstrip("\n"))
+            code = stage.process.wait()
+            if code != 0:
+                status = STATUS_CANCELLED if self.aborted else STATUS_FAILED
+                if status == STATUS_FAILED:
+                    self.log(stage, f"✘ exited with code {code}")
+                break
+
+        with self.state_lock:
+            stage.status  = status
+            stage.seconds = time.time() - start
+            stage.process = None
+            self.record_checkpoint(stage)
+            artis_events.emit(f"setup:{stage.name}", seconds=stage.seconds, status=status,
+                              kind=artis_events.KIND_STAGE)
+            if status == STATUS_FAILED and not self.aborted:
+                self.abort()
+            self.state_lock.notify_all()
+
+    def abort(self):
+        """Stop the run after a failure; caller holds state_lock."""
+        self.aborted = True
+        for stage in self.stages:
+            if stage.process is not None and stage.process.poll() is None:
+                stage.process.terminate()
+
+    def record_checkpoint(self, stage):
+        """Store a succeeded stage's input hash, drop it otherwise; caller holds state_lock."""
+        if not self.checkpoint_path or stage.inputs is None:
+            return
+        if stage.status == STATUS_OK:
+            self.checkpoints[stage.name] = stage.inputs
+        else:
+            self.checkpoints.pop(stage.name, None)
+        save_checkpoints(self.checkpoints, self.checkpoint_path)
+
+    def ready(self, stage):
+        done = {s.name: s.status for s in self.stages}
+        return stage.status is None and all(done[dep] in (STATUS_OK, STATUS_SKIPPED) for dep in stage.after)
+
+    def unchanged(self, stage):
+        """True if stage can be skipped: same inputs as its checkpoint and no dependency re-ran."""
+        if stage.inputs is None or self.force & {stage.name, "all"}:
+            return False
+        deps_skipped = all(s.status == STATUS_SKIPPED for s in self.stages if s.name in stage.after)
+        return deps_skipped and self.checkpoints.get(stage.name) == stage.inputs
+
+    def run(self):
+        """Run every stage; returns True if all of them succeeded."""
+        start   = time.time()
+        threads = []
+        started = set()
+        with self.state_lock:
+            while True:
+                progress = not self.aborted
+                while progress:
+                    progress = False
+                    for stage in self.stages:
+                        if stage.name in started or not self.ready(stage):
+                            continue
+                        started.add(stage.name)
+                        if callable(stage.inputs):
+                            stage.inputs = stage.inputs()
+                        if self.unchanged(stage):
+                            # dependents may now be ready, so scan again
+                            stage.status, stage.seconds = STATUS_SKIPPED, 0.0
+                            self.log(stage, "✔ inputs unchanged since the last successful run, skipping")
+                            artis_events.emit(f"setup:{stage.name}", seconds=0.0, status=STATUS_SKIPPED,
+                                              kind=artis_events.KIND_STAGE)
+                            progress = True
+                            continue
+                        thread = threading.Thread(target=self.run_stage, args=(stage,), daemon=True)
+                        threads.append(thread)
+                        thread.start()
+                running = [s for s in self.stages if s.name in started and s.status is None]
+                if not running:
+                    break
+                self.state_lock.wait()
+
+        for thread in threads:
+            thread.join()
+        for stage in self.stages:
+            if stage.status is None:
+                stage.status = STATUS_CANCELLED
+
+        self.print_timings(time.time() - start)
+        return all(stage.status in (STATUS_OK, STATUS_SKIPPED) for stage in self.stages)
+
+    def print_timings(self, elapsed):
+        print("\n─── SETUP TIMINGS ───")
+        for stage in self.stages:
+            seconds = f"{stage.seconds:8.1f}s" if stage.seconds is not None else f"{'-':>9}"
+            mark    = "✔" if stage.status in (STATUS_OK, STATUS_SKIPPED) else "✘"
+            after   = f"  (after {', '.join(stage.after)})" if stage.after else ""
+            print(f"{mark} {stage.name:<{self.width}} {seconds}  {stage.status}{after}")
+        total = sum(stage.seconds or 0 for stage in self.stages)
+        print(f"Wall clock {elapsed:.1f}s for {total:.1f}s of stage time")
+        if artis_events.log_path():
+            print(f"Timing events for run {self.run_id} in {artis_events.log_path()} "
+                  f"(summarize with: python3 artis_events.py --run {self.run_id})")
+
+
+def run_stages(stages, force=(), checkpoint_path=CHECKPOINT_FILE):
+    """Run stages as a dependency graph; returns True if every stage succeeded or was skipped."""
+    return SetupRunner(stages, checkpoint_path, force).run()
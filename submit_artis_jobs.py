@@ -1,31 +1,61 @@
+import argparse
+import artis_jobs
 
-import os
-import boto3
+# Command line argument parsing------------------------------------------------------
+parser = argparse.ArgumentParser()
+parser.add_argument("--per-year", action="store_true",
+                    help="Submit one array job per HS version with one child job per analysis year")
+parser.add_argument("--years", help="Comma-separated analysis years to run with --per-year (default: all years of each HS version)")
+parser.add_argument("--resources", metavar="FILE",
+                    help="Resource profile file mapping HS version / year / stage to vCPU and memory "
+                         "(default: ARTIS_RESOURCE_PROFILES, else the job definition's size)")
+parser.add_argument("--retry-policy", metavar="FILE",
+                    help="Retry policy file: evaluateOnExit rules, per-stage timeouts and ordered job queues "
+                         "(default: ARTIS_RETRY_POLICY, else the job definition's retries and artis-job-queue)")
+args = parser.parse_args()
 
-batch_client = boto3.client("batch",
-                            region_name=os.environ["AWS_REGION"])
-     
-# Pull HS versions from environmental variable set in run instructions README.                             
-try:
-    hs_versions = os.environ["HS_VERSIONS"].split(",")
-except KeyError:
-    print("HS_VERSIONS environment variable not set. Please export it before running this script.")
-    sys.exit(1)
+# Pull HS versions from environmental variable set in run instructions README.
+hs_versions = artis_jobs.read_hs_versions()
+selected_years = None
+if args.years:
+    if not args.per_year:
+        parser.error("--years needs --per-year")
+    try:
+        selected_years = artis_jobs.parse_years(args.years, hs_versions)
+    except ValueError as e:
+        parser.error(f"--years: {e}")
 
-# 
-for hs_version in hs_versions:
-    response = batch_client.submit_job(
-        jobName = f"artis-HS{hs_version}",
-        jobQueue = "artis-job-queue",
-        jobDefinition = "artis_job_definition",
-        containerOverrides = {
-            "command": ["bash", f"job_shell_scripts/job_hs{hs_version}.sh"]
-        }
-    )
+# Per-job vCPU/memory overrides; None keeps the job definition's fixed size
+profiles = artis_jobs.load_resource_profiles(args.resources)
+# Retry rules, attempt timeouts and queue order; None keeps the job definition's retries
+policy = artis_jobs.load_retry_policy(args.retry_policy)
+
+batch_client = artis_jobs.create_batch_client()
 
-    print(f"HS{hs_version} job submitted")
+# Submitted jobs are recorded in a run file for monitor_artis_jobs.py
+nodes = {}
+for hs_version in hs_versions:
+    if args.per_year:
+        years = artis_jobs.analysis_years(hs_version)
+        if selected_years is not None:
+            years = [y for y in years if y in selected_years]
+        if not years:
+            print(f"HS{hs_version}: no analysis years selected, skipping")
+            continue
+        resources = artis_jobs.resolve_resources(profiles, hs_version, years, stage="solve")
+        response = artis_jobs.submit_hs_year_jobs(batch_client, hs_version, years, resources=resources, policy=policy)
+        print(f"HS{hs_version} job submitted to {response['jobQueue']} for {len(years)} year(s): "
+              f"{years[0]}-{years[-1]} ({artis_jobs.describe_resources(resources)}, "
+              f"{artis_jobs.describe_retry_policy(policy, 'solve')})")
+    else:
+        years = None
+        resources = artis_jobs.resolve_resources(profiles, hs_version, stage="solve")
+        response = artis_jobs.submit_hs_job(batch_client, hs_version, resources=resources, policy=policy)
+        print(f"HS{hs_version} job submitted to {response['jobQueue']} ({artis_jobs.describe_resources(resources)}, "
+              f"{artis_jobs.describe_retry_policy(policy, 'solve')})")
     print(response)
+    nodes[f"HS{hs_version}"] = artis_jobs.run_node("hs", response, hs_version=hs_version, years=years,
+                                                   resources=resources)
 
+artis_jobs.record_run("hs", nodes)
 print("Done submitting jobs to AWS Batch")
-
-
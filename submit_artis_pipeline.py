@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+submit_artis_pipeline.py
+
+Submit a full ARTIS run as one AWS Batch job graph:
+
+ 1. One job per HS version in HS_VERSIONS (or one array job per HS version
+    with one child per analysis year when --per-year is given).
+ 2. The combine-tables job, with dependsOn pointing at every HS job, so Batch
+    starts it the moment the last HS job succeeds.
+
+The graph is recorded in a run file under runs/. If some jobs fail, run
+
+    python3 submit_artis_pipeline.py --resubmit-failed runs/<run file>.json
+
+to resubmit only the failed nodes (only the failed years of an array job)
+and a new combine-tables job that waits on them.
+
+With --resources <file> (or ARTIS_RESOURCE_PROFILES) every node is sized from
+the resource profile file (stages "solve" and "combine"); the resolved size is
+stored with the node and reused on resubmission.
+
+With --retry-policy <file> (or ARTIS_RETRY_POLICY) every node gets the
+policy's evaluateOnExit rules and stage timeout and goes to the first usable
+queue of its stage. The policy is stored in the run file; a resubmitted node
+moves on to the next queue after the one it failed on (e.g. from Spot to
+on-demand capacity).
+"""
+
+import argparse
+from datetime import datetime
+import artis_jobs
+
+COMBINE_NODE = "combine-tables"
+
+
+def hs_node_name(hs_version):
+    return f"HS{hs_version}"
+
+
+def submit_hs_node(batch, node, policy=None, skip_queue=None):
+    """Submit an HS node of the run graph and store its new job ID and queue."""
+    resources = node.get("resources")
+    if node["years"] is None:
+        response = artis_jobs.submit_hs_job(batch, node["hs_version"], resources=resources,
+                                            policy=policy, skip_queue=skip_queue)
+    else:
+        response = artis_jobs.submit_hs_year_jobs(batch, node["hs_version"], node["years"], resources=resources,
+                                                  policy=policy, skip_queue=skip_queue)
+    node["job_id"]   = response["jobId"]
+    node["job_name"] = response["jobName"]
+    node["queue"]    = response["jobQueue"]
+    return response
+
+
+def submit_combine_node(batch, node, after, policy=None, skip_queue=None):
+    response = artis_jobs.submit_combine_job(batch, after=after, resources=node.get("resources"),
+                                             policy=policy, skip_queue=skip_queue)
+    node["job_id"]   = response["jobId"]
+    node["job_name"] = response["jobName"]
+    node["queue"]    = response["jobQueue"]
+    return response
+
+
+def submit_run(batch, hs_versions, per_year, profiles=None, policy=None):
+    """Submit every HS node, then the combine node depending on all of them."""
+    run = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "hs_versions": hs_versions,
+        "per_year": per_year,
+        "retry_policy": policy,
+        "nodes": {}
+    }
+
+    for hs_version in hs_versions:
+        years = artis_jobs.analysis_years(hs_version) if per_year else None
+        node = {
+            "kind": "hs",
+            "hs_version": hs_version,
+            "years": years,
+            "resources": artis_jobs.resolve_resources(profiles, hs_version, years, stage="solve"),
+            "history": []
+        }
+        submit_hs_node(batch, node, policy)
+        run["nodes"][hs_node_name(hs_version)] = node
+        print(f"Submitted {hs_node_name(hs_version)}: {node['job_name']} ({node['job_id']} on {node['queue']}, "
+              f"{artis_jobs.describe_resources(node['resources'])}, "
+              f"{artis_jobs.describe_retry_policy(policy, 'solve')})")
+
+    hs_ids = [run["nodes"][hs_node_name(hs)]["job_id"] for hs in hs_versions]
+    combine = {
+        "kind": "combine",
+        "depends_on": [hs_node_name(hs) for hs in hs_versions],
+        "resources": artis_jobs.resolve_resources(profiles, stage="combine"),
+        "history": []
+    }
+    submit_combine_node(batch, combine, after=hs_ids, policy=policy)
+    run["nodes"][COMBINE_NODE] = combine
+    print(f"Submitted {COMBINE_NODE}: {combine['job_id']} on {combine['queue']} (after {len(hs_ids)} HS job(s))")
+    return run
+
+
+def resubmit_failed(batch, run):
+    """Resubmit the FAILED nodes of a recorded run; returns the number resubmitted."""
+    nodes    = run["nodes"]
+    policy   = run.get("retry_policy")
+    statuses = {
+        job["jobId"]: job["status"]
+        for job in artis_jobs.describe_jobs(batch, [n["job_id"] for n in nodes.values()])
+    }
+
+    resubmitted = 0
+    for name, node in nodes.items():
+        if node["kind"] != "hs" or statuses.get(node["job_id"]) != "FAILED":
+            continue
+
+        old_id = node["job_id"]
+        if node["years"] is not None and len(node["years"]) > 1:
+            # only rerun the years whose array children failed
+            indexes = artis_jobs.failed_array_indexes(batch, old_id)
+            if indexes:
+                node["years"] = [node["years"][i] for i in indexes]
+        node["history"].append(old_id)
+        submit_hs_node(batch, node, policy, skip_queue=node.get("queue"))
+        statuses[node["job_id"]] = "SUBMITTED"
+        resubmitted += 1
+        years = "" if node["years"] is None else f" years {node['years']}"
+        print(f"Resubmitted {name}{years}: {node['job_id']} on {node['queue']} (was {old_id})")
+
+    combine = nodes.get(COMBINE_NODE)
+    if combine and statuses.get(combine["job_id"]) == "FAILED":
+        # wait only on HS nodes that have not already succeeded
+        after = [
+            nodes[dep]["job_id"] for dep in combine["depends_on"]
+            if statuses.get(nodes[dep]["job_id"]) != "SUCCEEDED"
+        ]
+        old_id = combine["job_id"]
+        combine["history"].append(old_id)
+        submit_combine_node(batch, combine, after=after, policy=policy, skip_queue=combine.get("queue"))
+        resubmitted += 1
+        print(f"Resubmitted {COMBINE_NODE}: {combine['job_id']} on {combine['queue']} "
+              f"(was {old_id}, after {len(after)} HS job(s))")
+
+    return resubmitted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Submit HS jobs and the dependent combine-tables job as one graph.")
+    parser.add_argument("--per-year", action="store_true",
+                        help="Submit one array job per HS version with one child per analysis year")
+    parser.add_argument("--resubmit-failed", metavar="RUN_FILE",
+                        help="Resubmit only the failed nodes of a recorded run")
+    parser.add_argument("--resources", metavar="FILE",
+                        help="Resource profile file (default: ARTIS_RESOURCE_PROFILES, else the job definition's size)")
+    parser.add_argument("--retry-policy", metavar="FILE",
+                        help="Retry policy file: evaluateOnExit rules, per-stage timeouts and ordered job queues "
+                             "(default: ARTIS_RETRY_POLICY, else the job definition's retries and artis-job-queue)")
+    args = parser.parse_args()
+
+    batch = artis_jobs.create_batch_client()
+
+    if args.resubmit_failed:
+        run_file = args.resubmit_failed
+        run = artis_jobs.load_run(run_file)
+        if resubmit_failed(batch, run) == 0:
+            print("No failed jobs to resubmit.")
+    else:
+        run_file = artis_jobs.new_run_file("pipeline")
+        profiles = artis_jobs.load_resource_profiles(args.resources)
+        policy   = artis_jobs.load_retry_policy(args.retry_policy)
+        run = submit_run(batch, artis_jobs.read_hs_versions(), args.per_year, profiles, policy)
+
+    artis_jobs.save_run(run_file, run)
+    print(f"Job graph recorded in {run_file}")
+
+
+if __name__ == "__main__":
+    main()
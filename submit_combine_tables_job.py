@@ -1,19 +1,10 @@
+import artis_jobs
 
-import os
-import boto3
+batch_client = artis_jobs.create_batch_client()
 
-batch_client = boto3.client("batch",
-                            region_name=os.environ["AWS_REGION"])
-
-response = batch_client.submit_job(
-        jobName = f"artis-combine-tables",
-        jobQueue = "artis-job-queue",
-        jobDefinition = "artis_job_definition",
-        containerOverrides = {
-            "command": ["bash", f"job_shell_scripts/job_combine_tables.sh"]
-        }
-    )
+# ARTIS_RETRY_POLICY, if set, adds the retry rules, "combine" timeout and queue order
+response = artis_jobs.submit_combine_job(batch_client, policy=artis_jobs.load_retry_policy())
 
+artis_jobs.record_run("combine", {"combine-tables": artis_jobs.run_node("combine", response)})
 print("Done submitting ARTIS table combination job")
-
-
+print(response)
@@ -7,57 +7,46 @@ submit one AWS Batch job per HS version. Each job will:
 
  1. Use the existing Docker image in ECR.
  2. Inside the container, source the baked-in helper to pull all ARTIS_model_code/ from S3.
- 3. Then source the HS-specific restart script to resume get_snet().
+ 3. Then source 02-artis-pipeline-restart-snet.R, which reads the HS version
+    from ARTIS_HS_VERSION, to resume get_snet().
 
 No Docker rebuild or push required.
-"""
 
-import os
-import sys
-import boto3
+--resources <file> (or ARTIS_RESOURCE_PROFILES) sizes each job from a resource
+profile file (stage "snet", see artis_jobs.load_resource_profiles) and passes
+the matching core count to get_snet() as ARTIS_NUM_CORES.
+
+--retry-policy <file> (or ARTIS_RETRY_POLICY) adds the policy's
+evaluateOnExit rules and "snet" timeout and submits to the first usable
+queue of its ordered list (see artis_jobs.load_retry_policy).
+"""
 
-# --- Configuration ---
-AWS_REGION     = os.environ.get("AWS_REGION", "us-east-1")
-S3_BUCKET      = "artis-s3-bucket"
-JOB_QUEUE      = "artis-job-queue"
-JOB_DEFINITION = "artis_job_definition"
+import argparse
+import artis_jobs
 
-# Read HS_VERSIONS from your local environment
-hs_env = os.environ.get("HS_VERSIONS")
-if not hs_env:
-    print("ERROR: HS_VERSIONS not set. Export e.g.: HS_VERSIONS=\"02,07,12,17,96\"")
-    sys.exit(1)
-hs_versions = hs_env.split(",")
+parser = argparse.ArgumentParser(description="Submit one get_snet() restart job per HS version in HS_VERSIONS.")
+parser.add_argument("--resources", metavar="FILE",
+                    help="Resource profile file (default: ARTIS_RESOURCE_PROFILES, else the job definition's size)")
+parser.add_argument("--retry-policy", metavar="FILE",
+                    help="Retry policy file: evaluateOnExit rules, per-stage timeouts and ordered job queues "
+                         "(default: ARTIS_RETRY_POLICY, else the job definition's retries and artis-job-queue)")
+args = parser.parse_args()
+profiles = artis_jobs.load_resource_profiles(args.resources)
+policy = artis_jobs.load_retry_policy(args.retry_policy)
 
-# Initialize AWS Batch client
-batch = boto3.client("batch", region_name=AWS_REGION)
+hs_versions = artis_jobs.read_hs_versions()
+batch = artis_jobs.create_batch_client()
 
+# Submitted jobs are recorded in a run file for monitor_artis_jobs.py
+nodes = {}
 for hs in hs_versions:
-    # The HS-specific restart script you uploaded to S3
-    script_name = f"02-artis-pipeline-restart-snet-hs{hs}.R"
-
-    # Build the shell command to run inside the container:
-    # 1) Fetch ALL ARTIS_model_code/ via the baked-in helper
-    # 2) Source the HS-specific restart script
-    cmd = (
-        "R -e \"source('docker_image_artis_pkg_download.R')\" && "
-        f"R -e \"source('{script_name}')\""
-    )
-
-    # Submit the job, overriding only the container command
-    response = batch.submit_job(
-        jobName=f"artis-restart-HS{hs}",
-        jobQueue=JOB_QUEUE,
-        jobDefinition=JOB_DEFINITION,
-        containerOverrides={
-            "environment": [
-                {"name": "AWS_REGION", "value": AWS_REGION}
-            ],
-            "command": ["bash", "-lc", cmd]
-        }
-    )
-
-    print(f"Submitted restart job for HS{hs}")
+    resources = artis_jobs.resolve_resources(profiles, hs, stage="snet")
+    response = artis_jobs.submit_restart_job(batch, hs, resources=resources, policy=policy)
+
+    print(f"Submitted restart job for HS{hs} to {response['jobQueue']} ({artis_jobs.describe_resources(resources)}, "
+          f"{artis_jobs.describe_retry_policy(policy, 'snet')})")
     print(response)
+    nodes[f"HS{hs}"] = artis_jobs.run_node("restart", response, hs_version=hs, stage="snet", resources=resources)
 
+artis_jobs.record_run("restart", nodes)
 print("All restart jobs submitted.")
@@ -432,6 +432,30 @@ resource "aws_batch_compute_environment" "artis_compute_env" {
   ]
 }
 
+# Create AWS Batch compute environment on interruptible Fargate Spot capacity
+resource "aws_batch_compute_environment" "artis_spot_compute_env" {
+  compute_environment_name = "artis-spot-compute-env"
+  compute_resources {
+    max_vcpus          = var.spot_max_vcpus
+    security_group_ids = [aws_security_group.vpc_security_group.id]
+    subnets = [
+      aws_subnet.public_subnet.id,
+      aws_subnet.private_subnet1.id,
+      aws_subnet.private_subnet2.id,
+      aws_subnet.private_subnet3.id,
+      aws_subnet.private_subnet4.id,
+      aws_subnet.private_subnet5.id,
+      aws_subnet.private_subnet6.id
+    ]
+    type = "FARGATE_SPOT"
+  }
+  service_role = aws_iam_role.aws_batch_service_role.arn
+  type         = "MANAGED"
+  depends_on = [
+    aws_iam_role_policy_attachment.aws_batch_service_role
+  ]
+}
+
 # Create a job queue and place it within the compute environment
 resource "aws_batch_job_queue" "job_queue" {
   name     = "artis-job-queue"
@@ -443,6 +467,23 @@ resource "aws_batch_job_queue" "job_queue" {
   }
 }
 
+# Create a Spot-first job queue: jobs run on Fargate Spot and overflow to
+# on-demand Fargate only when the Spot environment is at its vCPU limit.
+# Submit scripts pick it through the "queues" list of a retry policy file.
+resource "aws_batch_job_queue" "spot_job_queue" {
+  name     = "artis-spot-job-queue"
+  state    = "ENABLED"
+  priority = 900
+  compute_environment_order {
+    order               = 1
+    compute_environment = aws_batch_compute_environment.artis_spot_compute_env.arn
+  }
+  compute_environment_order {
+    order               = 2
+    compute_environment = aws_batch_compute_environment.artis_compute_env.arn
+  }
+}
+
 # Creating a Job definition---------------------------------------------------------
 
 # IAM policy document (Trusted entities)
@@ -523,6 +564,35 @@ resource "aws_batch_job_definition" "artis_job_def" {
     "FARGATE"
   ]
 
+  # Try a job up to X times (set as a variable in "variables.tf"), but only
+  # when the attempt was lost to the infrastructure (host or Spot termination,
+  # a failed task start or image pull). R script errors and anything else
+  # exit straight away, since a retry would fail the same way. Submit scripts
+  # can override this per job with a retry policy file (retry_policy.json).
+  retry_strategy {
+    attempts = var.job_retry_attempts
+    evaluate_on_exit {
+      on_status_reason = "Host EC2*"
+      action           = "RETRY"
+    }
+    evaluate_on_exit {
+      on_status_reason = "Your Spot Task was interrupted*"
+      action           = "RETRY"
+    }
+    evaluate_on_exit {
+      on_status_reason = "ResourceInitializationError*"
+      action           = "RETRY"
+    }
+    evaluate_on_exit {
+      on_status_reason = "CannotPullContainerError*"
+      action           = "RETRY"
+    }
+    evaluate_on_exit {
+      on_reason = "*"
+      action    = "EXIT"
+    }
+  }
+
   container_properties = jsonencode({
     # Job Definition name
     name = var.job_def_name
@@ -543,11 +613,6 @@ resource "aws_batch_job_definition" "artis_job_def" {
     }
     */
 
-    # Set to try a job at least X amount of times (set as a variable in "variables.tf")
-    retry_strategy = {
-      attempts = var.job_retry_attempts
-    }
-
     # Currently - No additional memory will be allocated besides the amount specified
     # However can be customized to include additional memory if needed
     /*
@@ -33,12 +33,19 @@ variable "docker_version_tag" {
   default = "latest"
 }
 
-# Number of times you want a job to retry running if failed
+# Number of times a job is tried when an attempt is lost to the infrastructure
+# (host or Spot termination); script errors are never retried
 variable "job_retry_attempts" {
-  type    = string
+  type    = number
   default = 2
 }
 
+# Maximum vCPUs running at once on Fargate Spot (artis-spot-job-queue)
+variable "spot_max_vcpus" {
+  type    = number
+  default = 256
+}
+
 # Name for job definition 
 variable "job_def_name" {
   type    = string
@@ -0,0 +1,105 @@
+"""
+Shared setup for the unit tests.
+
+The root scripts and aws_scripts/ are imported the same way the scripts
+import each other (flat modules on sys.path). S3 is replaced by FakeS3, which
+answers the list_objects_v2 paginator from a dict, and Batch by FakeBatch,
+which records submit_job requests, so no AWS account or network is needed. Run from the project root:
+
+    python3 -m pytest tests
+"""
+
+import os
+import sys
+from datetime import datetime, timezone
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "aws_scripts"))
+sys.path.insert(0, REPO_DIR)
+
+# no artis_events.jsonl next to the tests; s3_upload.py exits without credentials
+os.environ["ARTIS_EVENTS_LOG"] = "off"
+os.environ.setdefault("AWS_ACCESS_KEY", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+os.environ.setdefault("AWS_REGION", "us-east-1")
+
+
+class FakePaginator:
+    def __init__(self, objects, page_size):
+        self.objects   = objects
+        self.page_size = page_size
+
+    def paginate(self, Bucket, Prefix=""):
+        keys = sorted(k for k in self.objects.get(Bucket, {}) if k.startswith(Prefix))
+        for i in range(0, max(len(keys), 1), self.page_size):
+            yield {"Contents": [
+                {"Key": key, "Size": self.objects[Bucket][key][0], "ETag": f'"{self.objects[Bucket][key][1]}"',
+                 "LastModified": datetime(2025, 6, 2, tzinfo=timezone.utc)}
+                for key in keys[i:i + self.page_size]
+            ]}
+
+
+class FakeS3:
+    """list_objects_v2 over {bucket: {key: (size, etag)}}, page_size keys per page."""
+
+    def __init__(self, objects, page_size=2):
+        self.objects   = objects
+        self.page_size = page_size
+
+    def get_paginator(self, operation):
+        assert operation == "list_objects_v2"
+        return FakePaginator(self.objects, self.page_size)
+
+
+@pytest.fixture
+def fake_s3():
+    return FakeS3
+
+
+class FakeBatch:
+    """Records submit_job requests and answers with job-<n> IDs.
+
+    describe_jobs reports statuses ({job_id: status}, SUCCEEDED by default),
+    the list_jobs paginator lists failed_indexes ({array job id: [index]}) and
+    describe_job_queues reports queue_states ({queue: (state, status)},
+    ENABLED/VALID by default).
+    """
+
+    def __init__(self):
+        self.requests       = []
+        self.statuses       = {}
+        self.failed_indexes = {}
+        self.queue_states   = {}
+        self.queue_lookups  = 0
+
+    def submit_job(self, **request):
+        self.requests.append(request)
+        return {"jobId": f"job-{len(self.requests)}", "jobName": request["jobName"]}
+
+    def describe_jobs(self, jobs):
+        return {"jobs": [{"jobId": job_id, "status": self.statuses.get(job_id, "SUCCEEDED")} for job_id in jobs]}
+
+    def describe_job_queues(self, jobQueues):
+        self.queue_lookups += 1
+        return {"jobQueues": [
+            dict(zip(("jobQueueName", "state", "status"), (queue,) + self.queue_states.get(queue, ("ENABLED", "VALID"))))
+            for queue in jobQueues
+        ]}
+
+    def get_paginator(self, operation):
+        assert operation == "list_jobs"
+        return self
+
+    def paginate(self, arrayJobId, jobStatus):
+        indexes = self.failed_indexes.get(arrayJobId, []) if jobStatus == "FAILED" else []
+        yield {"jobSummaryList": [{"arrayProperties": {"index": index}} for index in indexes]}
+
+    def jobs(self):
+        """The recorded requests by job name."""
+        return {request["jobName"]: request for request in self.requests}
+
+
+@pytest.fixture
+def fake_batch():
+    return FakeBatch()
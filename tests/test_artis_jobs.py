@@ -0,0 +1,217 @@
+import json
+import os
+import pytest
+import artis_jobs
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def env(request):
+    return {e["name"]: e["value"] for e in request["containerOverrides"]["environment"]}
+
+
+# ─── per-year jobs ───
+
+def test_analysis_years():
+    assert artis_jobs.analysis_years("17") == list(range(2017, artis_jobs.LAST_ANALYSIS_YEAR + 1))
+    with pytest.raises(ValueError, match="Unknown HS version"):
+        artis_jobs.analysis_years("22")
+
+
+def test_parse_years():
+    assert artis_jobs.parse_years("2005, 2019", ["96", "17"]) == {2005, 2019}
+
+
+@pytest.mark.parametrize("value, hs_versions, message", [
+    ("2019,20x0", ["96"], "'20x0' is not a year"),
+    ("2019,", ["96"], "'' is not a year"),
+    ("1995", ["96"], "1995 is not an analysis year"),
+    ("2024", ["96"], "2024 is not an analysis year"),
+    ("2012", ["17"], "HS17 from 2017"),
+])
+def test_parse_years_names_the_bad_value(value, hs_versions, message):
+    with pytest.raises(ValueError, match=message):
+        artis_jobs.parse_years(value, hs_versions)
+
+
+def test_hs_year_jobs_submit_one_array_child_per_year(fake_batch):
+    years = artis_jobs.analysis_years("96")
+    response = artis_jobs.submit_hs_year_jobs(fake_batch, "96", years, after=["job-0"])
+
+    [request] = fake_batch.requests
+    assert request["jobName"] == response["jobName"] == "artis-HS96-years"
+    assert request["arrayProperties"] == {"size": len(years)}
+    assert request["dependsOn"] == [{"jobId": "job-0"}]
+    assert request["containerOverrides"]["command"] == ["bash", "job_shell_scripts/job_hs_year.sh"]
+    assert env(request) == {"HS_VERSION": "96", "ARTIS_HS_YEARS": ",".join(str(y) for y in years)}
+    assert response["jobQueue"] == artis_jobs.JOB_QUEUE
+
+
+def test_single_year_is_a_plain_job(fake_batch):
+    artis_jobs.submit_hs_year_jobs(fake_batch, "17", [2020])
+    [request] = fake_batch.requests
+    # Batch rejects arrays of one child
+    assert "arrayProperties" not in request
+    assert request["jobName"] == "artis-HS17-2020"
+    assert env(request) == {"HS_VERSION": "17", "ARTIS_HS_YEARS": "2020", "ARTIS_ANALYSIS_YEAR": "2020"}
+
+
+# ─── resource profiles ───
+
+PROFILES = {
+    "default": {"vcpu": 8, "memory": 61440},
+    "profiles": [
+        {"stage": "snet", "vcpu": 4, "memory": 30720, "cores": 3},
+        {"hs_version": "02", "vcpu": 16, "memory": 122880},
+        {"hs_version": "96", "year": 2004, "memory": 57344},
+        {"hs_version": "96", "stage": "snet", "vcpu": 16, "memory": 122880, "cores": 12},
+    ]
+}
+
+
+def test_no_profiles_keeps_job_definition_size():
+    assert artis_jobs.resolve_resources(None, "96") is None
+
+
+def test_default_applies_without_a_matching_profile():
+    assert artis_jobs.resolve_resources(PROFILES, "07", stage="solve") == {"vcpu": 8, "memory": 61440, "cores": 8}
+
+
+def test_more_match_keys_win():
+    assert artis_jobs.resolve_resources(PROFILES, "96", stage="snet") == {"vcpu": 16, "memory": 122880, "cores": 12}
+
+
+@pytest.mark.parametrize("profiles", [PROFILES["profiles"], PROFILES["profiles"][::-1]])
+def test_hs_version_outranks_stage_in_any_file_order(profiles):
+    resources = artis_jobs.resolve_resources({"default": PROFILES["default"], "profiles": profiles}, "02",
+                                             stage="snet")
+    # the snet core count does not carry over to the HS profile's vCPU size
+    assert resources == {"vcpu": 16, "memory": 122880, "cores": 16}
+
+
+def test_year_profile_overrides_memory_only():
+    assert artis_jobs.resolve_resources(PROFILES, "96", [2004], "solve") == {"vcpu": 8, "memory": 57344, "cores": 8}
+
+
+def test_array_job_gets_largest_year():
+    assert artis_jobs.resolve_resources(PROFILES, "96", [2003, 2004], "solve")["memory"] == 61440
+
+
+@pytest.mark.parametrize("vcpu, memory", [(0.25, 1024), (4, 9216), (8, 20480), (16, 40960)])
+def test_check_resources_accepts_fargate_sizes(vcpu, memory):
+    artis_jobs.check_resources({"vcpu": vcpu, "memory": memory})
+
+
+@pytest.mark.parametrize("vcpu, memory", [
+    (3, 8192),         # not a Fargate vCPU size
+    (4, 4096),         # below the range
+    (4, 9000),         # not a 1 GiB step
+    (8, 20000),        # not a 4 GiB step
+    (16, 100000),      # not an 8 GiB step
+    (0.25, 1536),      # 0.25 vCPU only takes 512, 1024 or 2048
+    (4, "8192"),
+])
+def test_check_resources_rejects_other_sizes(vcpu, memory):
+    with pytest.raises(ValueError):
+        artis_jobs.check_resources({"vcpu": vcpu, "memory": memory})
+
+
+def test_unknown_profile_key_is_rejected(tmp_path):
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps({"profiles": [{"hs": "96", "vcpu": 4, "memory": 8192}]}))
+    with pytest.raises(ValueError, match="unknown profile key"):
+        artis_jobs.load_resource_profiles(str(path))
+
+
+def test_shipped_profiles_resolve_for_every_hs_version_and_stage():
+    profiles = artis_jobs.load_resource_profiles(os.path.join(REPO_DIR, "resource_profiles.json"))
+    for hs_version in artis_jobs.HS_FIRST_YEAR:
+        for stage in ("solve", "snet", "combine"):
+            artis_jobs.resolve_resources(profiles, hs_version, artis_jobs.analysis_years(hs_version), stage)
+
+
+# ─── retry policies ───
+
+POLICY = {
+    "retry_strategy": {"attempts": 3, "evaluate_on_exit": [
+        {"on_status_reason": "Host EC2*", "action": "retry"},
+        {"on_reason": "*", "action": "exit"},
+    ]},
+    "timeouts": {"solve": 259200, "default": 3600},
+    "queues": {"default": ["spot", "on-demand"], "combine": ["on-demand"]},
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_queue_cache(monkeypatch):
+    # usable_queues caches per client; test clients must not share entries
+    monkeypatch.setattr(artis_jobs, "_usable_queues", {})
+
+
+def test_apply_retry_policy_builds_retry_strategy_and_timeout():
+    request = {"jobQueue": artis_jobs.JOB_QUEUE}
+    assert artis_jobs.apply_retry_policy(request, POLICY, "solve") == ["spot", "on-demand"]
+    assert request["retryStrategy"] == {"attempts": 3, "evaluateOnExit": [
+        {"onStatusReason": "Host EC2*", "action": "RETRY"},
+        {"onReason": "*", "action": "EXIT"},
+    ]}
+    assert request["timeout"] == {"attemptDurationSeconds": 259200}
+
+
+def test_apply_retry_policy_falls_back_to_defaults():
+    request = {"jobQueue": artis_jobs.JOB_QUEUE}
+    assert artis_jobs.apply_retry_policy(request, POLICY, "combine") == ["on-demand"]
+    assert request["timeout"] == {"attemptDurationSeconds": 3600}
+
+    request = {"jobQueue": artis_jobs.JOB_QUEUE}
+    assert artis_jobs.apply_retry_policy(request, None, "solve") == [artis_jobs.JOB_QUEUE]
+    assert set(request) == {"jobQueue"}
+
+
+def test_usable_queues_keeps_order_and_caches(fake_batch):
+    fake_batch.queue_states = {"spot": ("DISABLED", "VALID"), "backup": ("ENABLED", "INVALID")}
+    queues = ["spot", "backup", "on-demand", "other"]
+    assert artis_jobs.usable_queues(fake_batch, queues) == ["on-demand", "other"]
+    assert artis_jobs.usable_queues(fake_batch, queues) == ["on-demand", "other"]
+    assert fake_batch.queue_lookups == 1
+
+
+def test_submit_job_uses_first_usable_queue(fake_batch):
+    fake_batch.queue_states = {"spot": ("ENABLED", "INVALID")}
+    response = artis_jobs.submit_hs_job(fake_batch, "96", policy=POLICY)
+    assert response["jobQueue"] == fake_batch.requests[0]["jobQueue"] == "on-demand"
+
+
+def test_resubmission_moves_past_the_failed_queue(fake_batch):
+    assert artis_jobs.submit_hs_job(fake_batch, "96", policy=POLICY)["jobQueue"] == "spot"
+    assert artis_jobs.submit_hs_job(fake_batch, "96", policy=POLICY, skip_queue="spot")["jobQueue"] == "on-demand"
+    # the last queue is kept rather than leaving nothing to submit to
+    assert artis_jobs.submit_hs_job(fake_batch, "96", policy=POLICY, skip_queue="on-demand")["jobQueue"] == "spot"
+
+
+def test_no_usable_queue_is_an_error(fake_batch):
+    fake_batch.queue_states = {"spot": ("DISABLED", "VALID"), "on-demand": ("DISABLED", "VALID")}
+    with pytest.raises(RuntimeError, match="ENABLED and VALID"):
+        artis_jobs.submit_hs_job(fake_batch, "96", policy=POLICY)
+    assert fake_batch.requests == []
+
+
+@pytest.mark.parametrize("policy, message", [
+    ({"retries": 3}, "unknown retry policy key"),
+    ({"retry_strategy": {"attempts": 11}}, "attempts must be"),
+    ({"retry_strategy": {"evaluate_on_exit": [{"on_reason": "*", "action": "ignore"}]}}, "retry or exit"),
+    ({"retry_strategy": {"evaluate_on_exit": [{"reason": "*", "action": "exit"}]}}, "needs only"),
+    ({"timeouts": {"solve": 30}}, "at least 60 seconds"),
+    ({"queues": {"solve": []}}, "non-empty list"),
+])
+def test_invalid_retry_policy_is_rejected(tmp_path, policy, message):
+    path = tmp_path / "retry_policy.json"
+    path.write_text(json.dumps(policy))
+    with pytest.raises(ValueError, match=message):
+        artis_jobs.load_retry_policy(str(path))
+
+
+def test_shipped_retry_policy_loads():
+    policy = artis_jobs.load_retry_policy(os.path.join(REPO_DIR, "retry_policy.json"))
+    for stage in ("solve", "snet", "combine"):
+        assert artis_jobs.apply_retry_policy({"jobQueue": artis_jobs.JOB_QUEUE}, policy, stage)
@@ -0,0 +1,68 @@
+import re
+import collect_job_logs
+from collect_job_logs import LogCollector
+
+
+class FakeLogs:
+    """get_log_events over {stream: [message]}, page_size events per call.
+
+    Tokens are "f/<position>"; at the end of a stream the request's own token
+    comes back, as CloudWatch does.
+    """
+
+    def __init__(self, streams, page_size=2):
+        self.streams   = streams
+        self.page_size = page_size
+        self.requests  = []
+
+    def get_log_events(self, logGroupName, logStreamName, startFromHead, nextToken=None):
+        self.requests.append((logStreamName, nextToken))
+        start  = int(nextToken.split("/")[1]) if nextToken else 0
+        events = self.streams[logStreamName][start:start + self.page_size]
+        return {
+            "events": [{"timestamp": 1748822400000, "message": message + "\n"} for message in events],
+            "nextForwardToken": f"f/{start + len(events)}"
+        }
+
+
+JOB = {"container": {"logStreamName": "attempt-2"}, "attempts": [{"container": {"logStreamName": "attempt-1"}}]}
+
+
+def messages(path):
+    return [line.split(" ", 2)[2].rstrip("\n") for line in open(path) if not line.startswith("───")]
+
+
+def test_fetch_pages_every_attempt_in_order(tmp_path):
+    logs = FakeLogs({"attempt-1": ["a1", "a2", "a3"], "attempt-2": ["b1", "b2", "b3", "b4", "b5"]})
+    collector = LogCollector(logs, str(tmp_path))
+
+    assert collector.fetch("HS96/2005", JOB) == 8
+    path = tmp_path / "HS96_2005.log"
+    assert messages(path) == ["a1", "a2", "a3", "b1", "b2", "b3", "b4", "b5"]
+    assert [line for line in open(path) if line.startswith("─── attempt")] == [
+        f"─── attempt 1: {collect_job_logs.DEFAULT_LOG_GROUP}/attempt-1 ───\n",
+        f"─── attempt 2: {collect_job_logs.DEFAULT_LOG_GROUP}/attempt-2 ───\n",
+    ]
+    assert [token for stream, token in logs.requests if stream == "attempt-2"] == [None, "f/2", "f/4", "f/5"]
+
+
+def test_rerun_fetches_only_new_lines(tmp_path):
+    logs = FakeLogs({"attempt-1": ["a1"], "attempt-2": ["b1", "b2", "b3"]})
+    collector = LogCollector(logs, str(tmp_path))
+    collector.fetch("HS96/2005", JOB)
+    collector.save_tokens()
+
+    logs.streams["attempt-2"] += ["b4", "b5"]
+    logs.requests = []
+    # a new collector picks up the saved tokens, as a re-run or --follow does
+    assert LogCollector(logs, str(tmp_path)).fetch("HS96/2005", JOB) == 2
+
+    assert messages(tmp_path / "HS96_2005.log") == ["a1", "b1", "b2", "b3", "b4", "b5"]
+    assert logs.requests == [("attempt-1", "f/1"), ("attempt-2", "f/3"), ("attempt-2", "f/5")]
+    assert sum(line.startswith("─── attempt") for line in open(tmp_path / "HS96_2005.log")) == 2
+
+
+def test_grep_file_skips_attempt_headers(tmp_path):
+    path = tmp_path / "HS96.log"
+    path.write_text("─── attempt 1: g/s ───\n2025-06-02 00:00:00 Error in solve\n2025-06-02 00:00:01 done\n")
+    assert collect_job_logs.grep_file(str(path), re.compile("Error")) == (2, 1, "2025-06-02 00:00:00 Error in solve")
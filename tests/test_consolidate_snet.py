@@ -0,0 +1,26 @@
+import os
+import pytest
+import consolidate_snet
+
+pytest.importorskip("pyarrow")
+
+
+def test_download_and_local_runs_share_summary_entries(tmp_path):
+    src = tmp_path / "outputs_2025-06-02" / "snet" / "HS96" / "2004" / "2025-06-02_W_long_2004_HS96.csv"
+    src.parent.mkdir(parents=True)
+    src.write_text("exporter_iso3c,hs6,live_weight_t\nCHL,030389,1.5\n")
+    output = str(tmp_path / "snet_parquet")
+
+    # as queued by s3_download.py, keyed by the S3 key
+    consolidator = consolidate_snet.SnetConsolidator(output)
+    consolidator.submit("outputs/snet/HS96/2004/2025-06-02_W_long_2004_HS96.csv", str(src))
+    consolidator.close()
+
+    # as walked by consolidate_snet.py, keyed by the local path
+    consolidator = consolidate_snet.SnetConsolidator(output)
+    consolidator.submit(str(src).replace(os.sep, "/"), str(src))
+    tables = consolidator.close()
+
+    assert (len(consolidator.converted), consolidator.skipped) == (0, 1)
+    assert list(consolidator.summary["files"]) == ["W_long/hs_version=96/year=2004/2025-06-02_W_long_2004_HS96.parquet"]
+    assert (tables["W_long"]["rows"], tables["W_long"]["files"]) == (1, 1)
@@ -0,0 +1,30 @@
+import pytest
+import convert_model_inputs
+
+
+def test_code_columns_stay_strings_across_blocks(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    # the first blocks only hold codes without leading zeros, which would infer int64
+    rows = ["exporter_iso3c,hs6,hs_version,total_v"]
+    rows += [f"USA,301110,96,{i}.5" for i in range(200)]
+    rows += ["CHL,030389,02,1.0", "NOR,0304xx,02,2.0"]
+    src = tmp_path / "standardized_baci_seafood_hs96_y2004.csv"
+    src.write_text("\n".join(rows) + "\n")
+    dst = str(tmp_path / "out.parquet")
+
+    count, schema = convert_model_inputs.convert_parquet(str(src), dst, block_size=1024)
+
+    assert count == 202
+    assert {c["name"]: c["type"] for c in schema} == {
+        "exporter_iso3c": "string", "hs6": "string", "hs_version": "string", "total_v": "double"
+    }
+    table = pq.read_table(dst)
+    assert table.num_rows == 202
+    assert table.column("hs6").to_pylist()[-2:] == ["030389", "0304xx"]
+    assert table.column("hs_version").to_pylist()[-1] == "02"
+
+
+def test_code_column_re():
+    names = ["hs6", "hs_version", "hs_code", "exporter_iso3c", "iso3c", "country_code",
+             "year", "total_v", "sciname", "habitat", "hs_clade"]
+    assert [n for n in names if convert_model_inputs.CODE_COLUMN_RE.search(n)] == names[:6]
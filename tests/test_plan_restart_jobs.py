@@ -0,0 +1,64 @@
+import artis_jobs
+import plan_restart_jobs
+import s3_index
+
+HS17_YEARS = artis_jobs.analysis_years("17")
+
+
+def outputs(solver, years, pattern):
+    return {f"outputs/{solver}/HS17/{year}/2025-06-02{pattern.format(year=year)}": (1, "e" * 32) for year in years}
+
+
+def test_plan_tasks_splits_solve_and_snet():
+    done  = {("17", year) for year in HS17_YEARS}
+    tasks = plan_restart_jobs.plan_tasks(
+        ["17"],
+        quadprog=done,
+        cvxopt=done - {("17", 2018)},
+        snet=done - {("17", 2018), ("17", 2020), ("17", 2021)},
+    )
+    # 2018 has no cvxopt solution, so it needs the full pipeline rather than a get_snet() restart
+    assert tasks == {("17", "solve"): [2018], ("17", "snet"): [2020, 2021]}
+
+
+def test_plan_tasks_nothing_missing():
+    done = {("17", year) for year in HS17_YEARS}
+    assert plan_restart_jobs.plan_tasks(["17"], done, done, done) == {}
+
+
+def test_plan_from_indexed_listing(tmp_path, fake_s3):
+    est = "_all-country-est_{year}_HS17.RDS"
+    objects = {}
+    objects.update(outputs("quadprog_snet", HS17_YEARS, est))
+    objects.update(outputs("cvxopt_snet", HS17_YEARS[1:], est))
+    objects.update(outputs("snet", HS17_YEARS[:-1], "_consumption_{year}_HS17.qs"))
+    # other files under the prefixes do not count as finished work
+    objects["outputs/snet/HS17/2023/2025-06-02_W_long_2023_HS17.csv"] = (1, "e" * 32)
+    s3 = fake_s3({"bucket": objects})
+
+    prefixes = [plan_restart_jobs.QUADPROG_PREFIX, plan_restart_jobs.CVXOPT_PREFIX, plan_restart_jobs.SNET_PREFIX]
+    with s3_index.open_index(s3, "bucket", prefixes, str(tmp_path / "index.sqlite")) as index:
+        quadprog = plan_restart_jobs.index_outputs(index, plan_restart_jobs.QUADPROG_PREFIX,
+                                                   plan_restart_jobs.COUNTRY_EST_RE)
+        cvxopt   = plan_restart_jobs.index_outputs(index, plan_restart_jobs.CVXOPT_PREFIX,
+                                                   plan_restart_jobs.COUNTRY_EST_RE)
+        snet     = plan_restart_jobs.index_outputs(index, plan_restart_jobs.SNET_PREFIX,
+                                                   plan_restart_jobs.SNET_DONE_RE)
+
+    assert plan_restart_jobs.plan_tasks(["17"], quadprog, cvxopt, snet) == {
+        ("17", "solve"): [HS17_YEARS[0]],
+        ("17", "snet"): [HS17_YEARS[-1]],
+    }
+
+
+def test_submit_tasks_routes_stages(fake_batch):
+    nodes = plan_restart_jobs.submit_tasks(fake_batch, {("17", "solve"): [2018], ("17", "snet"): [2020, 2021]})
+
+    jobs = fake_batch.jobs()
+    assert set(jobs) == {"artis-HS17-2018", "artis-restart-snet-HS17"}
+    assert jobs["artis-HS17-2018"]["containerOverrides"]["command"] == ["bash", "job_shell_scripts/job_hs_year.sh"]
+    snet = jobs["artis-restart-snet-HS17"]
+    env = {e["name"]: e["value"] for e in snet["containerOverrides"]["environment"]}
+    assert (env["ARTIS_HS_VERSION"], env["ARTIS_YEARS"]) == ("17", "2020,2021")
+    assert artis_jobs.RESTART_SCRIPT in snet["containerOverrides"]["command"][-1]
+    assert {name: node["kind"] for name, node in nodes.items()} == {"HS17-solve": "hs", "HS17-snet": "restart"}
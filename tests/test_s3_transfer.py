@@ -0,0 +1,317 @@
+import os
+import hashlib
+import threading
+import json
+import pytest
+import s3_transfer
+from s3_transfer import MB, KeyFilter
+
+
+def write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def multipart_etag(data, chunk_size):
+    digests = b"".join(hashlib.md5(data[i:i + chunk_size]).digest() for i in range(0, len(data), chunk_size))
+    return f"{hashlib.md5(digests).hexdigest()}-{-(-len(data) // chunk_size)}"
+
+
+class Body:
+    def __init__(self, data):
+        self.data = data
+
+    def iter_chunks(self, chunk_size):
+        for i in range(0, len(self.data), chunk_size):
+            yield self.data[i:i + chunk_size]
+
+
+class FakeGetS3:
+    """get_object over {key: bytes}; records the ranges asked for and fails the ones in fail_ranges."""
+
+    def __init__(self, data, fail_ranges=()):
+        self.data        = data
+        self.fail_ranges = set(fail_ranges)
+        self.gets        = []
+        self._lock       = threading.Lock()
+
+    def get_object(self, Bucket, Key, Range=None):
+        with self._lock:
+            self.gets.append((Key, Range))
+        if Range in self.fail_ranges:
+            raise OSError(f"connection reset during {Range}")
+        data = self.data[Key]
+        if Range:
+            first, last = map(int, Range[len("bytes="):].split("-"))
+            data = data[first:last + 1]
+        return {"Body": Body(data)}
+
+
+def listing(data):
+    return [{"Key": key, "Size": len(value), "ETag": f'"{hashlib.md5(value).hexdigest()}"'} for key, value in data.items()]
+
+
+def download(s3, tmp_path, objects, **kwargs):
+    return s3_transfer.download_objects(s3, "bucket", objects, lambda key: str(tmp_path / key), workers=4, **kwargs)
+
+
+# ─── compute_etag ───
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # a block size that does not divide the part size exercises the partial reads
+    monkeypatch.setattr(s3_transfer, "STREAM_CHUNK", 7)
+
+
+def test_compute_etag_single_part_is_md5(tmp_path, small_blocks):
+    data = bytes(range(256)) * 3
+    assert s3_transfer.compute_etag(write(tmp_path / "f", data), len(data) + 1) == hashlib.md5(data).hexdigest()
+
+
+@pytest.mark.parametrize("size", [100, 99, 101])
+def test_compute_etag_multipart(tmp_path, small_blocks, size):
+    data = bytes(i % 251 for i in range(size))
+    assert s3_transfer.compute_etag(write(tmp_path / "f", data), 25) == multipart_etag(data, 25)
+
+
+def test_compute_etag_empty_file(tmp_path):
+    assert s3_transfer.compute_etag(write(tmp_path / "f", b""), 8 * MB) == hashlib.md5(b"").hexdigest()
+
+
+def test_etag_matches_single_part(tmp_path):
+    data = b"artis" * 100
+    path = write(tmp_path / "f", data)
+    assert s3_transfer.etag_matches(path, len(data), hashlib.md5(data).hexdigest())
+    assert not s3_transfer.etag_matches(path, len(data), hashlib.md5(b"other").hexdigest())
+
+
+def test_etag_matches_part_size_implied_by_part_count(tmp_path):
+    # 1 MB parts are not a candidate size; the part count implies them
+    data = bytes(i % 253 for i in range(3 * MB - 10))
+    path = write(tmp_path / "f", data)
+    assert s3_transfer.etag_matches(path, len(data), multipart_etag(data, MB))
+    assert not s3_transfer.etag_matches(path, len(data), multipart_etag(data[::-1], MB))
+
+
+# ─── download_objects ───
+
+def test_download_whole_and_ranged(tmp_path):
+    data = {"outputs/small.csv": b"a" * 40, "outputs/big.csv": bytes(i % 256 for i in range(100))}
+    s3 = FakeGetS3(data)
+    objects = listing(data) + [{"Key": "outputs/snet/", "Size": 0, "ETag": '"x"'}]
+
+    stats = download(s3, tmp_path, objects, range_threshold=50, range_size=30, max_inflight=60)
+
+    assert sorted(key for key, _, _ in stats.files) == ["outputs/big.csv", "outputs/small.csv"]
+    assert stats.failures == []
+    for key, value in data.items():
+        assert (tmp_path / key).read_bytes() == value
+        assert not os.path.exists(str(tmp_path / key) + s3_transfer.PART_SUFFIX)
+    assert (tmp_path / "outputs" / "snet").is_dir()
+    assert sorted(r for k, r in s3.gets if k == "outputs/big.csv") == [
+        "bytes=0-29", "bytes=30-59", "bytes=60-89", "bytes=90-99"
+    ]
+    assert [r for k, r in s3.gets if k == "outputs/small.csv"] == [None]
+
+
+def test_failed_range_fails_the_object(tmp_path):
+    data = {"outputs/big.csv": b"b" * 100}
+    stats = download(FakeGetS3(data, fail_ranges=["bytes=30-59"]), tmp_path, listing(data),
+                     range_threshold=50, range_size=30)
+
+    assert stats.files == []
+    assert [key for key, _ in stats.failures] == ["outputs/big.csv"]
+    # neither the destination nor the preallocated part file is left behind
+    assert os.listdir(tmp_path / "outputs") == []
+
+
+def test_on_complete_failure_does_not_fail_the_download(tmp_path):
+    data = {"outputs/a.csv": b"a" * 10, "outputs/b.csv": b"b" * 100}
+    completed = []
+
+    def on_complete(key, local_path):
+        completed.append((key, open(local_path, "rb").read()))
+        if key == "outputs/b.csv":
+            raise ValueError("not a CSV")
+
+    stats = download(FakeGetS3(data), tmp_path, listing(data), range_threshold=50, range_size=30,
+                     on_complete=on_complete)
+
+    assert sorted(completed) == sorted(data.items())
+    assert sorted(key for key, _, _ in stats.files) == ["outputs/a.csv", "outputs/b.csv"]
+    assert stats.failures == []
+    assert stats.callback_failures == [("outputs/b.csv", "not a CSV")]
+
+
+def test_resume_skips_matching_files(tmp_path):
+    data = {"outputs/same.csv": b"same", "outputs/changed.csv": b"new!", "outputs/partial.csv": b"complete"}
+    (tmp_path / "outputs").mkdir()
+    (tmp_path / "outputs" / "same.csv").write_bytes(b"same")
+    (tmp_path / "outputs" / "changed.csv").write_bytes(b"old!")
+    # an interrupted download only leaves the .part file
+    (tmp_path / "outputs" / ("partial.csv" + s3_transfer.PART_SUFFIX)).write_bytes(b"comp")
+    s3 = FakeGetS3(data)
+    completed = []
+    manifest_path = str(tmp_path / "manifest.json")
+
+    stats = download(s3, tmp_path, listing(data), resume=True, manifest_path=manifest_path,
+                     on_complete=lambda key, _: completed.append(key))
+
+    assert sorted(key for key, _ in s3.gets) == ["outputs/changed.csv", "outputs/partial.csv"]
+    assert stats.skipped == [("outputs/same.csv", 4)]
+    assert sorted(completed) == sorted(data)
+    for key, value in data.items():
+        assert (tmp_path / key).read_bytes() == value
+    assert set(json.load(open(manifest_path))) == set(data)
+
+
+def test_resume_trusts_manifest_while_mtime_matches(tmp_path, monkeypatch):
+    data = {"outputs/a.csv": b"aaaa"}
+    manifest_path = str(tmp_path / "manifest.json")
+    download(FakeGetS3(data), tmp_path, listing(data), manifest_path=manifest_path)
+
+    monkeypatch.setattr(s3_transfer, "etag_matches", lambda *args: pytest.fail("re-hashed a recorded file"))
+    s3 = FakeGetS3(data)
+    stats = download(s3, tmp_path, listing(data), resume=True, manifest_path=manifest_path)
+    assert (s3.gets, len(stats.skipped)) == ([], 1)
+
+
+def test_without_resume_everything_is_downloaded(tmp_path):
+    data = {"outputs/a.csv": b"aaaa"}
+    (tmp_path / "outputs").mkdir()
+    (tmp_path / "outputs" / "a.csv").write_bytes(b"aaaa")
+    s3 = FakeGetS3(data)
+    download(s3, tmp_path, listing(data))
+    assert s3.gets == [("outputs/a.csv", None)]
+
+
+# ─── server-side copies ───
+
+class FakeCopyS3:
+    """Records copy_object and multipart copy calls; fail_part makes that part number raise."""
+
+    def __init__(self, fail_part=None):
+        self.fail_part = fail_part
+        self.copies    = []
+        self.parts     = []
+        self.completed = None
+        self.aborted   = False
+        self._lock     = threading.Lock()
+
+    def copy_object(self, Bucket, Key, CopySource):
+        self.copies.append((CopySource["Key"], Key))
+
+    def create_multipart_upload(self, Bucket, Key):
+        return {"UploadId": "upload-1"}
+
+    def upload_part_copy(self, PartNumber, CopySourceRange, **kwargs):
+        if PartNumber == self.fail_part:
+            raise OSError("part copy failed")
+        with self._lock:
+            self.parts.append((PartNumber, CopySourceRange))
+        return {"CopyPartResult": {"ETag": f'"etag-{PartNumber}"'}}
+
+    def complete_multipart_upload(self, MultipartUpload, **kwargs):
+        self.completed = MultipartUpload["Parts"]
+
+    def abort_multipart_upload(self, **kwargs):
+        self.aborted = True
+
+
+def part_ranges(parts):
+    return [tuple(map(int, rng[len("bytes="):].split("-"))) for _, rng in sorted(parts)]
+
+
+def test_hs_and_year():
+    assert s3_transfer.hs_and_year("outputs/snet/HS96/2004/W_long_2004_HS96.csv") == ("96", 2004)
+    assert s3_transfer.hs_and_year("outputs/snet/HS96/V1_long_HS96.csv") == ("96", None)
+    assert s3_transfer.hs_and_year("outputs/cvxopt_snet/2025-06-02_all-country-est_2010_HS07.RDS") == ("07", 2010)
+    assert s3_transfer.hs_and_year("outputs/attribute_tables/countries.csv") == (None, None)
+
+
+def test_multipart_copy_covers_every_byte_once():
+    size = 23 * MB + 5
+    s3 = FakeCopyS3()
+    s3_transfer._multipart_copy(s3, {"Bucket": "b", "Key": "src"}, "b", "dest", size, 8 * MB, 3)
+
+    assert part_ranges(s3.parts) == [(0, 8 * MB - 1), (8 * MB, 16 * MB - 1), (16 * MB, size - 1)]
+    assert s3.completed == [{"PartNumber": n, "ETag": f'"etag-{n}"'} for n in (1, 2, 3)]
+    assert not s3.aborted
+
+
+def test_multipart_copy_part_size_limits():
+    # parts are never below 5 MB ...
+    s3 = FakeCopyS3()
+    s3_transfer._multipart_copy(s3, {"Bucket": "b", "Key": "src"}, "b", "dest", 12 * MB, MB, 4)
+    assert [last - first + 1 for first, last in part_ranges(s3.parts)] == [5 * MB, 5 * MB, 2 * MB]
+
+    # ... and grow so an object never needs more than 10,000 of them
+    size = s3_transfer.MAX_PARTS * 5 * MB + 1
+    s3 = FakeCopyS3()
+    s3_transfer._multipart_copy(s3, {"Bucket": "b", "Key": "src"}, "b", "dest", size, 5 * MB, 16)
+    ranges = part_ranges(s3.parts)
+    assert len(ranges) <= s3_transfer.MAX_PARTS
+    assert (ranges[0][0], ranges[-1][1]) == (0, size - 1)
+    assert all(b[0] == a[1] + 1 for a, b in zip(ranges, ranges[1:]))
+
+
+def test_failed_part_aborts_the_upload():
+    s3 = FakeCopyS3(fail_part=2)
+    with pytest.raises(OSError):
+        s3_transfer._multipart_copy(s3, {"Bucket": "b", "Key": "src"}, "b", "dest", 20 * MB, 8 * MB, 1)
+    assert s3.aborted and s3.completed is None
+
+
+def test_copy_object_switches_to_multipart_at_threshold():
+    s3 = FakeCopyS3()
+    s3_transfer.copy_object(s3, "b", "small", "small-copy", 10, threshold=20, part_size=5 * MB)
+    s3_transfer.copy_object(s3, "b", "big", "big-copy", 20, threshold=20, part_size=5 * MB)
+    assert s3.copies == [("small", "small-copy")]
+    assert part_ranges(s3.parts) == [(0, 19)]
+
+
+# ─── KeyFilter ───
+
+def test_key_filter_selectors():
+    selection = KeyFilter(hs_versions=["96"], years=[2004], solvers=["snet"])
+    assert selection.accepts("outputs/snet/HS96/2004/W_long_2004_HS96.csv", 10)
+    assert not selection.accepts("outputs/snet/HS96/2005/W_long_2005_HS96.csv", 10)
+    assert not selection.accepts("outputs/snet/HS02/2004/W_long_2004_HS02.csv", 10)
+    assert not selection.accepts("outputs/quadprog_snet/HS96/2004/x_2004_HS96.RDS", 10)
+    # a year selector drops keys that do not name a year
+    assert not selection.accepts("outputs/snet/HS96/V1_long_HS96.csv", 10)
+
+
+def test_key_filter_patterns_and_size():
+    selection = KeyFilter(include=["*_consumption_*", "re:W_long"], exclude=["*.qs"], max_size=100)
+    assert selection.accepts("outputs/snet/HS96/2004/x_consumption_2004_HS96.csv", 100)
+    assert selection.accepts("outputs/snet/HS96/2004/W_long_2004_HS96.csv", 1)
+    assert not selection.accepts("outputs/snet/HS96/2004/x_consumption_2004_HS96.qs", 1)
+    assert not selection.accepts("outputs/snet/HS96/2004/x_consumption_2004_HS96.csv", 101)
+    assert not selection.accepts("outputs/snet/HS96/2004/V1_long_2004_HS96.csv", 1)
+
+
+def test_key_filter_folder_placeholders():
+    assert KeyFilter().accepts("outputs/snet/", 0)
+    assert not KeyFilter(hs_versions=["96"]).accepts("outputs/snet/HS96/", 0)
+
+
+def test_key_filter_prefixes():
+    assert KeyFilter(hs_versions=["96"]).prefixes("outputs/") == ["outputs/"]
+    assert KeyFilter(solvers=["cvxopt", "snet"], hs_versions=["96", "02"]).prefixes("outputs/") == [
+        "outputs/cvxopt_snet/HS02/", "outputs/cvxopt_snet/HS96/", "outputs/snet/HS02/", "outputs/snet/HS96/"
+    ]
+
+
+def test_key_filter_apply_counts():
+    objects = [{"Key": "a/HS96/2004/x.csv", "Size": 5}, {"Key": "a/HS02/2004/x.csv", "Size": 7}]
+    selection = KeyFilter(hs_versions=["96"])
+    assert [obj["Key"] for obj in selection.apply(objects)] == ["a/HS96/2004/x.csv"]
+    assert (selection.kept, selection.kept_bytes, selection.dropped) == (1, 5, 1)
+
+
+# ─── listing ───
+
+def test_list_objects_pages(fake_s3):
+    s3 = fake_s3({"b": {"p/a": (1, "e1"), "p/b": (2, "e2"), "p/c": (3, "e3"), "q/d": (4, "e4")}})
+    assert s3_transfer.list_objects(s3, "b", ["p/"]) == {"p/a": (1, "e1"), "p/b": (2, "e2"), "p/c": (3, "e3")}
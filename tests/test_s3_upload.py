@@ -0,0 +1,81 @@
+import s3_transfer
+import s3_upload
+
+CHUNK = 8 * s3_transfer.MB
+
+
+def make_tree(tmp_path, files):
+    pairs = []
+    for key, data in files.items():
+        path = tmp_path / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        pairs.append((str(path), key))
+    return pairs
+
+
+def etag(path):
+    return s3_transfer.compute_etag(path, CHUNK)
+
+
+def test_plan_sync_uploads_changed_and_finds_stale(tmp_path, fake_s3):
+    pairs = make_tree(tmp_path, {
+        "model_inputs/same.csv": b"unchanged",
+        "model_inputs/changed.csv": b"new content",
+        "model_inputs/new.csv": b"only local",
+    })
+    paths = {key: path for path, key in pairs}
+    s3 = fake_s3({"bucket": {
+        "model_inputs/same.csv": (9, etag(paths["model_inputs/same.csv"])),
+        "model_inputs/changed.csv": (11, "0" * 32),
+        "model_inputs/gone.csv": (4, "1" * 32),
+        "model_inputs/folder/": (0, "2" * 32),
+        "outputs/result.csv": (4, "3" * 32),
+    }})
+
+    to_upload, stale, entries = s3_upload.plan_sync(s3, "bucket", pairs, {}, CHUNK, ["model_inputs/"])
+
+    assert sorted(key for _, key in to_upload) == ["model_inputs/changed.csv", "model_inputs/new.csv"]
+    # folder placeholders and keys outside the synced prefixes are never stale
+    assert stale == ["model_inputs/gone.csv"]
+    assert set(entries) == {key for _, key in pairs}
+
+
+def test_plan_sync_reuses_manifest_hash(tmp_path, fake_s3):
+    [(path, key)] = make_tree(tmp_path, {"model_inputs/a.csv": b"abc"})
+    manifest = {}
+    _, _, entries = s3_upload.plan_sync(fake_s3({}), "bucket", [(path, key)], manifest, CHUNK, ["model_inputs/"])
+    # a recorded hash is trusted while size and mtime match
+    entries[key]["etag"] = "recorded"
+    to_upload, _, _ = s3_upload.plan_sync(fake_s3({"bucket": {key: (3, "recorded")}}), "bucket",
+                                          [(path, key)], entries, CHUNK, ["model_inputs/"])
+    assert to_upload == []
+
+
+def test_hs_layout_sync_never_lists_other_hs_folders(tmp_path, fake_s3):
+    prefixes = s3_upload.hs_layout_prefixes(["ARTIS_model_code/", "model_inputs/"], {"96"})
+    assert prefixes == ["ARTIS_model_code/", "model_inputs/shared/", "model_inputs/HS96/"]
+
+    pairs = make_tree(tmp_path, {"model_inputs/HS96/x_HS96.csv": b"x"})
+    s3 = fake_s3({"bucket": {
+        "model_inputs/HS96/old_HS96.csv": (1, "a" * 32),
+        "model_inputs/HS02/x_HS02.csv": (1, "b" * 32),
+        "model_inputs/flat.csv": (1, "c" * 32),
+        "model_inputs/shared/old.csv": (1, "d" * 32),
+    }})
+    _, stale, _ = s3_upload.plan_sync(s3, "bucket", pairs, {}, CHUNK, prefixes)
+    assert stale == ["model_inputs/HS96/old_HS96.csv", "model_inputs/shared/old.csv"]
+
+
+def test_file_roots_match_only_their_own_key(tmp_path, fake_s3):
+    pairs = make_tree(tmp_path, {"model_inputs/a.csv": b"a", "foo.csv": b"foo"})
+    assert s3_upload.sync_prefixes(str(tmp_path)) == ["foo.csv", "model_inputs/"]
+    s3 = fake_s3({"bucket": {
+        "foo.csv": (3, etag(str(tmp_path / "foo.csv"))),
+        "foo.csv.bak": (3, "a" * 32),
+        "foo.csv_old/x.csv": (1, "b" * 32),
+        "model_inputs/gone.csv": (1, "c" * 32),
+    }})
+    to_upload, stale, _ = s3_upload.plan_sync(s3, "bucket", pairs, {}, CHUNK, s3_upload.sync_prefixes(str(tmp_path)))
+    assert [key for _, key in to_upload] == ["model_inputs/a.csv"]
+    assert stale == ["model_inputs/gone.csv"]
@@ -0,0 +1,148 @@
+import sys
+import json
+import pytest
+import setup_runner
+from setup_runner import Stage, SetupRunner
+
+
+def python(code):
+    return [sys.executable, "-c", code]
+
+
+def touch(path):
+    """Command that appends one line to path, so the test can count how often a stage ran."""
+    return python(f"open({str(path)!r}, 'a').write('ran\\n')")
+
+
+def runs(path):
+    return len(path.read_text().splitlines()) if path.exists() else 0
+
+
+def run(stages, checkpoints=None, force=()):
+    return SetupRunner(stages, checkpoints, force).run()
+
+
+# ─── dependency graph ───
+
+def test_independent_stages_run_concurrently(tmp_path):
+    # each stage waits for the other's flag, so running them one after the other would time out
+    def handshake(mine, theirs):
+        return python(f"import os, time; open({str(tmp_path / mine)!r}, 'w').close(); deadline = time.time() + 10\n"
+                      f"while not os.path.exists({str(tmp_path / theirs)!r}):\n"
+                      f"    assert time.time() < deadline; time.sleep(0.01)")
+
+    stages = [Stage("terraform", [handshake("a", "b")]), Stage("build", [handshake("b", "a")])]
+    assert run(stages)
+    assert [s.status for s in stages] == [setup_runner.STATUS_OK] * 2
+
+
+def test_dependents_wait_for_their_stages(tmp_path):
+    order = tmp_path / "order.log"
+
+    def record(name):
+        return python(f"open({str(order)!r}, 'a').write({name!r} + '\\n')")
+
+    stages = [
+        Stage("push", [record("push")], after=["terraform", "build"]),
+        Stage("terraform", [python("import time; time.sleep(0.2)"), record("terraform")]),
+        Stage("build", [record("build")]),
+    ]
+    assert run(stages)
+    assert order.read_text().splitlines()[-1] == "push"
+
+
+def test_failure_cancels_dependents_and_stops_running_stages(tmp_path):
+    stages = [
+        Stage("terraform", [python("raise SystemExit(3)")]),
+        Stage("upload", [touch(tmp_path / "upload.log")], after=["terraform"]),
+        Stage("build", [python("import time; time.sleep(30)"), touch(tmp_path / "build.log")]),
+    ]
+    assert not run(stages)
+    assert [s.status for s in stages] == [setup_runner.STATUS_FAILED, setup_runner.STATUS_CANCELLED,
+                                          setup_runner.STATUS_CANCELLED]
+    assert (runs(tmp_path / "upload.log"), runs(tmp_path / "build.log")) == (0, 0)
+
+
+def test_unknown_dependency_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="unknown stage"):
+        SetupRunner([Stage("upload", [], after=["terraform"])], str(tmp_path / "checkpoints.json"))
+
+
+# ─── checkpoints ───
+
+@pytest.fixture
+def graph(tmp_path):
+    """build -> upload, with both stages checkpointed; returns (make_stages, log dir, checkpoint path)."""
+    def make_stages(build_inputs="v1", upload_inputs="data-1", build_fails=False):
+        build = [touch(tmp_path / "build.log")]
+        if build_fails:
+            build.append(python("raise SystemExit(3)"))
+        return [
+            Stage("build", build, inputs=build_inputs),
+            Stage("upload", [touch(tmp_path / "upload.log")], after=["build"], inputs=lambda: upload_inputs),
+        ]
+    return make_stages, tmp_path, str(tmp_path / "checkpoints.json")
+
+
+def test_unchanged_stages_are_skipped(graph):
+    make_stages, logs, checkpoints = graph
+    assert run(make_stages(), checkpoints)
+    assert json.load(open(checkpoints)) == {"build": "v1", "upload": "data-1"}
+
+    stages = make_stages()
+    assert run(stages, checkpoints)
+    assert [s.status for s in stages] == [setup_runner.STATUS_SKIPPED] * 2
+    assert (runs(logs / "build.log"), runs(logs / "upload.log")) == (1, 1)
+
+
+def test_changed_dependency_reruns_dependents(graph):
+    make_stages, logs, checkpoints = graph
+    run(make_stages(), checkpoints)
+    # upload's own inputs are unchanged, but it runs after a build that re-ran
+    assert run(make_stages(build_inputs="v2"), checkpoints)
+    assert (runs(logs / "build.log"), runs(logs / "upload.log")) == (2, 2)
+
+
+def test_changed_inputs_rerun_only_that_stage(graph):
+    make_stages, logs, checkpoints = graph
+    run(make_stages(), checkpoints)
+    assert run(make_stages(upload_inputs="data-2"), checkpoints)
+    assert (runs(logs / "build.log"), runs(logs / "upload.log")) == (1, 2)
+
+
+@pytest.mark.parametrize("force, expected", [(["upload"], (1, 2)), (["all"], (2, 2))])
+def test_force(graph, force, expected):
+    make_stages, logs, checkpoints = graph
+    run(make_stages(), checkpoints)
+    assert run(make_stages(), checkpoints, force)
+    assert (runs(logs / "build.log"), runs(logs / "upload.log")) == expected
+
+
+def test_failure_drops_checkpoint_and_cancels_dependents(graph):
+    make_stages, logs, checkpoints = graph
+    run(make_stages(), checkpoints)
+
+    stages = make_stages(build_inputs="v2", build_fails=True)
+    assert not run(stages, checkpoints)
+    assert [s.status for s in stages] == [setup_runner.STATUS_FAILED, setup_runner.STATUS_CANCELLED]
+    assert json.load(open(checkpoints)) == {"upload": "data-1"}
+
+    # the next run retries the failed stage even with the old inputs
+    assert run(make_stages(), checkpoints)
+    assert runs(logs / "build.log") == 3
+
+
+def test_stage_without_inputs_always_runs(tmp_path):
+    checkpoints = str(tmp_path / "checkpoints.json")
+    for _ in range(2):
+        assert run([Stage("terraform", [touch(tmp_path / "tf.log")])], checkpoints)
+    assert runs(tmp_path / "tf.log") == 2
+
+
+def test_hash_inputs_tracks_content_and_values(tmp_path):
+    (tmp_path / "main.tf").write_text("a")
+    before = setup_runner.hash_inputs(files=[str(tmp_path)], values=["bucket"])
+    assert setup_runner.hash_inputs(files=[str(tmp_path)], values=["bucket"]) == before
+    assert setup_runner.hash_inputs(files=[str(tmp_path)], values=["other"]) != before
+    (tmp_path / "main.tf").write_text("b")
+    assert setup_runner.hash_inputs(files=[str(tmp_path)], values=["bucket"]) != before
@@ -0,0 +1,45 @@
+import artis_jobs
+import submit_artis_pipeline
+
+
+def test_combine_depends_on_every_hs_job(fake_batch):
+    run = submit_artis_pipeline.submit_run(fake_batch, ["96", "17"], per_year=True)
+
+    jobs = fake_batch.jobs()
+    assert set(jobs) == {"artis-HS96-years", "artis-HS17-years", "artis-combine-tables"}
+    hs_ids = [run["nodes"]["HS96"]["job_id"], run["nodes"]["HS17"]["job_id"]]
+    assert jobs["artis-combine-tables"]["dependsOn"] == [{"jobId": job_id} for job_id in hs_ids]
+    assert run["nodes"]["HS17"]["years"] == artis_jobs.analysis_years("17")
+    assert run["nodes"]["combine-tables"]["depends_on"] == ["HS96", "HS17"]
+
+
+def test_whole_hs_jobs_without_per_year(fake_batch):
+    run = submit_artis_pipeline.submit_run(fake_batch, ["02"], per_year=False)
+    assert run["nodes"]["HS02"]["years"] is None
+    assert fake_batch.jobs()["artis-HS02"]["containerOverrides"]["command"] == ["bash", "job_shell_scripts/job_hs02.sh"]
+
+
+def test_resubmit_only_failed_years_and_combine(fake_batch):
+    run = submit_artis_pipeline.submit_run(fake_batch, ["96", "17"], per_year=True)
+    hs96, hs17, combine = (run["nodes"][name] for name in ("HS96", "HS17", "combine-tables"))
+    old_hs96 = hs96["job_id"]
+    fake_batch.statuses = {old_hs96: "FAILED", combine["job_id"]: "FAILED"}
+    fake_batch.failed_indexes = {old_hs96: [1, 3]}
+    fake_batch.requests = []
+
+    assert submit_artis_pipeline.resubmit_failed(fake_batch, run) == 2
+
+    jobs = fake_batch.jobs()
+    assert set(jobs) == {"artis-HS96-years", "artis-combine-tables"}
+    assert hs96["years"] == [1997, 1999]
+    assert jobs["artis-HS96-years"]["arrayProperties"] == {"size": 2}
+    assert (hs96["history"], hs17["history"]) == ([old_hs96], [])
+    # the combine job waits only on the resubmitted HS job; HS17 already succeeded
+    assert jobs["artis-combine-tables"]["dependsOn"] == [{"jobId": hs96["job_id"]}]
+
+
+def test_nothing_failed_resubmits_nothing(fake_batch):
+    run = submit_artis_pipeline.submit_run(fake_batch, ["17"], per_year=True)
+    fake_batch.requests = []
+    assert submit_artis_pipeline.resubmit_failed(fake_batch, run) == 0
+    assert fake_batch.requests == []